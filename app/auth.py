@@ -1,13 +1,19 @@
 from datetime import datetime, timedelta
 from typing import Optional
+import logging
+import uuid
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from . import models, schemas
 from .database import get_db
 from .config import settings
+from .services.token_revocation import revocation_list
+
+logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
@@ -24,8 +30,14 @@ def get_password_hash(password: str) -> str:
 
 
 def get_user(db: Session, username: str) -> Optional[models.User]:
-    """Obtener usuario por username"""
-    return db.query(models.User).filter(models.User.username == username).first()
+    """
+    Obtener usuario por username. Siempre lee del primario, aun en una sesion de solo lectura:
+    login y permisos no pueden depender de una replica atrasada (p.ej. un usuario recien desactivado).
+    """
+    return db.execute(
+        select(models.User).where(models.User.username == username),
+        bind_arguments={"replica": False},
+    ).scalars().first()
 
 
 def authenticate_user(db: Session, username: str, password: str) -> Optional[models.User]:
@@ -46,7 +58,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
     
-    to_encode.update({"exp": expire, "type": "access"})
+    # jti identifica el token para poder revocarlo; iat permite revocar todos los de un usuario
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid.uuid4().hex, "type": "access"})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
@@ -59,23 +72,36 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
     
-    to_encode.update({"exp": expire, "type": "refresh"})
+    # jti identifica el token para poder revocarlo; iat permite revocar todos los de un usuario
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid.uuid4().hex, "type": "refresh"})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
 
-def verify_refresh_token(token: str) -> Optional[str]:
-    """Verificar refresh token y retornar username"""
+def decode_token(token: str, token_type: str) -> Optional[dict]:
+    """Decodificar un token del tipo indicado; None si es invalido, expiro o fue revocado"""
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        username: str = payload.get("sub")
-        token_type: str = payload.get("type")
-        
-        if username is None or token_type != "refresh":
-            return None
-        return username
-    except JWTError:
+    except JWTError as ex:
+        logger.info("Invalid %s token: %s", token_type, ex)
         return None
+    username = payload.get("sub")
+    if username is None or payload.get("type") != token_type:
+        return None
+    if revocation_list.is_revoked(payload.get("jti"), username, payload.get("iat")):
+        return None
+    return payload
+
+
+def verify_refresh_token(token: str) -> Optional[str]:
+    """Verificar refresh token y retornar username"""
+    payload = decode_token(token, "refresh")
+    return payload["sub"] if payload is not None else None
+
+
+def revoke_user_tokens(username: str, reason: str = "disabled") -> None:
+    """Revocar todos los tokens del usuario en todos los workers (p.ej. al desactivarlo)"""
+    revocation_list.revoke_user(username, reason)
 
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
@@ -86,18 +112,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        username: str = payload.get("sub")
-        token_type: str = payload.get("type")
-        
-        if username is None or token_type != "access":
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)
-    except JWTError as ex:
-        print(f"Error al decodificar el token: {ex}")
+    # La firma y la expiracion se verifican siempre; la revocacion se verifica en memoria y la
+    # tabla se relee a lo sumo cada TOKEN_REVOCATION_REFRESH_SECONDS
+    revocation_list.refresh_if_stale(db)
+    payload = decode_token(token, "access")
+    if payload is None:
         raise credentials_exception
+    token_data = schemas.TokenData(username=payload["sub"])
     
+    # Una consulta al primario por el indice unico de username: is_active e is_admin siempre al dia
     user = get_user(db, username=token_data.username)
     if user is None:
         raise credentials_exception
@@ -1,16 +1,20 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
     # Database Configuration
     database_url: str = "sqlite:///./pos.db"
+    # Replicas de lectura: listados, conciliacion y exportaciones (autenticacion siempre en el primario)
+    database_replica_urls: List[str] = []
     
     # JWT Configuration
     secret_key: str = "your-secret-key-change-this-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
+    # Cada worker lee las revocaciones nuevas (logout, usuarios desactivados) a lo sumo cada N segundos
+    token_revocation_refresh_seconds: float = 5
     
     # Application Configuration
     app_name: str = "POS API"
@@ -18,17 +22,119 @@ class Settings(BaseSettings):
     debug: bool = True
     api_v1_str: str = "/api/v1"
     
+    # Logging (cola con un hilo escritor; las solicitudes nunca bloquean en stdout)
+    log_level: str = "INFO"
+    log_format: str = "json"  # json o text
+    log_queue_size: int = 10000  # con la cola llena los registros se descartan
+    # Fraccion de registros DEBUG/INFO que se escriben por logger, p.ej. {"app.requests": 0.1}
+    log_sample_rates: Dict[str, float] = {}
+    # SQL y parametros de cada sentencia (sqlalchemy.engine); solo para diagnostico
+    log_sql: bool = False
+    
     # CORS Configuration
     allowed_origins: List[str] = ["http://localhost:3000", "http://localhost:8080"]
     allowed_methods: List[str] = ["GET", "POST", "PUT", "DELETE", "PATCH"]
     allowed_headers: List[str] = ["*"]
     
-    # Database Pool Configuration (for PostgreSQL)
+    # Database Pool Configuration (PostgreSQL; en SQLite, pool de conexiones de lectura)
     db_pool_size: int = 10
     db_max_overflow: int = 20
     db_pool_timeout: int = 30
     db_pool_recycle: int = 3600
     
+    # SQLite Profile (pragmas por conexion; las escrituras pasan por el hilo del group commit)
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 268435456  # 256 MiB
+    sqlite_cache_size_kb: int = 65536
+    
+    # Partitioning & Archive Configuration (solo PostgreSQL; tablas de transacciones por mes)
+    db_partitioning: bool = False
+    partition_months_ahead: int = 3
+    archive_retention_months: int = 12
+    archive_dir: str = "archive"
+    
+    # Product Index Configuration (indice en memoria del catalogo para el TSL)
+    product_index_refresh_seconds: int = 60
+    
+    # Return Lookup (LRU de ventas recientes para resolver la venta original de devoluciones)
+    return_lookup_cache_size: int = 10000
+    
+    # Tax Rules Configuration (reglas de impuestos cacheadas por categoria)
+    tax_rules_refresh_seconds: int = 300
+    
+    # Admission Control Configuration (endpoint de conversion)
+    # max_in_flight: 0 = db_pool_size + db_max_overflow, negativo = sin tope
+    admission_max_in_flight: int = 0
+    # Token buckets: solicitudes por segundo y rafaga; rate 0 desactiva el limite
+    admission_store_rate: float = 10.0
+    admission_store_burst: int = 50
+    admission_user_rate: float = 20.0
+    admission_user_burst: int = 100
+    
+    # Group Commit Configuration (escrituras de conversiones agrupadas en un solo commit)
+    write_batch_max_size: int = 100
+    write_batch_max_delay_ms: float = 5
+    write_batch_timeout: float = 30
+    
+    # Conversion Jobs (POST /convert-transaction/jobs; workers: python -m app.services.conversion_jobs)
+    conversion_job_workers: int = 2
+    conversion_job_batch_size: int = 10  # jobs que toma un worker por consulta
+    conversion_job_poll_seconds: float = 0.5
+    conversion_job_max_attempts: int = 3
+    conversion_job_timeout: float = 300  # un job en running por mas tiempo se reintenta (worker caido)
+    
+    # Shared Cache Configuration (idempotencia, compartida entre workers)
+    # backend: sqlite (archivo local del host), redis (requiere el paquete redis) o memory (solo un worker)
+    cache_backend: str = "sqlite"
+    cache_sqlite_path: Optional[str] = None  # None = <tmp>/api-pos-tsl-<uid>/cache.db (directorio 0700)
+    cache_redis_url: Optional[str] = None
+    cache_max_entries: int = 100000
+    cache_generation_ttl: float = 1.0  # segundos que un worker puede tardar en ver invalidate_namespace de otro
+    idempotency_ttl: int = 86400
+    
+    # Catalog Import (POST /catalog/import)
+    catalog_import_chunk_size: int = 10000  # filas por COPY/executemany
+    catalog_import_max_bytes: int = 200 * 1024 * 1024
+    
+    # Memory Budgets (python -m app.services.memory_profile falla si una conversion los excede)
+    # Pico permitido = base + por_linea * lineas del ticket; retained = bytes que quedan por conversion
+    memory_budget_peak_base: int = 1048576
+    memory_budget_converter_per_line: int = 2048  # TSLConverter: preparar y convertir el ticket
+    memory_budget_endpoint_per_line: int = 8192  # POST /convert-transaction completo (JSON, ORM, TSL)
+    memory_budget_retained: int = 32768
+    # Debug Allocations (tracemalloc en el worker y GET /debug/allocations para admins)
+    debug_allocations: bool = False
+    debug_allocations_frames: int = 1
+    
+    # TSL Output Configuration
+    tsl_encoding: str = "latin-1"
+    
+    # TSL Payload Compression (columna transaction_tsl_data.tsl_data_compressed)
+    # codec: zlib, zstd (requiere el paquete zstandard) o none
+    tsl_compression_codec: str = "zlib"
+    tsl_compression_level: int = 6
+    tsl_compression_min_size: int = 128  # payloads mas chicos se guardan sin comprimir
+    tsl_compression_dictionary_size: int = 32768
+    tsl_compression_dictionary_refresh_seconds: int = 300
+    
+    # TSL Process Pool (tickets con al menos `threshold` lineas se convierten fuera del worker)
+    # workers = 0 desactiva el pool
+    tsl_process_pool_workers: int = 2
+    tsl_process_pool_threshold: int = 500
+    tsl_process_pool_timeout: float = 30
+    
+    # TSL Mapping Specs (YAML por tipo de transaccion; None = app/services/tsl_specs)
+    tsl_specs_dir: Optional[str] = None
+    tsl_specs_check_seconds: float = 5
+    
+    # Parquet Export (python -m app.services.parquet_export; requiere el paquete pyarrow)
+    # settle_seconds: no se exportan transacciones creadas hace menos de N segundos
+    export_dir: str = "exports"
+    export_batch_size: int = 10000
+    export_settle_seconds: float = 60
+    
     class Config:
         env_file = ".env"
 
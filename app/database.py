@@ -1,27 +1,106 @@
-from sqlalchemy import create_engine
+from typing import Optional
+import random
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from .config import settings
 
-# Configurar engine con pool de conexiones para PostgreSQL
-if settings.database_url.startswith("postgresql"):
-    engine = create_engine(
-        settings.database_url,
-        pool_size=settings.db_pool_size,
-        max_overflow=settings.db_max_overflow,
-        pool_timeout=settings.db_pool_timeout,
-        pool_recycle=settings.db_pool_recycle,
-        pool_pre_ping=True,  # Verificar conexiones antes de usar
-        echo=settings.debug  # Mostrar queries SQL en modo debug
-    )
-else:
-    # Configuración para SQLite
-    engine = create_engine(
-        settings.database_url,
-        connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-    )
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def sqlite_pragmas() -> list:
+    """Pragmas del perfil SQLite, aplicados a cada conexion nueva del pool"""
+    return [
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode}",  # WAL: las lecturas no bloquean al escritor
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",  # NORMAL con WAL: fsync solo en checkpoints
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+        f"PRAGMA cache_size=-{settings.sqlite_cache_size_kb}",  # negativo = KiB
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def _create_engine(url: str):
+    # Configurar engine con pool de conexiones para PostgreSQL
+    if url.startswith("postgresql"):
+        return create_engine(
+            url,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=True,  # Verificar conexiones antes de usar
+            # Sin echo: con LOG_SQL el SQL se loguea por la cola de logging (services/structured_logging)
+        )
+    if url.startswith("sqlite"):
+        # Perfil SQLite: WAL y pragmas en cada conexion; las lecturas usan el pool y las escrituras de
+        # las solicitudes pasan por el hilo escritor (services/write_batcher), un unico escritor
+        in_memory = make_url(url).database in (None, "", ":memory:")
+        sqlite_engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            **({} if in_memory else {
+                "pool_size": settings.db_pool_size,
+                "max_overflow": settings.db_max_overflow,
+                "pool_timeout": settings.db_pool_timeout,
+            })
+        )
+        event.listen(sqlite_engine, "connect", _apply_sqlite_pragmas)
+        return sqlite_engine
+    return create_engine(url)
+
+
+engine = _create_engine(settings.database_url)
+# Replicas de lectura (DATABASE_REPLICA_URLS); vacio = todo va al primario
+replica_engines = [_create_engine(url) for url in settings.database_replica_urls]
+
+
+class RoutingSession(Session):
+    """
+    Sesion que elige el engine por operacion: las lecturas de una sesion de solo lectura
+    (get_read_db) o las marcadas con bind_arguments={"replica": True} van a una replica, y todo
+    lo demas al primario. La replica se elige una vez por sesion (session.info), asi una consulta
+    y sus selectinload o lineas leen el mismo estado aunque las replicas tengan distinto retraso.
+    Despues de la primera escritura (flush o INSERT/UPDATE/DELETE) la sesion queda fija en el
+    primario, para que lea lo que acaba de escribir aunque la replica tenga retraso.
+    """
+
+    def get_bind(self, mapper=None, clause=None, replica: Optional[bool] = None, **kw):
+        if replica is None:
+            replica = self.info.get("read_only", False)
+        if replica and replica_engines and not self.info.get("wrote") and not self._flushing:
+            replica_engine = self.info.get("replica_engine")
+            if replica_engine is None:
+                replica_engine = self.info["replica_engine"] = random.choice(replica_engines)
+            return replica_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _stick_to_primary_on_flush(session, flush_context, instances):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _stick_to_primary_on_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+# Sesiones de solo lectura: listados, conciliacion y exportaciones leen de las replicas
+ReadSessionLocal = sessionmaker(
+    class_=RoutingSession, autocommit=False, autoflush=False, bind=engine, info={"read_only": True}
+)
 
 Base = declarative_base()
 
@@ -32,3 +111,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Sesion para endpoints de solo lectura (replicas si estan configuradas)"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
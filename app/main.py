@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from app.routers.router import api_router
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
@@ -6,9 +7,34 @@ from .database import engine, get_db
 from . import models
 from .routers import api_router
 from .config import settings
+from .partitioning import create_schema
+from .services.conversion_pool import conversion_pool
+from .services.write_batcher import write_batcher
+from .services import memory_profile, structured_logging
+
+# Logs a traves de una cola con un hilo escritor (JSON con request id, tienda y POS)
+structured_logging.configure()
+
+# Seguimiento de asignaciones para GET /debug/allocations (opt-in, tiene costo en CPU y memoria)
+if settings.debug_allocations:
+    memory_profile.start_tracing()
+
+# Crear las tablas en la base de datos (particionadas por mes en PostgreSQL si DB_PARTITIONING)
+create_schema(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Al cerrar: pool de conversion, escrituras pendientes y, al final, los logs"""
+    yield
+    try:
+        conversion_pool.shutdown()
+        # Confirmar las escrituras pendientes antes de cerrar
+        write_batcher.shutdown(timeout=settings.write_batch_timeout)
+    finally:
+        # Ultimo: escribe lo que loguearon los pasos anteriores
+        structured_logging.shutdown()
 
-# Crear las tablas en la base de datos
-models.Base.metadata.create_all(bind=engine)
 
 # Crear la aplicación FastAPI
 app = FastAPI(
@@ -16,7 +42,8 @@ app = FastAPI(
     description="API para sistema de punto de venta (POS) con gestión de usuarios, productos y transacciones",
     version=settings.app_version,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Configurar CORS
@@ -28,9 +55,11 @@ app.add_middleware(
     allow_headers=settings.allowed_headers if not settings.debug else ["*"],
 )
 
+# Request id y contexto de logging por solicitud
+app.add_middleware(structured_logging.RequestContextMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix=settings.api_v1_str) 
-        
 
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+"""
+Migraciones del esquema con Alembic. La API las aplica al iniciar (create_schema); tambien se
+pueden aplicar con `alembic upgrade head` desde la raiz del repositorio.
+"""
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+# Esquema que creaba metadata.create_all antes de las migraciones
+BASELINE_REVISION = "0001"
+
+# Clave del advisory lock de PostgreSQL mientras se migra
+_LOCK_KEY = 7_302_613
+
+
+def alembic_config(connection: Connection = None) -> Config:
+    """Configuracion de Alembic sin alembic.ini, con la conexion de la aplicacion"""
+    config = Config()
+    config.set_main_option("script_location", os.path.dirname(os.path.abspath(__file__)))
+    config.attributes["connection"] = connection
+    return config
+
+
+def create_schema(engine: Engine, revision: str = "head") -> None:
+    """
+    Crear o actualizar el esquema hasta `revision`. Una base creada antes de las migraciones
+    (con create_all, sin tabla alembic_version) se marca primero en la revision base, que es
+    exactamente el esquema que creaba, y se actualiza desde ahi.
+    """
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            # Varios workers inician a la vez: uno migra y los demas esperan y no encuentran cambios
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+        tables = inspect(connection).get_table_names()
+        config = alembic_config(connection)
+        if "alembic_version" not in tables and "users" in tables:
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, revision)
+
+
+def has_table(connection: Connection, table: str) -> bool:
+    return inspect(connection).has_table(table)
+
+
+def has_column(connection: Connection, table: str, column: str) -> bool:
+    return any(info["name"] == column for info in inspect(connection).get_columns(table))
+
+
+def has_index(connection: Connection, table: str, index: str) -> bool:
+    return any(info["name"] == index for info in inspect(connection).get_indexes(table))
@@ -0,0 +1,53 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app import models
+from app.config import settings
+
+config = context.config
+
+# Desde la linea de comandos (alembic upgrade head) se usa el logging de alembic.ini; al iniciar
+# la API se conserva el de la aplicacion
+if config.config_file_name is not None and config.attributes.get("connection") is None:
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Generar el SQL sin conectarse (alembic upgrade head --sql)"""
+    context.configure(
+        url=settings.database_url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # La API pasa su conexion (ver app.migrations.upgrade); la linea de comandos usa DATABASE_URL
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_migrations(connection)
+        return
+    from app.database import engine
+    with engine.connect() as connection:
+        _run_migrations(connection)
+        connection.commit()
+
+
+def _run_migrations(connection) -> None:
+    # render_as_batch: en SQLite los ALTER que no soporta se hacen recreando la tabla
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,174 @@
+"""Esquema base: las tablas que creaba metadata.create_all antes de las migraciones
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-07-08 00:00:00
+
+Las bases creadas antes de las migraciones se marcan en esta revision (ver app.migrations).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _id() -> sa.Column:
+    return sa.Column("id", sa.Integer(), nullable=False)
+
+
+def _created_at() -> sa.Column:
+    return sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True)
+
+
+def _updated_at() -> sa.Column:
+    return sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("username", sa.String(length=50), nullable=False),
+        sa.Column("email", sa.String(length=100), nullable=False),
+        sa.Column("first_name", sa.String(length=50), nullable=False),
+        sa.Column("last_name", sa.String(length=50), nullable=False),
+        sa.Column("gender", sa.String(length=10), nullable=True),
+        sa.Column("image", sa.String(length=500), nullable=True),
+        sa.Column("role", sa.String(length=20), nullable=True),
+        sa.Column("hashed_password", sa.String(length=255), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_admin", sa.Boolean(), nullable=True),
+        sa.Column("phone", sa.String(length=20), nullable=True),
+        _id(),
+        _created_at(),
+        _updated_at(),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "categories",
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        _id(),
+        _created_at(),
+        _updated_at(),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_categories_id", "categories", ["id"])
+    op.create_index("ix_categories_name", "categories", ["name"], unique=True)
+
+    op.create_table(
+        "products",
+        sa.Column("title", sa.String(length=200), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("category_id", sa.Integer(), nullable=True),
+        sa.Column("price", sa.Numeric(10, 3), nullable=False),
+        sa.Column("discount_percentage", sa.Numeric(5, 2), nullable=True),
+        sa.Column("discount_money", sa.Numeric(10, 3), nullable=True),
+        sa.Column("stock", sa.Integer(), nullable=True),
+        sa.Column("brand", sa.String(length=100), nullable=True),
+        sa.Column("sku", sa.String(length=50), nullable=True),
+        sa.Column("availability_status", sa.String(length=20), nullable=True),
+        sa.Column("minimum_order_quantity", sa.Integer(), nullable=True),
+        sa.Column("barcode", sa.String(length=50), nullable=True),
+        sa.Column("thumbnail", sa.String(length=500), nullable=True),
+        sa.Column("is_authorized", sa.Boolean(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        _id(),
+        _created_at(),
+        _updated_at(),
+        sa.ForeignKeyConstraint(["category_id"], ["categories.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("barcode"),
+    )
+    op.create_index("ix_products_id", "products", ["id"])
+    op.create_index("ix_products_title", "products", ["title"])
+    op.create_index("ix_products_sku", "products", ["sku"], unique=True)
+
+    op.create_table(
+        "transactions",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("store_id", sa.String(length=255), nullable=True),
+        sa.Column("pos_id", sa.String(length=50), nullable=True),
+        sa.Column("transaction_type", sa.String(length=20), nullable=True),
+        sa.Column("transaction_number", sa.String(length=100), nullable=True),
+        sa.Column("transaction_date", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("total_amount", sa.Numeric(10, 3), nullable=False),
+        sa.Column("customer_external_id", sa.String(length=100), nullable=True),
+        sa.Column("status", sa.String(length=20), nullable=True),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("document_type", sa.String(length=20), nullable=True),
+        _id(),
+        _created_at(),
+        _updated_at(),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_transactions_id", "transactions", ["id"])
+    op.create_index("ix_transactions_transaction_number", "transactions", ["transaction_number"], unique=True)
+
+    # Sin created_at/updated_at (el modelo los anulaba)
+    op.create_table(
+        "transaction_items",
+        sa.Column("transaction_id", sa.Integer(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("sku", sa.String(length=50), nullable=True),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("unit_price", sa.Numeric(10, 3), nullable=False),
+        sa.Column("discount", sa.Numeric(10, 3), nullable=True),
+        sa.Column("total_price", sa.Numeric(10, 3), nullable=False),
+        _id(),
+        sa.ForeignKeyConstraint(["transaction_id"], ["transactions.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_transaction_items_id", "transaction_items", ["id"])
+
+    op.create_table(
+        "transaction_payments",
+        sa.Column("transaction_id", sa.Integer(), nullable=False),
+        sa.Column("payment_method", sa.String(length=50), nullable=False),
+        sa.Column("amount", sa.Numeric(10, 3), nullable=False),
+        sa.Column("provider", sa.String(length=100), nullable=True),
+        _created_at(),
+        _id(),
+        sa.ForeignKeyConstraint(["transaction_id"], ["transactions.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_transaction_payments_id", "transaction_payments", ["id"])
+
+    op.create_table(
+        "transaction_tsl_data",
+        sa.Column("transaction_id", sa.Integer(), nullable=False),
+        sa.Column("tsl_data", sa.Text(), nullable=True),
+        sa.Column("is_tsl_data_valid", sa.Boolean(), nullable=True),
+        sa.Column("tsl_data_validation_message", sa.Text(), nullable=True),
+        sa.Column("tsl_data_validation_status", sa.String(length=20), nullable=True),
+        sa.Column("tsl_data_validation_date", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_tsl_data_sent", sa.Boolean(), nullable=True),
+        sa.Column("tsl_data_sent_date", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("tsl_data_sent_message", sa.Text(), nullable=True),
+        sa.Column("tsl_data_sent_status", sa.String(length=20), nullable=True),
+        _id(),
+        _created_at(),
+        sa.ForeignKeyConstraint(["transaction_id"], ["transactions.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_transaction_tsl_data_id", "transaction_tsl_data", ["id"])
+
+
+def downgrade() -> None:
+    for table in (
+        "transaction_tsl_data", "transaction_payments", "transaction_items", "transactions",
+        "products", "categories", "users",
+    ):
+        op.drop_table(table)
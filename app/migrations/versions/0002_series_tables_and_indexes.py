@@ -0,0 +1,133 @@
+"""Tablas e indices nuevos: reglas de impuestos, diccionarios TSL, revocaciones, jobs y listados
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-07-08 00:00:00
+
+Solo agrega objetos nuevos. Las bases que ya los crearon con create_all (antes de las
+migraciones) se saltan lo que ya existe.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.migrations import has_index, has_table
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (tabla, indice, columnas, unico) para tablas existentes
+_INDEXES = (
+    # Listado por tienda/fecha con paginacion keyset
+    ("transactions", "ix_transactions_store_date_id", ["store_id", "transaction_date", "id"], False),
+    # Venta original de una devolucion (services/return_lookup)
+    ("transactions", "ix_transactions_origin_lookup", ["store_id", "pos_id", "transaction_number", "transaction_date"], False),
+    ("transaction_items", "ix_transaction_items_transaction_id_id", ["transaction_id", "id"], False),
+    ("transaction_tsl_data", "ix_transaction_tsl_data_sent_status_id", ["tsl_data_sent_status", "id"], False),
+    ("transaction_tsl_data", "ix_transaction_tsl_data_validation_status_id", ["tsl_data_validation_status", "id"], False),
+)
+
+
+def _base_columns() -> list:
+    return [
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    if not has_table(bind, "tax_rules"):
+        op.create_table(
+            "tax_rules",
+            sa.Column("category_id", sa.Integer(), nullable=True),
+            sa.Column("tax_code", sa.String(length=2), nullable=False),
+            sa.Column("rate", sa.Integer(), nullable=False),
+            sa.Column("applies_to", sa.String(length=10), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            *_base_columns(),
+            sa.ForeignKeyConstraint(["category_id"], ["categories.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_tax_rules_id", "tax_rules", ["id"])
+        op.create_index("ix_tax_rules_category_id", "tax_rules", ["category_id"])
+
+    if not has_table(bind, "tsl_compression_dictionaries"):
+        op.create_table(
+            "tsl_compression_dictionaries",
+            sa.Column("store_id", sa.String(length=255), nullable=False),
+            sa.Column("codec", sa.String(length=10), nullable=False),
+            sa.Column("data", sa.LargeBinary(), nullable=False),
+            sa.Column("sample_count", sa.Integer(), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            *_base_columns(),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_tsl_compression_dictionaries_id", "tsl_compression_dictionaries", ["id"])
+        op.create_index("ix_tsl_compression_dictionaries_store_id", "tsl_compression_dictionaries", ["store_id"])
+
+    if not has_table(bind, "revoked_tokens"):
+        op.create_table(
+            "revoked_tokens",
+            sa.Column("jti", sa.String(length=64), nullable=True),
+            sa.Column("username", sa.String(length=50), nullable=False),
+            sa.Column("revoked_before", sa.Integer(), nullable=True),
+            sa.Column("expires_at", sa.Integer(), nullable=False),
+            sa.Column("reason", sa.String(length=20), nullable=True),
+            *_base_columns(),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("jti"),
+        )
+        op.create_index("ix_revoked_tokens_id", "revoked_tokens", ["id"])
+        op.create_index("ix_revoked_tokens_username", "revoked_tokens", ["username"])
+        op.create_index("ix_revoked_tokens_expires_at", "revoked_tokens", ["expires_at"])
+
+    if not has_table(bind, "conversion_jobs"):
+        op.create_table(
+            "conversion_jobs",
+            sa.Column("job_id", sa.String(length=32), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("store_id", sa.String(length=255), nullable=True),
+            sa.Column("pos_id", sa.String(length=50), nullable=True),
+            sa.Column("transaction_number", sa.String(length=100), nullable=False),
+            sa.Column("payload", sa.Text(), nullable=False),
+            sa.Column("status", sa.String(length=20), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("worker", sa.String(length=100), nullable=True),
+            sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("transaction_id", sa.Integer(), nullable=True),
+            sa.Column("error", sa.Text(), nullable=True),
+            *_base_columns(),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("job_id"),
+        )
+        op.create_index("ix_conversion_jobs_id", "conversion_jobs", ["id"])
+        op.create_index("ix_conversion_jobs_status_id", "conversion_jobs", ["status", "id"])
+
+    if not has_table(bind, "transaction_numbers"):
+        op.create_table(
+            "transaction_numbers",
+            sa.Column("transaction_number", sa.String(length=100), nullable=False),
+            sa.Column("transaction_id", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.PrimaryKeyConstraint("transaction_number"),
+        )
+
+    for table, index, columns, unique in _INDEXES:
+        if not has_index(bind, table, index):
+            op.create_index(index, table, columns, unique=unique)
+
+
+def downgrade() -> None:
+    for table, index, _, _ in reversed(_INDEXES):
+        op.drop_index(index, table_name=table)
+    for table in ("transaction_numbers", "conversion_jobs", "revoked_tokens", "tsl_compression_dictionaries", "tax_rules"):
+        op.drop_table(table)
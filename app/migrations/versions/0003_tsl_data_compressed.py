@@ -0,0 +1,51 @@
+"""Payload TSL comprimido: columna transaction_tsl_data.tsl_data_compressed
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-07-08 00:00:00
+
+La columna de texto tsl_data se conserva: las filas existentes se siguen leyendo desde ahi
+(propiedad TransactionTSLData.tsl_data) y solo las nuevas se guardan comprimidas.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.migrations import has_column
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_tsl_data = sa.table(
+    "transaction_tsl_data",
+    sa.column("id", sa.Integer),
+    sa.column("tsl_data", sa.Text),
+    sa.column("tsl_data_compressed", sa.LargeBinary),
+)
+
+
+def upgrade() -> None:
+    if not has_column(op.get_bind(), "transaction_tsl_data", "tsl_data_compressed"):
+        op.add_column("transaction_tsl_data", sa.Column("tsl_data_compressed", sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    from app.services import tsl_compression
+
+    # Las filas comprimidas vuelven a la columna de texto antes de eliminar la columna
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(_tsl_data.c.id, _tsl_data.c.tsl_data_compressed)
+        .where(_tsl_data.c.tsl_data_compressed.is_not(None))
+    ).all()
+    for row_id, blob in rows:
+        bind.execute(
+            _tsl_data.update().where(_tsl_data.c.id == row_id)
+            .values(tsl_data=tsl_compression.decompress(blob, bind), tsl_data_compressed=None)
+        )
+    with op.batch_alter_table("transaction_tsl_data") as batch:
+        batch.drop_column("tsl_data_compressed")
@@ -0,0 +1,39 @@
+"""Fecha de creacion de las lineas: columna transaction_items.created_at
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-07-08 00:00:00
+
+Las lineas existentes toman la fecha de su transaccion, asi quedan en el mismo mes al
+particionar y archivar.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.migrations import has_column
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if has_column(op.get_bind(), "transaction_items", "created_at"):
+        return
+    op.add_column("transaction_items", sa.Column("created_at", sa.DateTime(timezone=True), nullable=True))
+    op.execute(
+        "UPDATE transaction_items SET created_at = ("
+        "SELECT transactions.created_at FROM transactions WHERE transactions.id = transaction_items.transaction_id)"
+    )
+    # SQLite no agrega columnas con un default no constante: se fija despues (recreando la tabla)
+    with op.batch_alter_table("transaction_items") as batch:
+        batch.alter_column("created_at", existing_type=sa.DateTime(timezone=True), server_default=sa.func.now())
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("transaction_items") as batch:
+        batch.drop_column("created_at")
@@ -0,0 +1,35 @@
+"""Tablas de transacciones particionadas por mes (PostgreSQL con DB_PARTITIONING)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-07-08 00:00:00
+
+Convierte transactions, transaction_items, transaction_payments y transaction_tsl_data en
+tablas particionadas por mes de created_at, copiando las filas existentes, y llena
+transaction_numbers (ver app.partitioning.partition_existing_tables). En otros motores, o sin
+DB_PARTITIONING, no hace nada; si el particionado se activa despues de migrar, se aplica con
+`python -m app.partitioning partition`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app import partitioning
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if partitioning.partitioning_enabled(bind):
+        partitioning.partition_existing_tables(bind)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql" and partitioning.is_partitioned(bind, "transactions"):
+        raise RuntimeError("Partitioned transaction tables cannot be converted back by a downgrade")
@@ -0,0 +1,27 @@
+"""Lineas sin producto del catalogo: transaction_items.product_id acepta NULL
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-07-08 00:00:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("transaction_items") as batch:
+        batch.alter_column("product_id", existing_type=sa.Integer(), nullable=True)
+
+
+def downgrade() -> None:
+    # Falla si ya hay lineas sin producto: deben asociarse a un producto o eliminarse antes
+    with op.batch_alter_table("transaction_items") as batch:
+        batch.alter_column("product_id", existing_type=sa.Integer(), nullable=False)
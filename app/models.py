@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, JSON, Numeric
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, JSON, Numeric, Index, LargeBinary, event, insert, select
+from sqlalchemy.orm import relationship, deferred, object_session
 from sqlalchemy.sql import func
+from .config import settings
 from .database import Base
 
 class BaseModel(Base):
@@ -70,6 +71,60 @@ class Product(BaseModel):
     category = relationship("Category", back_populates="products")
 
 
+class TaxRule(BaseModel):
+    __tablename__ = "tax_rules"
+
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True, index=True)  # NULL = aplica a todas las categorias
+    tax_code = Column(String(2), nullable=False)  # Codimp del TSL: 00 = IVA, 01 = Exento, etc.
+    rate = Column(Integer, nullable=False)  # Formato XXXY (190 = 19%)
+    applies_to = Column(String(10), default="ticket")  # item (Aplica = 1), ticket (Aplica = 2)
+    is_active = Column(Boolean, default=True)
+
+
+class TSLCompressionDictionary(BaseModel):
+    __tablename__ = "tsl_compression_dictionaries"
+
+    store_id = Column(String(255), nullable=False, index=True)
+    codec = Column(String(10), nullable=False)  # zlib, zstd
+    data = Column(LargeBinary, nullable=False)
+    sample_count = Column(Integer, default=0)
+    is_active = Column(Boolean, default=True)  # Solo el activo se usa para comprimir; los demas para leer filas antiguas
+
+
+class RevokedToken(BaseModel):
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), unique=True, nullable=True)  # NULL = revoca todos los tokens del usuario
+    username = Column(String(50), nullable=False, index=True)
+    revoked_before = Column(Integer, nullable=True)  # Tokens del usuario con iat <= revoked_before (epoch)
+    expires_at = Column(Integer, nullable=False, index=True)  # Epoch desde el que la fila ya no se necesita
+    reason = Column(String(20))  # logout, refresh, disabled
+
+
+class ConversionJob(BaseModel):
+    """Conversion asincrona (POST /convert-transaction/jobs) encolada para los workers de conversion_jobs"""
+    __tablename__ = "conversion_jobs"
+
+    job_id = Column(String(32), unique=True, nullable=False)  # Id publico (uuid4 hex)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    store_id = Column(String(255), nullable=True)
+    pos_id = Column(String(50), nullable=True)
+    transaction_number = Column(String(100), nullable=False)
+    payload = deferred(Column(Text, nullable=False))  # Cuerpo validado (TransactionTSLRequest en JSON)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    worker = Column(String(100))  # Worker que lo tomo por ultima vez
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    transaction_id = Column(Integer)  # Transaccion creada (sin FK: transactions puede estar particionada)
+    error = Column(Text)
+
+    __table_args__ = (
+        # Los workers toman los jobs por estado en orden de llegada
+        Index("ix_conversion_jobs_status_id", "status", "id"),
+    )
+
+
 class Transaction(BaseModel):
     __tablename__ = "transactions"
 
@@ -92,6 +147,13 @@ class Transaction(BaseModel):
     payments = relationship("TransactionPayment", back_populates="transaction", cascade="all, delete-orphan")
     tsl_data = relationship("TransactionTSLData", back_populates="transaction", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Listado por tienda/fecha con paginacion keyset
+        Index("ix_transactions_store_date_id", "store_id", "transaction_date", "id"),
+        # Venta original de una devolucion (services/return_lookup)
+        Index("ix_transactions_origin_lookup", "store_id", "pos_id", "transaction_number", "transaction_date"),
+    )
+    
     def model_dump(self):
         return {
             "id": self.id,
@@ -110,11 +172,39 @@ class Transaction(BaseModel):
         }
 
 
+class TransactionNumber(Base):
+    """Unicidad global de transaction_number cuando transactions esta particionada (ver _guard_transaction_number)"""
+    __tablename__ = "transaction_numbers"
+
+    transaction_number = Column(String(100), primary_key=True)
+    transaction_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+@event.listens_for(Transaction, "after_insert")
+def _guard_transaction_number(mapper, connection, target):
+    """
+    Registrar el transaction_number en transaction_numbers (unico global) cuando transactions
+    esta particionada: la tabla particionada no puede tener un indice unico sin created_at.
+    Se registra al importar los modelos, asi aplica en la API, los workers de jobs y los CLI.
+    """
+    if not settings.db_partitioning or connection.dialect.name != "postgresql":
+        return
+    if target.transaction_number is None:
+        return
+    connection.execute(
+        insert(TransactionNumber).values(
+            transaction_number=target.transaction_number,
+            transaction_id=target.id,
+        )
+    )
+
+
 class TransactionItem(BaseModel):
     __tablename__ = "transaction_items"
 
     transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="CASCADE"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=True)  # NULL si el producto no esta en el catalogo
     sku = Column(String(50), nullable=True)  # Product SKU for reference
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Numeric(10, 3), nullable=False)
@@ -125,7 +215,11 @@ class TransactionItem(BaseModel):
     transaction = relationship("Transaction", back_populates="items")
     product = relationship("Product", back_populates="transaction_items")
     
-    created_at = None
+    __table_args__ = (
+        # Lineas de una transaccion en orden (posicion de la linea original en devoluciones)
+        Index("ix_transaction_items_transaction_id_id", "transaction_id", "id"),
+    )
+    
     updated_at = None
     
     def model_dump(self):
@@ -138,7 +232,7 @@ class TransactionItem(BaseModel):
             "unit_price": self.unit_price,
             "discount": self.discount,
             "total_price": self.total_price,
-            "transaction": self.transaction.model_dump(),
+            # Solo el id de la transaccion: volcarla completa recorre items -> transaccion -> items sin fin
             "product": self.product.model_dump()
         }
 
@@ -169,7 +263,10 @@ class TransactionTSLData(BaseModel):
     __tablename__ = "transaction_tsl_data"
 
     transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="CASCADE"), nullable=False)
-    tsl_data = Column(Text, nullable=True)
+    # Payload sin comprimir: solo filas anteriores a la compresion. Usar la propiedad tsl_data.
+    tsl_data_text = deferred(Column("tsl_data", Text, nullable=True))
+    # Payload comprimido (ver services.tsl_compression); se carga y descomprime solo al leer tsl_data
+    tsl_data_compressed = deferred(Column(LargeBinary, nullable=True))
     is_tsl_data_valid = Column(Boolean, default=False)
     tsl_data_validation_message = Column(Text, nullable=True)
     tsl_data_validation_status = Column(String(20), default="pending")  # pending, valid, invalid
@@ -181,9 +278,36 @@ class TransactionTSLData(BaseModel):
 
     # Relaciones
     transaction = relationship("Transaction", back_populates="tsl_data")
+    
+    __table_args__ = (
+        # Busqueda de filas no enviadas / invalidas con paginacion keyset
+        Index("ix_transaction_tsl_data_sent_status_id", "tsl_data_sent_status", "id"),
+        Index("ix_transaction_tsl_data_validation_status_id", "tsl_data_validation_status", "id"),
+    )
 
     updated_at = None
     
+    @property
+    def tsl_data(self):
+        """Payload TSL; se descomprime la primera vez que se lee"""
+        if "_tsl_data_value" not in self.__dict__:
+            blob = self.tsl_data_compressed
+            if blob is not None:
+                from .services import tsl_compression
+                session = object_session(self)
+                value = tsl_compression.decompress(blob, session.connection() if session is not None else None)
+            else:
+                value = self.tsl_data_text
+            self.__dict__["_tsl_data_value"] = value
+        return self.__dict__["_tsl_data_value"]
+    
+    @tsl_data.setter
+    def tsl_data(self, value):
+        # Se comprime al hacer flush, cuando se conoce la tienda (ver _compress_tsl_data)
+        self.__dict__["_tsl_data_value"] = value
+        self.__dict__["_tsl_data_pending"] = True
+        self.tsl_data_text = None
+    
     def model_dump(self):
         return {
             "id": self.id,
@@ -197,4 +321,33 @@ class TransactionTSLData(BaseModel):
             "tsl_data_sent_date": self.tsl_data_sent_date,
             "tsl_data_sent_message": self.tsl_data_sent_message,
             "tsl_data_sent_status": self.tsl_data_sent_status,
-        }
\ No newline at end of file
+        }
+
+
+@event.listens_for(TransactionTSLData, "before_insert")
+@event.listens_for(TransactionTSLData, "before_update")
+def _compress_tsl_data(mapper, connection, target):
+    """Comprimir el payload asignado a tsl_data con el diccionario activo de la tienda"""
+    if not target.__dict__.pop("_tsl_data_pending", False):
+        return
+    value = target.__dict__["_tsl_data_value"]
+    if value is None:
+        target.tsl_data_compressed = None
+        return
+    from .services import tsl_compression
+    # No se usa el lazy load de la relacion durante el flush
+    transaction = target.__dict__.get("transaction")
+    if transaction is not None:
+        store_id = transaction.store_id
+    elif target.transaction_id is not None:
+        store_id = connection.execute(select(Transaction.store_id).where(Transaction.id == target.transaction_id)).scalar()
+    else:
+        store_id = None
+    target.tsl_data_compressed = tsl_compression.compress(value, store_id, connection)
+
+
+@event.listens_for(TransactionTSLData, "expire")
+@event.listens_for(TransactionTSLData, "refresh")
+def _clear_tsl_data_cache(target, *args):
+    if target is not None:
+        target.__dict__.pop("_tsl_data_value", None)
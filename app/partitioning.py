@@ -0,0 +1,358 @@
+from datetime import date, datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+import argparse
+import csv
+import gzip
+import logging
+import os
+import re
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+
+from . import models
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tablas particionadas por mes de created_at (hora de insercion en el servidor). transaction_date
+# viene del POS, puede ser nula o atrasada, y no sirve para decidir que mes archivar.
+PARTITION_COLUMN = "created_at"
+PARTITIONED_TABLES = (
+    models.Transaction.__table__,
+    models.TransactionItem.__table__,
+    models.TransactionPayment.__table__,
+    models.TransactionTSLData.__table__,
+)
+_PARTITIONED_NAMES = {table.name for table in PARTITIONED_TABLES}
+
+_PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+
+def partitioning_enabled(engine: Engine) -> bool:
+    """El particionado solo aplica a PostgreSQL con DB_PARTITIONING activado"""
+    return settings.db_partitioning and engine.dialect.name == "postgresql"
+
+
+def add_months(month: date, count: int) -> date:
+    """Primer dia del mes `count` meses despues (o antes, si es negativo) de `month`"""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_start(value: Optional[datetime] = None) -> date:
+    value = value or datetime.now(timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def partition_name(table_name: str, month: date) -> str:
+    return f"{table_name}_p{month.year:04d}{month.month:02d}"
+
+
+def create_schema(engine: Engine) -> None:
+    """
+    Crear o actualizar el esquema con las migraciones (app/migrations) y, en PostgreSQL con
+    particionado, crear las particiones del mes actual y de los proximos meses.
+    """
+    from .migrations import create_schema as upgrade_schema
+    upgrade_schema(engine)
+    ensure_partitions(engine)
+
+
+def is_partitioned(conn, table_name: str) -> bool:
+    """Si la tabla ya es una tabla particionada de PostgreSQL"""
+    return conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table_name}
+    ).scalar() is True
+
+
+def create_partitioned_tables(conn) -> None:
+    """Crear las tablas de transacciones particionadas por mes, con su particion DEFAULT e indices"""
+    for table in PARTITIONED_TABLES:
+        conn.execute(text(_partitioned_table_ddl(table, conn.dialect)))
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {table.name}_default PARTITION OF {table.name} DEFAULT"
+        ))
+        for index in table.indexes:
+            columns = ", ".join(column.name for column in index.columns)
+            # Un indice unico en una tabla particionada debe incluir la columna de particion:
+            # la unicidad global de transaction_number la garantiza transaction_numbers (ver models)
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index.name} ON {table.name} ({columns})"))
+
+
+def partition_existing_tables(conn, months_ahead: Optional[int] = None) -> bool:
+    """
+    Convertir las tablas de transacciones en tablas particionadas por mes (migracion 0005 o
+    `python -m app.partitioning partition`). Cada tabla se renombra con sus indices y secuencia,
+    se crea la particionada con particiones para los meses con filas y los proximos, se copian
+    las filas y se elimina la anterior. transaction_numbers se llena con los numeros existentes.
+    Retorna False si las tablas ya estaban particionadas.
+    """
+    if is_partitioned(conn, models.Transaction.__table__.name):
+        return False
+
+    for table in PARTITIONED_TABLES:
+        _rename_to_legacy(conn, table.name)
+    create_partitioned_tables(conn)
+
+    oldest = min(
+        (value for value in (
+            conn.execute(text(f"SELECT MIN({PARTITION_COLUMN}) FROM {table.name}_legacy")).scalar()
+            for table in PARTITIONED_TABLES
+        ) if value is not None),
+        default=None,
+    )
+    months_ahead = settings.partition_months_ahead if months_ahead is None else months_ahead
+    last = add_months(month_start(), months_ahead)
+    month = month_start(oldest) if oldest is not None else month_start()
+    months = []
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    # Las particiones se crean antes de copiar: con filas del mes en DEFAULT ya no se podrian crear
+    _create_month_partitions(conn, months)
+
+    for table in PARTITIONED_TABLES:
+        columns = [column.name for column in table.columns]
+        selected = [
+            f"COALESCE({name}, now())" if name == PARTITION_COLUMN else name for name in columns
+        ]
+        conn.execute(text(
+            f"INSERT INTO {table.name} ({', '.join(columns)}) "
+            f"SELECT {', '.join(selected)} FROM {table.name}_legacy"
+        ))
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), COALESCE(MAX(id), 0) + 1, false) "
+            f"FROM {table.name}"
+        ))
+    for table in reversed(PARTITIONED_TABLES):
+        conn.execute(text(f"DROP TABLE {table.name}_legacy CASCADE"))
+
+    # La tabla particionada no tiene indice unico en transaction_number (ver models._guard_transaction_number)
+    conn.execute(text(
+        f"INSERT INTO {models.TransactionNumber.__table__.name} (transaction_number, transaction_id) "
+        f"SELECT transaction_number, id FROM {models.Transaction.__table__.name} "
+        "WHERE transaction_number IS NOT NULL ON CONFLICT DO NOTHING"
+    ))
+    logger.info("Partitioned tables: %s", ", ".join(table.name for table in PARTITIONED_TABLES))
+    return True
+
+
+def _rename_to_legacy(conn, table_name: str) -> None:
+    # Los nombres de indices y secuencias son globales al esquema: se liberan para la tabla nueva
+    indexes = conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table"
+    ), {"table": table_name}).scalars().all()
+    for index in indexes:
+        conn.execute(text(f"ALTER INDEX {index} RENAME TO {index}_legacy"))
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table_name}).scalar()
+    if sequence is not None:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {table_name}_legacy_id_seq"))
+    conn.execute(text(f"ALTER TABLE {table_name} RENAME TO {table_name}_legacy"))
+
+
+def _partitioned_table_ddl(table, dialect) -> str:
+    """CREATE TABLE ... PARTITION BY RANGE generado desde la metadata del modelo"""
+    definitions = [str(CreateColumn(column).compile(dialect=dialect)) for column in table.columns]
+    primary_key = [column.name for column in table.primary_key.columns] + [PARTITION_COLUMN]
+    definitions.append(f"PRIMARY KEY ({', '.join(primary_key)})")
+    for constraint in table.foreign_key_constraints:
+        # No se puede referenciar una tabla particionada sin incluir su columna de particion;
+        # las filas hijas se archivan junto con su transaccion (mismo mes de created_at)
+        if constraint.referred_table.name in _PARTITIONED_NAMES:
+            continue
+        columns = ", ".join(element.parent.name for element in constraint.elements)
+        referred = ", ".join(element.column.name for element in constraint.elements)
+        definitions.append(f"FOREIGN KEY ({columns}) REFERENCES {constraint.referred_table.name} ({referred})")
+    return (
+        f"CREATE TABLE IF NOT EXISTS {table.name} (\n    " + ",\n    ".join(definitions) + "\n)"
+        f" PARTITION BY RANGE ({PARTITION_COLUMN})"
+    )
+
+
+def existing_partitions(conn, table_name: str) -> List[date]:
+    """Meses con particion creada para la tabla (sin la particion DEFAULT)"""
+    rows = conn.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table"
+    ), {"table": table_name}).scalars()
+    months = []
+    for name in rows:
+        match = _PARTITION_NAME.match(name)
+        if match and match.group("table") == table_name:
+            months.append(date(int(match.group("year")), int(match.group("month")), 1))
+    return sorted(months)
+
+
+def ensure_partitions(engine: Engine, months_ahead: Optional[int] = None) -> List[str]:
+    """Crear las particiones del mes actual y de los proximos `months_ahead` meses"""
+    if not partitioning_enabled(engine):
+        return []
+    months_ahead = settings.partition_months_ahead if months_ahead is None else months_ahead
+    current = month_start()
+    with engine.begin() as conn:
+        if not is_partitioned(conn, models.Transaction.__table__.name):
+            raise RuntimeError(
+                "DB_PARTITIONING is enabled but the transaction tables are not partitioned; "
+                "run: python -m app.partitioning partition"
+            )
+        created = _create_month_partitions(conn, [add_months(current, offset) for offset in range(months_ahead + 1)])
+    if created:
+        logger.info("Created partitions: %s", ", ".join(created))
+    return created
+
+
+def _create_month_partitions(conn, months: Iterable[date]) -> List[str]:
+    created = []
+    for table in PARTITIONED_TABLES:
+        existing = set(existing_partitions(conn, table.name))
+        for month in months:
+            if month in existing:
+                continue
+            name = partition_name(table.name, month)
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF {table.name} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            ))
+            created.append(name)
+    return created
+
+
+def archive_path(table_name: str, month: date) -> str:
+    return os.path.join(settings.archive_dir, table_name, f"{table_name}_{month.year:04d}_{month.month:02d}.csv.gz")
+
+
+def archive_before(engine: Engine, cutoff: Optional[date] = None) -> List[str]:
+    """
+    Archivar los meses anteriores a `cutoff` (por defecto, ARCHIVE_RETENTION_MONTHS atras):
+    cada mes se exporta a un CSV comprimido por tabla y se elimina de la base de datos.
+
+    En PostgreSQL particionado se desprende la particion (DETACH), se exporta con COPY y se
+    elimina con DROP, sin tocar los indices ni el vacuum de la tabla activa. En otros motores
+    (SQLite en pruebas) se exportan y borran las filas del mes.
+    """
+    cutoff = cutoff or add_months(month_start(), -settings.archive_retention_months)
+    if partitioning_enabled(engine):
+        return _archive_partitions(engine, cutoff)
+    return _archive_rows(engine, cutoff)
+
+
+def _archive_partitions(engine: Engine, cutoff: date) -> List[str]:
+    archived = []
+    with engine.connect() as conn:
+        months = sorted({
+            month
+            for table in PARTITIONED_TABLES
+            for month in existing_partitions(conn, table.name)
+            if month < cutoff
+        })
+    for month in months:
+        for table in PARTITIONED_TABLES:
+            name = partition_name(table.name, month)
+            with engine.begin() as conn:
+                if month in existing_partitions(conn, table.name):
+                    conn.execute(text(f"ALTER TABLE {table.name} DETACH PARTITION {name}"))
+                # Una corrida anterior pudo desprenderla y fallar antes del DROP
+                elif conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is None:
+                    continue
+            # La particion desprendida ya no es visible en la tabla; se elimina solo si se exporto
+            path = archive_path(table.name, month)
+            raw = engine.raw_connection()
+            try:
+                with _open_archive(path) as output, raw.cursor() as cursor:
+                    cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER true)", output)
+                raw.commit()
+            finally:
+                raw.close()
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE {name}"))
+            archived.append(path)
+            logger.info("Archived partition %s to %s", name, path)
+    return archived
+
+
+def _archive_rows(engine: Engine, cutoff: date) -> List[str]:
+    archived = []
+    column = PARTITION_COLUMN
+    with engine.connect() as conn:
+        oldest = conn.execute(
+            text(f"SELECT MIN({column}) FROM {models.Transaction.__table__.name}")
+        ).scalar()
+    if oldest is None:
+        return archived
+    if isinstance(oldest, str):
+        oldest = datetime.fromisoformat(oldest)
+
+    month = month_start(oldest)
+    while month < cutoff:
+        bounds = {"start": month.isoformat(), "end": add_months(month, 1).isoformat()}
+        # Hijas antes que la transaccion, por las claves foraneas
+        for table in reversed(PARTITIONED_TABLES):
+            with engine.begin() as conn:
+                where = f"WHERE {column} >= :start AND {column} < :end"
+                result = conn.execute(text(f"SELECT * FROM {table.name} {where}"), bounds)
+                path = archive_path(table.name, month)
+                if _write_csv(path, result.keys(), result):
+                    conn.execute(text(f"DELETE FROM {table.name} {where}"), bounds)
+                    archived.append(path)
+        month = add_months(month, 1)
+    return archived
+
+
+def _open_archive(path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return gzip.open(path, "wt", encoding="utf-8", newline="")
+
+
+def _write_csv(path: str, header: Iterable[str], rows: Iterable[Tuple]) -> int:
+    """Escribir filas a un CSV comprimido, solo si hay filas. Retorna la cantidad escrita."""
+    count = 0
+    output = None
+    try:
+        for row in rows:
+            if output is None:
+                output = _open_archive(path)
+                writer = csv.writer(output)
+                writer.writerow(header)
+            # Binarios en el mismo formato hexadecimal que COPY de PostgreSQL (\x...)
+            writer.writerow([
+                "\\x" + bytes(value).hex() if isinstance(value, (bytes, memoryview)) else value
+                for value in row
+            ])
+            count += 1
+    finally:
+        if output is not None:
+            output.close()
+    return count
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Mantenimiento de particiones y archivo de transacciones")
+    parser.add_argument("command", choices=["maintain", "ensure", "archive", "partition"],
+                        help="ensure: crear particiones futuras; archive: archivar meses antiguos; maintain: ambos; "
+                             "partition: particionar las tablas existentes (DB_PARTITIONING activado despues de migrar)")
+    parser.add_argument("--before", type=date.fromisoformat, default=None,
+                        help="Archivar meses anteriores a esta fecha (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    from .database import engine
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "partition":
+        if not partitioning_enabled(engine):
+            raise SystemExit("Partitioning requires PostgreSQL and DB_PARTITIONING=true")
+        with engine.begin() as conn:
+            partition_existing_tables(conn)
+        return
+    if args.command in ("maintain", "ensure"):
+        ensure_partitions(engine)
+    if args.command in ("maintain", "archive"):
+        before = month_start(datetime.combine(args.before, datetime.min.time())) if args.before else None
+        for path in archive_before(engine, before):
+            print(path)
+
+
+if __name__ == "__main__":
+    main()
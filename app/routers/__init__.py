@@ -1,4 +1,4 @@
 from .router import api_router
-from . import transactions
+from . import transactions, listings, catalog, auth, tsl_files, debug
 
-__all__ = ["api_router", "transactions",]
+__all__ = ["api_router", "transactions", "listings", "catalog", "auth", "tsl_files", "debug",]
@@ -0,0 +1,142 @@
+from typing import Optional
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from .. import models, schemas, auth
+from ..config import settings
+from ..services.token_revocation import revocation_list
+from ..services.write_batcher import write_batcher
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["auth"])
+
+
+def _login(db: Session, username: str, password: str) -> models.User:
+    user = auth.authenticate_user(db, username, password)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
+
+
+def _token_pair(username: str) -> dict:
+    return {
+        "access_token": auth.create_access_token({"sub": username}),
+        "refresh_token": auth.create_refresh_token({"sub": username}),
+    }
+
+
+@router.post("/token", response_model=schemas.Token)
+def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    """Login OAuth2 (formulario) para el boton Authorize de /docs"""
+    user = _login(db, form_data.username, form_data.password)
+    return {"access_token": auth.create_access_token({"sub": user.username}), "token_type": "bearer"}
+
+
+@router.post("/login", response_model=schemas.LoginResponse)
+def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
+    """Login con JSON; retorna el usuario con access y refresh token"""
+    user = _login(db, credentials.username, credentials.password)
+    tokens = _token_pair(user.username)
+    return schemas.LoginResponse(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        gender=user.gender,
+        image=user.image,
+        phone=user.phone,
+        **tokens,
+    )
+
+
+@router.post("/refresh", response_model=schemas.RefreshResponse)
+def refresh_tokens(request: schemas.RefreshTokenRequest, db: Session = Depends(get_db)):
+    """Emitir un nuevo par de tokens; el refresh token usado queda revocado (rotacion)"""
+    revocation_list.refresh_if_stale(db)
+    payload = auth.decode_token(request.refresh_token, "refresh")
+    if payload is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user = auth.get_user(db, payload["sub"])
+    if user is None or not user.is_active:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Inactive user")
+    # La revocacion del jti es atomica (unico en revoked_tokens): de dos solicitudes con el mismo
+    # refresh token solo una lo revoca; la otra es un reuso y no recibe tokens
+    if not payload.get("jti") or not revocation_list.revoke_token(payload["jti"], user.username, payload["exp"], "refresh"):
+        logger.warning("Refresh token reuse for user %s", user.username)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    tokens = _token_pair(user.username)
+    return schemas.RefreshResponse(accessToken=tokens["access_token"], refreshToken=tokens["refresh_token"])
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    request: Optional[schemas.RefreshTokenRequest] = None,
+    token: str = Depends(auth.oauth2_scheme),
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Revocar el access token actual y, si se envia, el refresh token"""
+    payload = auth.decode_token(token, "access")
+    if payload is not None and payload.get("jti"):
+        revocation_list.revoke_token(payload["jti"], current_user.username, payload["exp"], "logout")
+    if request is not None:
+        refresh_payload = auth.decode_token(request.refresh_token, "refresh")
+        if refresh_payload is not None and refresh_payload.get("jti") and refresh_payload["sub"] == current_user.username:
+            revocation_list.revoke_token(refresh_payload["jti"], current_user.username, refresh_payload["exp"], "logout")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+def _set_user_active(db: Session, username: str, is_active: bool) -> None:
+    # La escritura la hace el hilo escritor; se libera antes la conexion de la solicitud
+    db.close()
+    updated = write_batcher.run(
+        lambda session: session.query(models.User).filter(models.User.username == username).update(
+            {models.User.is_active: is_active}, synchronize_session=False
+        ),
+        timeout=settings.write_batch_timeout,
+    )
+    if not updated:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+
+@router.post("/users/{username}/disable", status_code=status.HTTP_204_NO_CONTENT)
+def disable_user(
+    username: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Desactivar un usuario y revocar todos sus tokens en todos los workers"""
+    _set_user_active(db, username, False)
+    auth.revoke_user_tokens(username)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post("/users/{username}/enable", status_code=status.HTTP_204_NO_CONTENT)
+def enable_user(
+    username: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Reactivar un usuario; los tokens revocados siguen revocados y debe volver a iniciar sesion"""
+    _set_user_active(db, username, True)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
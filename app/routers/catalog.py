@@ -0,0 +1,56 @@
+from typing import Optional
+import io
+import tempfile
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import get_db
+from .. import models, schemas, auth
+from ..services import catalog_import
+
+router = APIRouter(tags=["catalog"])
+
+# Cuerpos mas grandes que esto pasan de memoria a un archivo temporal
+_SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+
+@router.post("/import", response_model=schemas.CatalogImportReport)
+async def import_catalog(
+    request: Request,
+    file_format: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """
+    Importar productos en bloque desde el cuerpo de la solicitud (CSV con encabezado o NDJSON).
+    El formato se toma de ?format= o del Content-Type (text/csv, application/x-ndjson).
+    """
+    try:
+        file_format = file_format or catalog_import.detect_format(None, request.headers.get("content-type"))
+    except catalog_import.CatalogImportError as e:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+
+    # El cuerpo se recibe en streaming; no se carga completo en memoria
+    with tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_MEMORY) as spool:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > settings.catalog_import_max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Catalog file exceeds {settings.catalog_import_max_bytes} bytes"
+                )
+            spool.write(chunk)
+        spool.seek(0)
+
+        lines = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+        try:
+            # COPY/executemany y el merge son bloqueantes: se ejecutan fuera del event loop
+            return await run_in_threadpool(catalog_import.import_catalog, db, lines, file_format)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid catalog file: {e}")
+        finally:
+            lines.detach()
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+import tracemalloc
+
+from .. import models, auth
+from ..services import memory_profile
+
+router = APIRouter(tags=["debug"])
+
+
+@router.get("/allocations")
+def allocations(
+    limit: int = Query(20, ge=1, le=200),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    diff: bool = Query(False, description="Comparar contra la instantanea de la llamada anterior"),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Sitios con mas memoria asignada en este worker (requiere DEBUG_ALLOCATIONS=true)"""
+    if not tracemalloc.is_tracing():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Allocation tracking is disabled")
+    return memory_profile.top_allocations(limit=limit, group_by=group_by, diff=diff)
@@ -0,0 +1,170 @@
+from datetime import datetime
+from typing import Optional
+import base64
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, selectinload
+
+from ..database import get_read_db
+from .. import models, schemas, auth
+from ..services import tsl_compression
+
+router = APIRouter(tags=["listings"])
+
+MAX_PAGE_SIZE = 500
+
+_TSL_DATA_COLUMNS = (
+    models.TransactionTSLData.id,
+    models.TransactionTSLData.transaction_id,
+    models.TransactionTSLData.is_tsl_data_valid,
+    models.TransactionTSLData.tsl_data_validation_status,
+    models.TransactionTSLData.tsl_data_validation_message,
+    models.TransactionTSLData.tsl_data_validation_date,
+    models.TransactionTSLData.is_tsl_data_sent,
+    models.TransactionTSLData.tsl_data_sent_status,
+    models.TransactionTSLData.tsl_data_sent_message,
+    models.TransactionTSLData.tsl_data_sent_date,
+    models.TransactionTSLData.created_at,
+)
+
+
+def encode_cursor(*values) -> str:
+    """Codificar la ultima clave de la pagina como cursor opaco"""
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _cursor_value(value, kind: type):
+    if kind is datetime:
+        if not isinstance(value, str):
+            raise ValueError("expected an ISO date")
+        return datetime.fromisoformat(value)
+    if kind is int and (isinstance(value, bool) or not isinstance(value, int)):
+        raise ValueError("expected an integer id")
+    return value
+
+
+def decode_cursor(cursor: str, *kinds: type) -> list:
+    """
+    Decodificar un cursor generado por encode_cursor y validar que tenga un valor por cada tipo
+    de `kinds` (datetime desde ISO, int). Un cursor alterado o de otro listado es un 400.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(kinds):
+            raise ValueError(f"cursor must be a list of {len(kinds)} values")
+        return [_cursor_value(value, kind) for value, kind in zip(values, kinds)]
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid cursor: {e}")
+
+
+@router.get("", response_model=schemas.TransactionPage)
+def list_transactions(
+    store_id: str,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    transaction_status: Optional[str] = Query(None, alias="status"),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """
+    Listar transacciones de una tienda ordenadas por fecha, con paginacion keyset sobre
+    el indice (store_id, transaction_date, id). Items y pagos se cargan con selectinload
+    en una consulta por relacion para toda la pagina.
+    """
+    query = (
+        db.query(models.Transaction)
+        .options(selectinload(models.Transaction.items), selectinload(models.Transaction.payments))
+        .filter(models.Transaction.store_id == store_id, models.Transaction.transaction_date.isnot(None))
+    )
+    if date_from is not None:
+        query = query.filter(models.Transaction.transaction_date >= date_from)
+    if date_to is not None:
+        query = query.filter(models.Transaction.transaction_date < date_to)
+    if transaction_status is not None:
+        query = query.filter(models.Transaction.status == transaction_status)
+    if cursor:
+        last_date, last_id = decode_cursor(cursor, datetime, int)
+        query = query.filter(
+            tuple_(models.Transaction.transaction_date, models.Transaction.id) > tuple_(last_date, last_id)
+        )
+
+    rows = (
+        query.order_by(models.Transaction.transaction_date, models.Transaction.id)
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].transaction_date, rows[-1].id)
+
+    return schemas.TransactionPage(
+        data=[schemas.TransactionListEntry.model_validate(row) for row in rows],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/tsl-data", response_model=schemas.TransactionTSLDataPage)
+def list_transaction_tsl_data(
+    sent_status: Optional[str] = None,
+    validation_status: Optional[str] = None,
+    include_payload: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """
+    Listar filas de transaction_tsl_data por estado de envio (p.ej. pending/failed) o de
+    validacion (p.ej. invalid), paginando por id sobre los indices (estado, id).
+    El payload TSL solo se lee si se pide con include_payload.
+    """
+    if (sent_status is None) == (validation_status is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Exactly one of sent_status or validation_status is required"
+        )
+
+    payload_columns = (models.TransactionTSLData.tsl_data_text, models.TransactionTSLData.tsl_data_compressed)
+    columns = _TSL_DATA_COLUMNS + (payload_columns if include_payload else ())
+    query = db.query(*columns)
+    if sent_status is not None:
+        query = query.filter(models.TransactionTSLData.tsl_data_sent_status == sent_status)
+    else:
+        query = query.filter(models.TransactionTSLData.tsl_data_validation_status == validation_status)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        query = query.filter(models.TransactionTSLData.id > last_id)
+
+    rows = query.order_by(models.TransactionTSLData.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+
+    if include_payload:
+        # Se descomprime solo la pagina pedida
+        connection = db.connection()
+        entries = [
+            schemas.TransactionTSLDataEntry.model_validate({
+                **row._mapping,
+                "tsl_data": tsl_compression.decompress(row.tsl_data_compressed, connection)
+                if row.tsl_data_compressed is not None else row.tsl_data_text,
+            })
+            for row in rows
+        ]
+    else:
+        entries = [schemas.TransactionTSLDataEntry.model_validate(row) for row in rows]
+
+    return schemas.TransactionTSLDataPage(
+        data=entries,
+        next_cursor=next_cursor,
+    )
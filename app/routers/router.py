@@ -1,5 +1,10 @@
 from fastapi import APIRouter
-from app.routers import transactions
+from app.routers import transactions, listings, catalog, auth, tsl_files, debug
 api_router = APIRouter()
 
-api_router.include_router(transactions.router, prefix="/convert-transaction")
\ No newline at end of file
+api_router.include_router(auth.router, prefix="/auth")
+api_router.include_router(transactions.router, prefix="/convert-transaction")
+api_router.include_router(listings.router, prefix="/transactions")
+api_router.include_router(catalog.router, prefix="/catalog")
+api_router.include_router(tsl_files.router, prefix="/tsl-files")
+api_router.include_router(debug.router, prefix="/debug")
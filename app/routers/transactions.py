@@ -1,148 +1,312 @@
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime, timezone, timedelta
-from fastapi import APIRouter, Depends, status, Request, HTTPException
-from fastapi.responses import JSONResponse
+from typing import Optional
+import logging
+from fastapi import APIRouter, Depends, status, Request, HTTPException, Header
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from ..config import settings
 from ..database import get_db
 from .. import models, schemas, auth
-from ..services.tsl_converter import TSLConverter, TSLConverterSubstringType
+from ..services.tsl_converter import TSLConverter
+from ..services.tsl_writer import TSLFileWriter
+from ..services.product_index import product_index
+from ..services.tax_engine import tax_engine
+from ..services.conversion_pool import ConversionTimeout, conversion_pool
+from ..services import tsl_conversion
+from ..services.admission import admission_controller, AdmissionRejected
+from ..services.transaction_store import conversion_write_unit, is_duplicate_transaction_number
+from ..services.write_batcher import write_batcher
+from ..services.shared_cache import shared_cache
+from ..services import conversion_jobs, return_lookup, structured_logging, wire_format
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["transactions"])
 
+IDEMPOTENCY_CACHE_NAMESPACE = "idempotency"
 
-@router.post("", response_model=schemas.Transaction, status_code=status.HTTP_201_CREATED)
-def convert_transaction_tsl(
-    transaction: schemas.TransactionTSLRequest,
-    db: Session = Depends(get_db),
+# El cuerpo se decodifica en transaction_request; se documenta aqui porque no es un parametro Body
+_TRANSACTION_REQUEST_SCHEMA = schemas.TransactionTSLRequest.model_json_schema()
+_CONVERSION_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            wire_format.JSON_MEDIA_TYPE: {"schema": _TRANSACTION_REQUEST_SCHEMA},
+            wire_format.MSGPACK_MEDIA_TYPE: {"schema": _TRANSACTION_REQUEST_SCHEMA},
+        },
+    }
+}
+
+
+def _admission_exception(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+
+def admission_slot():
+    """Reservar un cupo de solicitudes en curso antes de tocar la base de datos"""
+    try:
+        admission_controller.acquire_slot()
+    except AdmissionRejected as e:
+        raise _admission_exception(e)
+    try:
+        yield
+    finally:
+        admission_controller.release_slot()
+
+
+async def transaction_request(request: Request) -> schemas.TransactionTSLRequest:
+    """Decodificar el cuerpo de la conversion como JSON o MessagePack, segun Content-Type"""
+    body = await request.body()
+    try:
+        transaction = wire_format.decode(body, request.headers.get("content-type"), schemas.TransactionTSLRequest)
+    except wire_format.UnsupportedMediaType as e:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+    except wire_format.MalformedBody as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ValidationError as e:
+        # Mismo formato de error (422) que la validacion de cuerpos de FastAPI
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+    # Los logs del resto de la solicitud llevan la tienda y el POS del ticket
+    structured_logging.bind(transaction.store_id, transaction.pos_id)
+    return transaction
+
+
+def compact_response(request: Request) -> bool:
+    """Responder en MessagePack segun Accept (o si el cuerpo llego en MessagePack)"""
+    return wire_format.accepts_msgpack(request.headers.get("accept"), request.headers.get("content-type"))
+
+
+def admission_rate_limit(
+    transaction: schemas.TransactionTSLRequest = Depends(transaction_request),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
+    """Aplicar los limites por tienda y por usuario"""
+    try:
+        admission_controller.check_rate_limits(transaction.store_id, current_user.id)
+    except AdmissionRejected as e:
+        raise _admission_exception(e)
+
+
+def _reserve_idempotency_key(scope: str, compact: bool) -> Optional[Response]:
+    """
+    Reservar una Idempotency-Key en la cache compartida. Si la clave ya tiene una respuesta
+    (de cualquier worker) se retorna para repetirla; si otra solicitud la esta procesando, 409.
+    Si no se pudo reservar ni leer (cache no disponible) no se convierte: 503 para reintentar.
+    """
+    cached = shared_cache.get(IDEMPOTENCY_CACHE_NAMESPACE, scope)
+    if cached is None:
+        # La reserva dura lo que puede tardar una conversion (pool de procesos + group commit)
+        pending_ttl = settings.tsl_process_pool_timeout + settings.write_batch_timeout
+        if shared_cache.add(IDEMPOTENCY_CACHE_NAMESPACE, scope, {"pending": True}, ttl=pending_ttl):
+            return None
+        cached = shared_cache.get(IDEMPOTENCY_CACHE_NAMESPACE, scope)
+    if cached is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Idempotency-Key could not be reserved, retry the request",
+            headers={"Retry-After": "1"},
+        )
+    if cached.get("pending"):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is already in progress"
+        )
+    return wire_format.encode(
+        cached["content"], compact, status_code=cached["status_code"], headers={"Idempotent-Replayed": "true"}
+    )
+
+
+def _complete_conversion(transaction, ticket, data: bytes, transaction_id: int, idempotency_scope: Optional[str]) -> dict:
+    """Pasos posteriores al commit: LRU de ventas, archivo TSL y respuesta guardada para la Idempotency-Key"""
+    return_lookup.recent_sales.remember(return_lookup.sale_from_ticket(transaction_id, transaction, ticket))
     
-    data_keys_parse_cabecera = {
-        "Local": "store_id",
-        "POS": "pos_id",
-        "NumTrx": "transaction_number",
-        "Fecha": "transaction_date",
-        "FechaCont": "contable_date",
-        "Hora": "transaction_hour",
-        "Vendedor": "seller_id",
-        "TipoTrx": "transaction_type",
-        "TipoDoc": "document_type",
-        "Total": "total_amount",
-    }
-    
-    data_keys_parse_productos = {
-        "CodProd": "barcode",
-        "Categoria": "category_id",
-        "Cantidad": "quantity",
-        "Precio": "unit_price",
-        "Total": "total",
-        "BrutoPositivo": "total_price",
-    }
-    
-    data_keys_parse_payment_methods = {
-        "CodFP": "payment_method",
-        "Monto": "amount",
-    }
-    
-    data_keys_parse_impuestos = {
-        "Codimp": "impuesto",
-        "Porc": "porcentaje",
-        "Monto": "monto",
-    }
+    TSLFileWriter(TSLConverter.output_path()).write([data])
     
-    data_keys_parse_descuentos = {
-        "CodPromo": "promo_code",
-        "CodDcto": "discount_code",
-        "Porc": "percentage",
-        "Monto": "amount",
-        "Tipo": "type",
+    content = {
+        "status": "success",
+        "message": "Transaction converted successfully",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "transaction_id": transaction_id,
+        "data": data.decode(TSLConverter.ENCODING)
     }
+    if idempotency_scope is not None:
+        shared_cache.set(
+            IDEMPOTENCY_CACHE_NAMESPACE,
+            idempotency_scope,
+            {"status_code": status.HTTP_200_OK, "content": content},
+            ttl=settings.idempotency_ttl,
+        )
+    return content
+
+
+def _complete_when_saved(future, transaction, ticket, data: bytes, idempotency_scope: Optional[str]) -> None:
+    """
+    La solicitud dejo de esperar el commit, pero el lote puede confirmarse despues: al terminar se
+    escribe el archivo TSL y se guarda la respuesta de la Idempotency-Key (un reintento con la
+    misma clave la repite); si el lote falla se libera la reserva. Corre en el hilo escritor.
+    """
+    def done(future) -> None:
+        try:
+            transaction_id = future.result()
+        except Exception as e:
+            logger.warning("Delayed write of transaction %s failed: %s", transaction.transaction_number, e)
+            if idempotency_scope is not None:
+                shared_cache.delete(IDEMPOTENCY_CACHE_NAMESPACE, idempotency_scope)
+            return
+        try:
+            _complete_conversion(transaction, ticket, data, transaction_id, idempotency_scope)
+        except Exception:
+            logger.exception("Could not complete delayed conversion of transaction %s", transaction.transaction_number)
+
+    future.add_done_callback(done)
+
+
+@router.post("", response_model=schemas.Transaction, status_code=status.HTTP_201_CREATED, openapi_extra=_CONVERSION_OPENAPI)
+def convert_transaction_tsl(
+    transaction: schemas.TransactionTSLRequest = Depends(transaction_request),
+    compact: bool = Depends(compact_response),
+    _slot: None = Depends(admission_slot),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user),
+    _rate_limit: None = Depends(admission_rate_limit),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     
-    converter = TSLConverter()
+    idempotency_scope = f"{current_user.id}:{idempotency_key}" if idempotency_key else None
+    if idempotency_scope is not None:
+        replay = _reserve_idempotency_key(idempotency_scope, compact)
+        if replay is not None:
+            return replay
     
-
+    content = None
+    saving = False
     try:
+        product_index.refresh_if_stale(db)
+        tax_engine.refresh_if_stale(db)
         
-        # transaction ya es un objeto Pydantic TransactionTSLRequest, usar directamente
-        transaction_data = transaction.model_dump(mode='json')
-        
-        transaction_data["contable_date"] = transaction.transaction_date.strftime("%Y%m%d")
-        
-        transaction_data["transaction_date"] = transaction.transaction_date.strftime("%Y%m%d")
-        transaction_data["transaction_hour"] = transaction.transaction_date.now().strftime("%H%M%S")
-        transaction_data["seller_id"] = current_user.id
-        
-        transaction_data["total_amount"] = f"{transaction.total_amount:.3f}"
-        
-        ##
-        # Pedido de venta
-        ##
-        # Se asignan los valores de la cabecera
-        converter.assign_value_from_transaction(transaction_data, data_keys_parse_cabecera, TSLConverterSubstringType.CABECERA)
-        
-        # TODO: Definir descuento si aplica a la transaccion completa (monto total de la transaccion)
-        if False:
-            converter.assign_value_from_transaction(transaction_data, data_keys_parse_impuestos, TSLConverterSubstringType.IMPUESTOS)
-        
-        # Se asignan los valores de los productos
-        if not transaction.items:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Transaction must have at least one item")
+        # Devoluciones: venta original desde el LRU de ventas recientes o el indice de origen
+        original = return_lookup.resolve(db, transaction)
+        ticket = tsl_conversion.prepare_ticket(transaction, current_user.id, original)
         
-        for item in transaction.items:
-            # Usar by_alias=False para obtener los nombres de campo en lugar de los alias
-            item_data = item.model_dump(mode='json') if hasattr(item, 'model_dump') else item
-            # Si el item tiene 'sku' pero el mapeo busca 'barcode', usar 'sku' como 'barcode'
-            if 'sku' in item_data and 'barcode' not in item_data:
-                item_data['barcode'] = item_data.get('sku')
-            
-            if 'product' in item_data and 'category_id' in item_data['product']:
-                item_data['category_id'] = item_data['product']['category_id']
-                
-            item_data['total_price'] = item_data['quantity'] * item_data['unit_price']
-            
-            item_data['total_price'] = f"{item_data['total_price']:.3f}"
-            
-            item_data['total'] = f"{item_data['total']:.3f}"
-            item_data['discount'] = f"{item_data['discount']:.3f}"
-            
-            converter.assign_value_from_transaction(item_data, data_keys_parse_productos, TSLConverterSubstringType.PRODUCTOS)
-            #TODO: DEFINIR IMPUESTOS    
-            if False:
-                converter.assign_value_from_transaction(item_data, data_keys_parse_impuestos, TSLConverterSubstringType.IMPUESTOS)
-            #TODO: DEFINIR DESCUENTOS
-            if False:
-                converter.assign_value_from_transaction(item_data, data_keys_parse_descuentos, TSLConverterSubstringType.DESCUENTOS)
-
-        # Se asignan los valores de los pagos
-        if not transaction.payments:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Transaction must have at least one payment")
+        # Tickets grandes se convierten en el pool de procesos; los normales en linea
+        data = conversion_pool.convert(ticket, tax_engine.snapshot())
         
-        for payment in transaction.payments:
-            # Usar by_alias=False para obtener los nombres de campo en lugar de los alias
-            payment_data = payment.model_dump(mode='json') if hasattr(payment, 'model_dump') else payment
-            payment_data['payment_method'] = '01'
-            converter.assign_value_from_transaction(payment_data, data_keys_parse_payment_methods, TSLConverterSubstringType.FORMA_PAGO)
+        # Liberar la conexion de la solicitud: el hilo escritor necesita una del pool mientras esperamos
+        db.close()
         
-        # TODO: Definir el substring de pago
-        if False:
-            converter.assign_value_from_transaction(payment, data_keys_parse_payment_methods, TSLConverterSubstringType.FORMA_PAGO)
-        
-        # TODO: Definir el substring de descuento si aplica a la forma de pago
-        if False:
-            converter.assign_value_from_transaction(payment, data_keys_parse_descuentos, TSLConverterSubstringType.DESCUENTOS)
-        
-        converter.serialize_transaction()
-        converter.save()
+        # Las escrituras de solicitudes concurrentes se confirman juntas en un solo commit
+        future = write_batcher.submit(
+            conversion_write_unit(transaction, current_user.id, ticket, data.decode(TSLConverter.ENCODING))
+        )
+        try:
+            transaction_id = future.result(timeout=settings.write_batch_timeout)
+        except FutureTimeoutError:
+            # No se libera la reserva: el archivo TSL y la respuesta quedan para cuando el lote termine
+            saving = True
+            _complete_when_saved(future, transaction, ticket, data, idempotency_scope)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Transaction {transaction.transaction_number} is still being saved; "
+                       "retry with the same Idempotency-Key to get the result",
+                headers={"Retry-After": "1"},
+            )
         
-        return JSONResponse(
-            status_code=status.HTTP_200_OK,
-            content={
-                "status": "success",
-                "message": "Transaction converted successfully",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "data": converter.value_converter
-            }
+        content = _complete_conversion(transaction, ticket, data, transaction_id, idempotency_scope)
+        return wire_format.encode(content, compact, status_code=status.HTTP_200_OK)
+    except tsl_conversion.InvalidTicket as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ConversionTimeout as e:
+        # Nada se guardo: el cliente puede reintentar cuando el pool se descongestione
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "5"})
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        if is_duplicate_transaction_number(e):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Transaction {transaction.transaction_number} already exists"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Transaction {transaction.transaction_number} violates a data constraint: {e.orig}"
         )
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Error assigning value from transaction: {e}")
     except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error converting transaction: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error converting transaction: {e}")
+    finally:
+        # Si la conversion fallo se libera la reserva para que el cliente pueda reintentar
+        if idempotency_scope is not None and content is None and not saving:
+            shared_cache.delete(IDEMPOTENCY_CACHE_NAMESPACE, idempotency_scope)
+
+
+@router.post(
+    "/jobs",
+    response_model=schemas.ConversionJobStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra=_CONVERSION_OPENAPI,
+)
+def enqueue_conversion_job(
+    request: Request,
+    transaction: schemas.TransactionTSLRequest = Depends(transaction_request),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user),
+    _rate_limit: None = Depends(admission_rate_limit),
+):
+    """
+    Encolar la conversion y responder 202 de inmediato; un worker (python -m
+    app.services.conversion_jobs) la convierte, la guarda y escribe el archivo TSL.
+    El estado se consulta en la URL de Location.
+    """
+    exists = db.query(models.Transaction.id).filter(
+        models.Transaction.transaction_number == transaction.transaction_number
+    ).first()
+    if exists is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Transaction {transaction.transaction_number} already exists"
+        )
+    db.close()
+
+    # El alta del job se agrupa con las demas escrituras en el hilo escritor
+    job_id = write_batcher.run(
+        conversion_jobs.enqueue_write_unit(transaction, current_user.id),
+        timeout=settings.write_batch_timeout,
+    )
+    status_url = str(request.url_for("get_conversion_job", job_id=job_id))
+    content = schemas.ConversionJobStatus(
+        job_id=job_id,
+        status=conversion_jobs.JOB_QUEUED,
+        transaction_number=transaction.transaction_number,
+        status_url=status_url,
+    ).model_dump(mode="json")
+    return JSONResponse(
+        content,
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": status_url, "Retry-After": "1"},
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.ConversionJobStatus)
+def get_conversion_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user),
+):
+    """Estado de una conversion asincrona (lectura por indice, sin el cuerpo del ticket)"""
+    job = conversion_jobs.job_status(db, job_id)
+    if job is None or (job.user_id != current_user.id and not current_user.is_admin):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversion job not found")
+    return schemas.ConversionJobStatus(**{key: value for key, value in job._mapping.items() if key != "user_id"})
+
+
+@router.get("/pool-stats")
+def conversion_pool_stats(current_user: models.User = Depends(auth.get_current_admin_user)):
+    """Metricas del pool de procesos de conversion"""
+    return conversion_pool.stats()
@@ -0,0 +1,204 @@
+from datetime import date, datetime, timezone
+from email.utils import formatdate
+from typing import Iterator, List, Optional, Tuple
+import os
+import re
+import zlib
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .. import models, schemas, auth
+from ..services.reconciliation import tsl_files_between
+from ..services.tsl_converter import TSLConverter
+
+router = APIRouter(tags=["tsl-files"])
+
+_TSL_FILE_NAME = re.compile(rf"^{re.escape(TSLConverter.OUTPUT_PREFIX)}\d{{14}}\.txt$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Extension ASGI de envio sin copia (sendfile); la anuncia el servidor en scope["extensions"]
+_ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+# Sin la extension se lee con pread en bloques grandes para reducir vueltas al event loop
+_READ_CHUNK_SIZE = 1024 * 1024
+_GZIP_LEVEL = 6
+
+
+class UnsatisfiableRange(ValueError):
+    """Range fuera del tamano del archivo (416)"""
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    """ETag fuerte a partir del tamano y la fecha de modificacion (ns) del archivo"""
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Tramo (inicio, fin inclusive) de un header Range de un solo tramo. None si no hay Range o
+    no se soporta (varios tramos, otra unidad): se envia el archivo completo, como permite RFC 9110.
+    """
+    match = _RANGE.match((header or "").strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        # Sufijo: los ultimos N bytes
+        if not last:
+            return None
+        if int(last) == 0 or size == 0:
+            raise UnsatisfiableRange()
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise UnsatisfiableRange()
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+class FileRangeResponse(Response):
+    """
+    Respuesta con un tramo de archivo. Si el servidor soporta la extension ASGI zerocopysend,
+    el kernel envia el archivo (sendfile) sin pasar los bytes por Python; si no, se lee en
+    bloques con os.pread en un hilo.
+    """
+
+    def __init__(self, path: str, start: int, length: int, status_code: int, headers: dict,
+                 send_header_only: bool = False):
+        self.path = path
+        self.start = start
+        self.length = length
+        self.status_code = status_code
+        self.background = None
+        self.send_header_only = send_header_only
+        self.init_headers(headers)
+        self.headers["content-length"] = str(length)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only or not self.length:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        with open(self.path, "rb") as file:
+            if _ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+                await send({"type": _ZEROCOPY_EXTENSION, "file": file, "offset": self.start, "count": self.length})
+                return
+            offset, remaining = self.start, self.length
+            while remaining:
+                chunk = await anyio.to_thread.run_sync(os.pread, file.fileno(), min(_READ_CHUNK_SIZE, remaining), offset)
+                if not chunk:
+                    raise RuntimeError(f"File at path {self.path} was truncated during the response")
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+
+
+def _gzip_chunks(path: str, size: int) -> Iterator[bytes]:
+    """Comprimir el archivo en streaming (gzip) hasta el tamano que tenia al iniciar la respuesta"""
+    compressor = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 31)
+    remaining = size
+    with open(path, "rb") as file:
+        while remaining:
+            chunk = file.read(min(_READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+    yield compressor.flush()
+
+
+def _entry(path: str) -> schemas.TSLFileEntry:
+    stat_result = os.stat(path)
+    return schemas.TSLFileEntry(
+        name=os.path.basename(path),
+        size=stat_result.st_size,
+        modified=datetime.fromtimestamp(stat_result.st_mtime, timezone.utc),
+        etag=file_etag(stat_result),
+    )
+
+
+@router.get("", response_model=List[schemas.TSLFileEntry])
+def list_tsl_files(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Listar archivos TSL de salida por fecha de escritura (por defecto, hoy)"""
+    date_from = date_from or date_to or date.today()
+    date_to = date_to or date_from
+    if date_to < date_from:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="date_to must not be before date_from")
+    tsl_dir = TSLConverter.output_dir()
+    if not os.path.isdir(tsl_dir):
+        return []
+    return [_entry(path) for path in tsl_files_between(tsl_dir, date_from, date_to)]
+
+
+@router.api_route("/{filename}", methods=["GET", "HEAD"])
+def download_tsl_file(
+    filename: str,
+    request: Request,
+    gzip: bool = Query(False, description="Comprimir con gzip al vuelo (si Accept-Encoding lo permite y no hay Range)"),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Descargar un archivo TSL con soporte de Range (reanudar descargas), ETag y gzip opcional"""
+    if not _TSL_FILE_NAME.match(filename):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="TSL file not found")
+    path = os.path.join(TSLConverter.output_dir(), filename)
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="TSL file not found")
+
+    size = stat_result.st_size
+    etag = file_etag(stat_result)
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "content-disposition": f'attachment; filename="{filename}"',
+        # Se fija aqui y no con media_type: Starlette agregaria su propio charset (utf-8)
+        "content-type": f"text/plain; charset={TSLConverter.ENCODING}",
+    }
+    send_header_only = request.method == "HEAD"
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range != etag:
+        # El archivo cambio desde la descarga parcial: se envia completo
+        range_header = None
+
+    use_gzip = gzip and not range_header and "gzip" in request.headers.get("accept-encoding", "").lower()
+    if use_gzip:
+        headers["etag"] = etag = f'W/{etag[:-1]}-gzip"'
+        headers["vary"] = "Accept-Encoding"
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"etag": etag})
+
+    if use_gzip:
+        headers["content-encoding"] = "gzip"
+        del headers["accept-ranges"]
+        content = iter(()) if send_header_only else _gzip_chunks(path, size)
+        return StreamingResponse(content, headers=headers)
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except UnsatisfiableRange:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"content-range": f"bytes */{size}"},
+        )
+    if byte_range is None:
+        return FileRangeResponse(path, 0, size, status.HTTP_200_OK, headers, send_header_only)
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return FileRangeResponse(
+        path, start, end - start + 1, status.HTTP_206_PARTIAL_CONTENT, headers, send_header_only
+    )
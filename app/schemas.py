@@ -1,7 +1,19 @@
-from pydantic import BaseModel, EmailStr, Field, ConfigDict
+from pydantic import BaseModel, EmailStr, Field, ConfigDict, BeforeValidator, PlainSerializer, WithJsonSchema
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing_extensions import Annotated
+from datetime import date, datetime
 import random
+from .services import money
+
+
+# Monto en milesimas (entero escalado); se parsea una sola vez al ingresar. En JSON se serializa
+# como decimal ("990.000") para que volver a validarlo (p.ej. el payload de un job) no lo reescale
+MoneyUnits = Annotated[
+    int,
+    BeforeValidator(money.parse_amount),
+    PlainSerializer(lambda units: money.format_amount(units), return_type=str, when_used="json"),
+    WithJsonSchema({"type": "number"}),
+]
 
 
 # User Schemas
@@ -155,6 +167,19 @@ class TransactionItem(TransactionItemBase):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
 
+class TransactionTSLItem(TransactionItemBase):
+    # El producto se resuelve en el servidor por barcode/sku; el objeto anidado es opcional
+    id: Optional[int] = None
+    product_id: Optional[int] = Field(None, alias="productId")
+    barcode: Optional[str] = None
+    product: Optional[Product] = None
+    unit_price: MoneyUnits = Field(alias="unitPrice")
+    discount: MoneyUnits = 0
+    total: MoneyUnits = Field(alias="total_price")
+
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+
 # Transaction Payment Schemas
 class TransactionPaymentBase(BaseModel):
     payment_method: str = Field(alias="paymentMethod")
@@ -176,6 +201,10 @@ class TransactionPayment(TransactionPaymentBase):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
 
+class TransactionTSLPayment(TransactionPayment):
+    amount: MoneyUnits
+
+
 # Transaction Schemas
 class TransactionBase(BaseModel):
     store_id: Optional[str] = Field(None, alias="storeId")
@@ -223,6 +252,16 @@ class Transaction(TransactionBase):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
     
 
+class OriginalTransactionRef(BaseModel):
+    """Venta original de una devolucion, con los datos impresos en la boleta"""
+    store_id: Optional[str] = None  # Por defecto, la tienda de la devolucion
+    pos_id: str
+    transaction_number: str
+    transaction_date: date
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
 class TransactionTSLRequest(TransactionBase):
     id: int
     user_id: int
@@ -232,18 +271,87 @@ class TransactionTSLRequest(TransactionBase):
     document_type: str
     transaction_number: str
     transaction_date: datetime
-    total_amount: float
+    total_amount: MoneyUnits
     customer_external_id: Optional[str] = None
     status: str = "completed"
     notes: Optional[str] = None
+    # Solo devoluciones: se resuelve contra la venta original (LocalOrigen, PosOrigen, 99/07, ...)
+    original_transaction: Optional[OriginalTransactionRef] = Field(None, alias="originalTransaction")
 
  
-    items: List[TransactionItem]
-    payments: List[TransactionPayment]
+    items: List[TransactionTSLItem]
+    payments: List[TransactionTSLPayment]
 
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
 
+# Listing Schemas (paginacion keyset)
+class TransactionListLine(BaseModel):
+    id: int
+    product_id: Optional[int] = None
+    sku: Optional[str] = None
+    quantity: int
+    unit_price: float
+    discount: Optional[float] = 0.0
+    total_price: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class TransactionListPayment(BaseModel):
+    id: int
+    payment_method: str
+    amount: float
+    provider: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class TransactionListEntry(BaseModel):
+    id: int
+    user_id: int
+    store_id: Optional[str] = None
+    pos_id: Optional[str] = None
+    transaction_type: Optional[str] = None
+    document_type: Optional[str] = None
+    transaction_number: Optional[str] = None
+    transaction_date: Optional[datetime] = None
+    total_amount: float
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+    items: List[TransactionListLine]
+    payments: List[TransactionListPayment]
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class TransactionPage(BaseModel):
+    data: List[TransactionListEntry]
+    next_cursor: Optional[str] = None
+
+
+class TransactionTSLDataEntry(BaseModel):
+    id: int
+    transaction_id: int
+    is_tsl_data_valid: Optional[bool] = None
+    tsl_data_validation_status: Optional[str] = None
+    tsl_data_validation_message: Optional[str] = None
+    tsl_data_validation_date: Optional[datetime] = None
+    is_tsl_data_sent: Optional[bool] = None
+    tsl_data_sent_status: Optional[str] = None
+    tsl_data_sent_message: Optional[str] = None
+    tsl_data_sent_date: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    tsl_data: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class TransactionTSLDataPage(BaseModel):
+    data: List[TransactionTSLDataEntry]
+    next_cursor: Optional[str] = None
+
+
 # Auth Schemas
 class Token(BaseModel):
     access_token: str
@@ -296,3 +404,40 @@ class NewClientCreated(BaseModel):
     is_admin: bool = Field(alias="isAdmin")
 
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+
+# Catalog Import Schemas
+class CatalogImportError(BaseModel):
+    line: int
+    error: str
+
+
+class CatalogImportReport(BaseModel):
+    received: int
+    inserted: int
+    updated: int
+    rejected: int
+    categories_created: int
+    errors: List[CatalogImportError]
+
+
+# Conversion Job Schemas
+class ConversionJobStatus(BaseModel):
+    job_id: str
+    status: str
+    transaction_number: str
+    attempts: int = 0
+    transaction_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    status_url: Optional[str] = None
+
+
+# TSL File Schemas
+class TSLFileEntry(BaseModel):
+    name: str
+    size: int
+    modified: datetime
+    etag: str
@@ -0,0 +1,136 @@
+from typing import Dict, Hashable, Optional
+import math
+import threading
+import time
+
+from ..config import settings
+
+
+class AdmissionRejected(Exception):
+    """Solicitud rechazada por control de admision; `retry_after` en segundos"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def try_acquire(self, now: float) -> float:
+        """Consumir un token. Retorna 0 si se admite, o los segundos hasta el proximo token."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets por clave (store_id, user_id, ...), con limpieza de buckets inactivos"""
+
+    _MAX_IDLE_KEYS = 10000
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def try_acquire(self, key: Hashable) -> float:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self._MAX_IDLE_KEYS:
+                    self._prune(now)
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            return bucket.try_acquire(now)
+
+    def _prune(self, now: float) -> None:
+        # Un bucket que ya se relleno por completo es equivalente a uno nuevo
+        refill_time = self.burst / self.rate
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if now - bucket.updated < refill_time
+        }
+
+
+class AdmissionController:
+    """
+    Control de admision para el endpoint de conversion.
+
+    - Un tope global de solicitudes en curso por worker, ligado por defecto a la capacidad del
+      pool de base de datos (`db_pool_size + db_max_overflow`): al superarlo se responde 503.
+    - Token buckets por `store_id` y por usuario autenticado: al agotarse se responde 429.
+
+    En ambos casos se rechaza de inmediato con `Retry-After`, en lugar de encolar la solicitud
+    y dejar que expire mas tarde.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        store_rate: float,
+        store_burst: int,
+        user_rate: float,
+        user_burst: int,
+    ):
+        self.max_in_flight = max_in_flight
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._stores = RateLimiter(store_rate, store_burst)
+        self._users = RateLimiter(user_rate, user_burst)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire_slot(self) -> None:
+        """Reservar un cupo del tope global, o lanzar AdmissionRejected (503)"""
+        if self.max_in_flight <= 0:
+            return
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                raise AdmissionRejected(503, "Server busy, too many requests in flight", 1)
+            self._in_flight += 1
+
+    def release_slot(self) -> None:
+        """Liberar un cupo reservado con acquire_slot"""
+        if self.max_in_flight <= 0:
+            return
+        with self._lock:
+            self._in_flight -= 1
+
+    def check_rate_limits(self, store_id: Optional[str], user_id: Optional[int]) -> None:
+        """Consumir un token del usuario y de la tienda, o lanzar AdmissionRejected (429)"""
+        if self._users.enabled and user_id is not None:
+            wait = self._users.try_acquire(user_id)
+            if wait:
+                raise AdmissionRejected(429, "Rate limit exceeded for user", math.ceil(wait))
+        if self._stores.enabled and store_id is not None:
+            wait = self._stores.try_acquire(store_id)
+            if wait:
+                raise AdmissionRejected(429, "Rate limit exceeded for store", math.ceil(wait))
+
+
+admission_controller = AdmissionController(
+    max_in_flight=settings.admission_max_in_flight or settings.db_pool_size + settings.db_max_overflow,
+    store_rate=settings.admission_store_rate,
+    store_burst=settings.admission_store_burst,
+    user_rate=settings.admission_user_rate,
+    user_burst=settings.admission_user_burst,
+)
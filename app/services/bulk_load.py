@@ -0,0 +1,78 @@
+from itertools import islice
+from typing import Iterable, Sequence
+import csv
+import io
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Marcador de NULL en el CSV de COPY (un campo vacio seria un string vacio)
+_COPY_NULL = r"\N"
+
+
+def bulk_insert(
+    connection: Connection,
+    table_name: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence],
+    chunk_size: int = 10000,
+) -> int:
+    """
+    Insertar filas (tuplas en el orden de `columns`) por bloques: COPY ... FROM STDIN en
+    PostgreSQL y executemany en los demas motores. Retorna la cantidad de filas insertadas.
+    """
+    rows = iter(rows)
+    total = 0
+    copy = connection.dialect.name == "postgresql"
+    if copy:
+        statement = (
+            f"COPY {table_name} ({', '.join(columns)}) FROM STDIN "
+            f"WITH (FORMAT csv, NULL '{_COPY_NULL}')"
+        )
+    else:
+        statement = text(
+            f"INSERT INTO {table_name} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(':' + column for column in columns)})"
+        )
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return total
+        if copy:
+            _copy_chunk(connection, statement, chunk)
+        else:
+            connection.execute(statement, [dict(zip(columns, row)) for row in chunk])
+        total += len(chunk)
+
+
+def _copy_chunk(connection: Connection, statement: str, chunk: Sequence[Sequence]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in chunk:
+        writer.writerow([_copy_value(value) for value in row])
+    buffer.seek(0)
+    # Cursor DBAPI (psycopg2) de la misma conexion/transaccion de SQLAlchemy
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    finally:
+        cursor.close()
+
+
+def _copy_value(value):
+    if value is None:
+        return _COPY_NULL
+    if isinstance(value, (bytes, memoryview)):
+        return "\\x" + bytes(value).hex()
+    return value
+
+
+def reset_sequence(connection: Connection, table_name: str, column: str = "id") -> None:
+    """Ajustar la secuencia de PostgreSQL despues de insertar ids explicitos"""
+    if connection.dialect.name != "postgresql":
+        return
+    connection.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table_name}', '{column}'), "
+        f"COALESCE((SELECT MAX({column}) FROM {table_name}), 1))"
+    ))
@@ -0,0 +1,295 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import csv
+import json
+import logging
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from . import money
+from .bulk_load import bulk_insert
+from .product_index import product_index
+
+logger = logging.getLogger(__name__)
+
+FORMAT_CSV = "csv"
+FORMAT_NDJSON = "ndjson"
+
+STAGING_TABLE = "catalog_import_staging"
+
+# Columnas aceptadas en el archivo; las ausentes o vacias conservan el valor actual del producto
+_STAGING_COLUMNS = (
+    "line_no", "sku", "barcode", "title", "description", "price", "stock", "brand",
+    "category_name", "category_id", "discount_percentage", "is_active",
+)
+# Columnas de products que se actualizan con COALESCE(nuevo, actual)
+_PRODUCT_COLUMNS = ("sku", "barcode", "title", "description", "price", "stock", "brand",
+                    "category_id", "discount_percentage", "is_active")
+
+MAX_REPORTED_ERRORS = 100
+
+_TRUE = {"1", "true", "t", "yes", "si", "y"}
+_FALSE = {"0", "false", "f", "no", "n"}
+
+
+class CatalogImportError(ValueError):
+    """Archivo de importacion de catalogo invalido (formato o encabezado)"""
+
+
+def _clean(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _parse_row(line_no: int, row: Dict) -> tuple:
+    """Normalizar una fila del archivo a una fila de staging; ValueError si es invalida"""
+    sku = _clean(row.get("sku"))
+    barcode = _clean(row.get("barcode"))
+    if sku is None and barcode is None:
+        raise ValueError("sku or barcode is required")
+
+    price = _clean(row.get("price"))
+    if price is not None:
+        # Numeric(10, 3): se normaliza a milesimas y se guarda como texto decimal exacto
+        price = str(money.to_decimal(money.parse_amount(price)))
+
+    stock = _clean(row.get("stock"))
+    stock = int(stock) if stock is not None else None
+
+    discount = _clean(row.get("discount_percentage"))
+    discount = str(money.to_decimal(money.parse_amount(discount))) if discount is not None else None
+
+    category_id = _clean(row.get("category_id"))
+    category_id = int(category_id) if category_id is not None else None
+
+    is_active = _clean(row.get("is_active"))
+    if is_active is not None:
+        lowered = is_active.lower()
+        if lowered not in _TRUE and lowered not in _FALSE:
+            raise ValueError(f"Invalid is_active: {is_active!r}")
+        is_active = lowered in _TRUE
+
+    return (
+        line_no, sku, barcode, _clean(row.get("title")), _clean(row.get("description")), price, stock,
+        _clean(row.get("brand")), _clean(row.get("category") or row.get("category_name")), category_id,
+        discount, is_active,
+    )
+
+
+def read_rows(lines: Iterable[str], file_format: str) -> Iterator[Tuple[int, Dict]]:
+    """Leer filas (numero de linea, dict) de un CSV con encabezado o de NDJSON, en streaming"""
+    if file_format == FORMAT_CSV:
+        reader = csv.DictReader(lines)
+        if not reader.fieldnames or not ({"sku", "barcode"} & set(reader.fieldnames)):
+            raise CatalogImportError("CSV header must include sku or barcode")
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == FORMAT_NDJSON:
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                row = {"__error__": f"Invalid JSON: {e.msg}"}
+            yield line_no, row if isinstance(row, dict) else {"__error__": "Expected a JSON object"}
+    else:
+        raise CatalogImportError(f"Unsupported format: {file_format}")
+
+
+def import_catalog(db: Session, lines: Iterable[str], file_format: str, chunk_size: Optional[int] = None) -> dict:
+    """
+    Importar productos en bloque: las filas se cargan en una tabla temporal (COPY en PostgreSQL,
+    executemany en SQLite) y se aplican con un UPDATE ... FROM y un INSERT ... SELECT, en una sola
+    transaccion. Los productos se identifican por sku y, si no hay coincidencia, por barcode.
+    Los productos nuevos requieren title y price.
+    """
+    chunk_size = chunk_size or settings.catalog_import_chunk_size
+    errors: List[dict] = []
+    rejected = 0
+
+    def staged_rows() -> Iterator[tuple]:
+        nonlocal rejected
+        for line_no, row in read_rows(lines, file_format):
+            try:
+                if "__error__" in row:
+                    raise ValueError(row["__error__"])
+                yield _parse_row(line_no, row)
+            except ValueError as e:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": line_no, "error": str(e)})
+
+    connection = db.connection()
+    _create_staging(connection)
+    try:
+        received = bulk_insert(connection, STAGING_TABLE, _STAGING_COLUMNS, staged_rows(), chunk_size=chunk_size)
+        report = _merge(connection)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        _drop_staging(db.connection())
+        db.commit()
+
+    # El indice en memoria toma los cambios por updated_at (refresco incremental)
+    product_index.refresh(db)
+
+    report["received"] = received + rejected
+    report["rejected"] += rejected
+    report["errors"] = errors + report.pop("merge_errors")
+    logger.info("Catalog import: %s", {key: value for key, value in report.items() if key != "errors"})
+    return report
+
+
+def _create_staging(connection) -> None:
+    connection.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+    connection.execute(text(
+        f"CREATE TEMPORARY TABLE {STAGING_TABLE} ("
+        "line_no INTEGER NOT NULL, sku VARCHAR(50), barcode VARCHAR(50), title VARCHAR(200), description TEXT, "
+        "price NUMERIC(10, 3), stock INTEGER, brand VARCHAR(100), category_name VARCHAR(100), category_id INTEGER, "
+        "discount_percentage NUMERIC(5, 2), is_active BOOLEAN, product_id INTEGER)"
+    ))
+
+
+def _drop_staging(connection) -> None:
+    connection.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+
+
+def _merge(connection) -> dict:
+    staging = STAGING_TABLE
+    # Indices de la tabla temporal para los cruces por sku/barcode
+    connection.execute(text(f"CREATE INDEX {staging}_sku ON {staging} (sku, line_no)"))
+    connection.execute(text(f"CREATE INDEX {staging}_barcode ON {staging} (barcode, line_no)"))
+
+    # Si un sku (o barcode sin sku) se repite, gana la ultima linea del archivo
+    connection.execute(text(
+        f"DELETE FROM {staging} WHERE sku IS NOT NULL AND EXISTS ("
+        f"SELECT 1 FROM {staging} later WHERE later.sku = {staging}.sku AND later.line_no > {staging}.line_no)"
+    ))
+    connection.execute(text(
+        f"DELETE FROM {staging} WHERE sku IS NULL AND EXISTS ("
+        f"SELECT 1 FROM {staging} later WHERE later.sku IS NULL AND later.barcode = {staging}.barcode "
+        f"AND later.line_no > {staging}.line_no)"
+    ))
+
+    # Categorias por nombre: se crean las que no existen
+    categories_created = connection.execute(text(
+        f"INSERT INTO categories (name, is_active, created_at) "
+        f"SELECT DISTINCT category_name, true, CURRENT_TIMESTAMP FROM {staging} "
+        f"WHERE category_name IS NOT NULL AND category_id IS NULL "
+        f"AND NOT EXISTS (SELECT 1 FROM categories c WHERE c.name = {staging}.category_name)"
+    )).rowcount
+    connection.execute(text(
+        f"UPDATE {staging} SET category_id = (SELECT c.id FROM categories c WHERE c.name = {staging}.category_name) "
+        f"WHERE category_name IS NOT NULL AND category_id IS NULL"
+    ))
+
+    # Producto existente: primero por sku, luego por barcode
+    connection.execute(text(
+        f"UPDATE {staging} SET product_id = (SELECT p.id FROM products p WHERE p.sku = {staging}.sku) "
+        f"WHERE sku IS NOT NULL"
+    ))
+    # Por barcode solo si no contradice el sku (la fila o el producto no tienen sku)
+    connection.execute(text(
+        f"UPDATE {staging} SET product_id = (SELECT p.id FROM products p WHERE p.barcode = {staging}.barcode "
+        f"AND ({staging}.sku IS NULL OR p.sku IS NULL)) "
+        f"WHERE product_id IS NULL AND barcode IS NOT NULL"
+    ))
+
+    # Filas que no se pueden aplicar: barcode de otro producto, o producto nuevo sin title/price
+    barcode_taken = (
+        f"barcode IS NOT NULL AND EXISTS (SELECT 1 FROM products p WHERE p.barcode = {staging}.barcode "
+        f"AND (product_id IS NULL OR p.id <> product_id))"
+    )
+    incomplete = "product_id IS NULL AND (title IS NULL OR price IS NULL)"
+    invalid = f"({barcode_taken}) OR ({incomplete})"
+    merge_errors = [
+        {"line": line_no, "error": "barcode belongs to another product" if taken else "new products require title and price"}
+        for line_no, taken in connection.execute(text(
+            f"SELECT line_no, CASE WHEN {barcode_taken} THEN 1 ELSE 0 END FROM {staging} "
+            f"WHERE {invalid} ORDER BY line_no LIMIT {MAX_REPORTED_ERRORS}"
+        ))
+    ]
+    rejected = connection.execute(text(f"DELETE FROM {staging} WHERE {invalid}")).rowcount
+
+    # Varias lineas que resuelven al mismo producto (o productos nuevos con el mismo barcode): gana la ultima
+    connection.execute(text(
+        f"DELETE FROM {staging} WHERE product_id IS NOT NULL AND EXISTS ("
+        f"SELECT 1 FROM {staging} later WHERE later.product_id = {staging}.product_id "
+        f"AND later.line_no > {staging}.line_no)"
+    ))
+    connection.execute(text(
+        f"DELETE FROM {staging} WHERE product_id IS NULL AND barcode IS NOT NULL AND EXISTS ("
+        f"SELECT 1 FROM {staging} later WHERE later.product_id IS NULL AND later.barcode = {staging}.barcode "
+        f"AND later.line_no > {staging}.line_no)"
+    ))
+
+    assignments = ", ".join(f"{column} = COALESCE(s.{column}, products.{column})" for column in _PRODUCT_COLUMNS)
+    updated = connection.execute(text(
+        f"UPDATE products SET {assignments}, updated_at = CURRENT_TIMESTAMP "
+        f"FROM {staging} s WHERE s.product_id = products.id"
+    )).rowcount
+
+    inserted = connection.execute(text(
+        f"INSERT INTO products ({', '.join(_PRODUCT_COLUMNS)}, discount_money, availability_status, "
+        f"minimum_order_quantity, is_authorized, created_at) "
+        f"SELECT sku, barcode, title, description, price, COALESCE(stock, 0), brand, category_id, "
+        f"COALESCE(discount_percentage, 0), COALESCE(is_active, true), 0, 'available', 1, true, CURRENT_TIMESTAMP "
+        f"FROM {staging} WHERE product_id IS NULL"
+    )).rowcount
+
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "rejected": rejected,
+        "categories_created": categories_created,
+        "merge_errors": merge_errors,
+    }
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    """Formato por Content-Type o extension (.csv, .ndjson/.jsonl)"""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        return FORMAT_CSV
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return FORMAT_NDJSON
+    if filename:
+        lowered = filename.lower()
+        if lowered.endswith(".csv"):
+            return FORMAT_CSV
+        if lowered.endswith((".ndjson", ".jsonl")):
+            return FORMAT_NDJSON
+    raise CatalogImportError("Unable to detect format; use text/csv or application/x-ndjson")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Importar productos en bloque desde CSV o NDJSON")
+    parser.add_argument("path", help="Archivo a importar (- = stdin)")
+    parser.add_argument("--format", choices=[FORMAT_CSV, FORMAT_NDJSON], default=None)
+    args = parser.parse_args(argv)
+
+    from ..database import SessionLocal
+    logging.basicConfig(level=logging.INFO)
+    file_format = args.format or detect_format(args.path)
+    db = SessionLocal()
+    try:
+        if args.path == "-":
+            report = import_catalog(db, sys.stdin, file_format)
+        else:
+            with open(args.path, encoding="utf-8", newline="") as source:
+                report = import_catalog(db, source, file_format)
+    finally:
+        db.close()
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import uuid
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session, undefer
+
+from .. import models, schemas
+from ..config import settings
+from . import return_lookup, tsl_conversion
+from .product_index import product_index
+from .tax_engine import tax_engine
+from .transaction_store import conversion_write_unit, is_duplicate_transaction_number
+from .tsl_converter import TSLConverter
+from .tsl_writer import TSLFileWriter
+from .write_batcher import WriteUnit
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+# Espera maxima entre reintentos cuando la base no responde
+_MAX_BACKOFF_SECONDS = 30
+
+_STATUS_COLUMNS = (
+    models.ConversionJob.job_id,
+    models.ConversionJob.user_id,
+    models.ConversionJob.status,
+    models.ConversionJob.transaction_number,
+    models.ConversionJob.attempts,
+    models.ConversionJob.transaction_id,
+    models.ConversionJob.error,
+    models.ConversionJob.created_at,
+    models.ConversionJob.started_at,
+    models.ConversionJob.finished_at,
+)
+
+
+def enqueue_write_unit(transaction: schemas.TransactionTSLRequest, user_id: int) -> WriteUnit:
+    """Unidad de escritura (ver WriteBatcher) que encola la conversion; retorna el id publico del job"""
+    job_id = uuid.uuid4().hex
+    payload = transaction.model_dump_json(by_alias=True)
+
+    def write(session: Session) -> str:
+        session.add(models.ConversionJob(
+            job_id=job_id,
+            user_id=user_id,
+            store_id=transaction.store_id,
+            pos_id=transaction.pos_id,
+            transaction_number=transaction.transaction_number,
+            payload=payload,
+            status=JOB_QUEUED,
+        ))
+        return job_id
+
+    return write
+
+
+def job_status(db: Session, job_id: str):
+    """Estado de un job sin leer el payload (lookup por indice unico)"""
+    return db.execute(select(*_STATUS_COLUMNS).where(models.ConversionJob.job_id == job_id)).first()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def claim_jobs(db: Session, worker: str, limit: int) -> List[int]:
+    """
+    Tomar hasta `limit` jobs en cola (o en running de un worker caido) y marcarlos running.
+    En PostgreSQL los candidatos se bloquean con FOR UPDATE SKIP LOCKED, asi varios workers
+    toman jobs distintos sin esperarse. En SQLite los workers son procesos con su propia conexion:
+    la transaccion de escritura (con busy_timeout) serializa los UPDATE. En ambos casos el UPDATE
+    vuelve a filtrar por estado, de modo que un job nunca queda tomado por dos workers.
+    """
+    stale_before = _now() - timedelta(seconds=settings.conversion_job_timeout)
+    claimable = or_(
+        models.ConversionJob.status == JOB_QUEUED,
+        and_(models.ConversionJob.status == JOB_RUNNING, models.ConversionJob.started_at < stale_before),
+    )
+    candidates = (
+        select(models.ConversionJob.id)
+        .where(claimable)
+        .where(models.ConversionJob.attempts < settings.conversion_job_max_attempts)
+        .order_by(models.ConversionJob.id)
+        .limit(limit)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True)
+    ids = db.execute(candidates).scalars().all()
+    if not ids:
+        db.rollback()
+        return []
+    claimed = db.execute(
+        update(models.ConversionJob)
+        .where(models.ConversionJob.id.in_(ids), claimable)
+        .values(status=JOB_RUNNING, worker=worker, started_at=_now(), attempts=models.ConversionJob.attempts + 1)
+        .returning(models.ConversionJob.id)
+    ).scalars().all()
+    db.commit()
+    return sorted(claimed)
+
+
+def fail_exhausted(db: Session) -> int:
+    """Marcar como fallidos los jobs de workers caidos que ya agotaron sus intentos"""
+    stale_before = _now() - timedelta(seconds=settings.conversion_job_timeout)
+    failed = db.execute(
+        update(models.ConversionJob)
+        .where(models.ConversionJob.status == JOB_RUNNING)
+        .where(models.ConversionJob.started_at < stale_before)
+        .where(models.ConversionJob.attempts >= settings.conversion_job_max_attempts)
+        .values(status=JOB_FAILED, finished_at=_now(), error="Worker did not finish the job")
+    ).rowcount
+    db.commit()
+    return failed
+
+
+def _finish(db: Session, job: models.ConversionJob, status: str, error: Optional[str] = None,
+            transaction_id: Optional[int] = None) -> None:
+    job.status = status
+    job.error = error
+    job.transaction_id = transaction_id
+    job.finished_at = _now()
+
+
+def process_job(db: Session, job_id: int) -> str:
+    """
+    Convertir un job tomado: guarda la transaccion y marca el job terminado en el mismo commit,
+    y despues agrega el ticket al archivo TSL. Los errores del ticket (invalido, duplicado)
+    terminan el job; los demas lo devuelven a la cola hasta CONVERSION_JOB_MAX_ATTEMPTS.
+    """
+    job = db.execute(
+        select(models.ConversionJob).options(undefer(models.ConversionJob.payload))
+        .where(models.ConversionJob.id == job_id)
+    ).scalar_one()
+    try:
+        transaction = schemas.TransactionTSLRequest.model_validate_json(job.payload)
+        product_index.refresh_if_stale(db)
+        tax_engine.refresh_if_stale(db)
+        ticket = tsl_conversion.prepare_ticket(transaction, job.user_id, return_lookup.resolve(db, transaction))
+        data = tsl_conversion.convert_ticket(ticket)
+        transaction_id = conversion_write_unit(
+            transaction, job.user_id, ticket, data.decode(TSLConverter.ENCODING)
+        )(db)
+        _finish(db, job, JOB_SUCCEEDED, transaction_id=transaction_id)
+        db.commit()
+        return_lookup.recent_sales.remember(return_lookup.sale_from_ticket(transaction_id, transaction, ticket))
+    except IntegrityError as e:
+        db.rollback()
+        if is_duplicate_transaction_number(e):
+            _finish(db, job, JOB_FAILED, f"Transaction {job.transaction_number} already exists")
+        else:
+            _finish(db, job, JOB_FAILED, f"Transaction {job.transaction_number} violates a data constraint: {e.orig}")
+        db.commit()
+        return job.status
+    except (tsl_conversion.InvalidTicket, ValueError) as e:
+        # ValidationError de pydantic tambien es ValueError
+        db.rollback()
+        _finish(db, job, JOB_FAILED, str(e))
+        db.commit()
+        return job.status
+    except Exception as e:
+        db.rollback()
+        logger.exception("Conversion job %s failed (attempt %d)", job.job_id, job.attempts)
+        if job.attempts >= settings.conversion_job_max_attempts:
+            _finish(db, job, JOB_FAILED, f"Error converting transaction: {e}")
+        else:
+            job.status = JOB_QUEUED
+            job.error = str(e)
+        db.commit()
+        return job.status
+
+    TSLFileWriter(TSLConverter.output_path()).write([data])
+    return JOB_SUCCEEDED
+
+
+def run_worker(name: str, batch_size: int, poll_seconds: float, stop=None, once: bool = False) -> int:
+    """
+    Loop de un worker: toma lotes de jobs y los procesa uno por uno. Con `once` termina cuando
+    la cola queda vacia. Si la base no responde (reinicio, failover, base bloqueada) el worker
+    espera cada vez mas, hasta _MAX_BACKOFF_SECONDS, y reintenta. Retorna los jobs procesados.
+    """
+    from ..database import SessionLocal
+
+    processed = 0
+    errors = 0
+    checked_exhausted = False
+    db = SessionLocal()
+    try:
+        while stop is None or not stop.is_set():
+            try:
+                if not checked_exhausted:
+                    fail_exhausted(db)
+                    checked_exhausted = True
+                job_ids = claim_jobs(db, name, batch_size)
+            except SQLAlchemyError as e:
+                db.rollback()
+                errors += 1
+                delay = min(max(poll_seconds, 0.5) * 2 ** (errors - 1), _MAX_BACKOFF_SECONDS)
+                logger.warning("Conversion worker %s could not claim jobs (%s); retrying in %.1fs", name, e, delay)
+                time.sleep(delay)
+                continue
+            errors = 0
+            if not job_ids:
+                if once:
+                    break
+                time.sleep(poll_seconds)
+                continue
+            for job_id in job_ids:
+                status = process_job(db, job_id)
+                processed += 1
+                logger.info("Conversion job %d %s", job_id, status)
+            # Las filas procesadas no se necesitan en la sesion
+            db.expunge_all()
+    finally:
+        db.close()
+    return processed
+
+
+def _worker_process(name: str, batch_size: int, poll_seconds: float, stop, once: bool) -> None:
+    logging.basicConfig(level=logging.INFO)
+    # El proceso padre reparte SIGINT/SIGTERM con el evento `stop`: el job en curso termina
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    run_worker(name, batch_size, poll_seconds, stop, once)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Workers de conversiones asincronas (tabla conversion_jobs)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos worker (por defecto CONVERSION_JOB_WORKERS)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Jobs tomados por consulta")
+    parser.add_argument("--poll-seconds", type=float, default=None, help="Espera cuando la cola esta vacia")
+    parser.add_argument("--once", action="store_true", help="Terminar cuando la cola quede vacia")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    workers = args.workers if args.workers is not None else settings.conversion_job_workers
+    batch_size = args.batch_size or settings.conversion_job_batch_size
+    poll_seconds = settings.conversion_job_poll_seconds if args.poll_seconds is None else args.poll_seconds
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    if workers <= 1:
+        processed = run_worker(prefix, batch_size, poll_seconds, once=args.once)
+        logger.info("Processed %d conversion jobs", processed)
+        return
+
+    # Procesos "spawn": cada uno crea su propio engine y pool de conexiones
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    processes = [
+        context.Process(
+            target=_worker_process, args=(f"{prefix}/{index}", batch_size, poll_seconds, stop, args.once),
+            name=f"conversion-worker-{index}",
+        )
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop.set()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Optional
+import multiprocessing
+import threading
+import time
+
+from ..config import settings
+from .tsl_conversion import TicketInput, convert_ticket
+
+
+class ConversionTimeout(Exception):
+    """La conversion en el pool no termino dentro de TSL_PROCESS_POOL_TIMEOUT (pool saturado)"""
+
+
+def _init_worker() -> None:
+    """Precargar en cada proceso del pool los modulos y planes usados por la conversion"""
+    from .tsl_mappings import tsl_mappings
+    tsl_mappings.get(tsl_mappings.default_kind)
+
+
+def _convert_in_worker(ticket: TicketInput, tax_rules: tuple):
+    """Convertir en el proceso del pool y retornar tambien el tiempo que estuvo ocupado"""
+    started = time.monotonic()
+    return convert_ticket(ticket, tax_rules), time.monotonic() - started
+
+
+class ConversionPool:
+    """
+    Pool de procesos para convertir tickets grandes sin retener el GIL del worker de la API.
+
+    Los tickets con al menos `threshold` lineas se envian al pool como `TicketInput` (solo tipos
+    primitivos, barato de serializar); los demas se convierten en linea. El pool se crea al
+    primer uso con procesos "spawn" que precargan el conversor y los planes TSL.
+    """
+
+    def __init__(self, workers: int, threshold: int, timeout: float):
+        self.workers = workers
+        self.threshold = threshold
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._timed_out = 0
+        self._busy_seconds = 0.0
+        self._started_at = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0 and self.threshold > 0
+
+    def should_offload(self, ticket: TicketInput) -> bool:
+        return self.enabled and len(ticket.lines) >= self.threshold
+
+    def convert(self, ticket: TicketInput, tax_rules: tuple) -> bytes:
+        """Convertir el ticket en el pool si supera el umbral, o en linea si no"""
+        if not self.should_offload(ticket):
+            return convert_ticket(ticket)
+
+        executor = self._get_executor()
+        with self._lock:
+            self._pending += 1
+            self._submitted += 1
+        try:
+            future = executor.submit(_convert_in_worker, ticket, tax_rules)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+                self._failed += 1
+            raise
+        # El trabajo cuenta como en curso hasta que el proceso termina, aunque la solicitud deje de esperar
+        future.add_done_callback(self._on_done)
+        try:
+            result, _ = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Si aun no empezo se cancela; si ya corre, el proceso termina y el callback lo descuenta
+            future.cancel()
+            with self._lock:
+                self._timed_out += 1
+            raise ConversionTimeout(
+                f"Ticket conversion did not finish within {self.timeout:g}s (process pool saturated)"
+            )
+        return result
+
+    def _on_done(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self._failed += 1
+                return
+            self._completed += 1
+            self._busy_seconds += future.result()[1]
+
+    def stats(self) -> dict:
+        """Metricas del pool: profundidad de cola y utilizacion"""
+        with self._lock:
+            pending = self._pending
+            uptime = time.monotonic() - self._started_at
+            return {
+                "enabled": self.enabled,
+                "started": self._executor is not None,
+                "workers": self.workers,
+                "threshold": self.threshold,
+                "in_flight": pending,
+                "queue_depth": max(pending - self.workers, 0),
+                "utilization": min(pending, self.workers) / self.workers if self.workers else 0.0,
+                # Fraccion del tiempo de los procesos ocupada convirtiendo desde el inicio
+                "average_utilization": self._busy_seconds / (uptime * self.workers) if self.workers and uptime else 0.0,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "timed_out": self._timed_out,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        executor = self._executor
+        if executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                    )
+                executor = self._executor
+        return executor
+
+
+conversion_pool = ConversionPool(
+    workers=settings.tsl_process_pool_workers,
+    threshold=settings.tsl_process_pool_threshold,
+    timeout=settings.tsl_process_pool_timeout,
+)
@@ -0,0 +1,275 @@
+from typing import Callable, Dict, List, Optional, Sequence
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import tempfile
+import tracemalloc
+import uuid
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = (1, 10, 100, 1000, 5000)
+
+STAGE_CONVERTER = "converter"
+STAGE_ENDPOINT = "endpoint"
+
+_BENCH_USERNAME = "memory-bench"
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes() -> Optional[int]:
+    """RSS actual del proceso (Linux); None si no esta disponible"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """RSS maximo del proceso desde su inicio"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB; macOS, bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def start_tracing(frames: Optional[int] = None) -> None:
+    """Activar tracemalloc (DEBUG_ALLOCATIONS) para el endpoint de asignaciones"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames or settings.debug_allocations_frames)
+        logger.info("tracemalloc enabled (%s frames)", tracemalloc.get_traceback_limit())
+
+
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+def top_allocations(limit: int = 20, group_by: str = "lineno", diff: bool = False) -> dict:
+    """
+    Sitios con mas memoria asignada en el worker. Con `diff`, la diferencia contra la instantanea
+    anterior de este mismo endpoint (util para encontrar lo que crece entre dos llamadas).
+    """
+    global _last_snapshot
+    previous = _last_snapshot if diff else None
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+    if previous is not None:
+        stats = snapshot.compare_to(previous, group_by)
+        entries = [
+            {"site": _site(stat.traceback), "size": stat.size, "size_diff": stat.size_diff,
+             "count": stat.count, "count_diff": stat.count_diff}
+            for stat in stats[:limit]
+        ]
+    else:
+        entries = [
+            {"site": _site(stat.traceback), "size": stat.size, "count": stat.count}
+            for stat in snapshot.statistics(group_by)[:limit]
+        ]
+    _last_snapshot = snapshot
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "traced_current": current,
+        "traced_peak": peak,
+        "rss": rss_bytes(),
+        "peak_rss": peak_rss_bytes(),
+        "group_by": group_by,
+        "diff": previous is not None,
+        "allocations": entries,
+    }
+
+
+def _site(traceback: tracemalloc.Traceback):
+    # Un sitio por frame, empezando por el que hizo la asignacion
+    sites = [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+    return sites[0] if len(sites) == 1 else sites
+
+
+def ticket_body(lines: int, transaction_number: Optional[str] = None) -> dict:
+    """Cuerpo de POST /convert-transaction (venta) con `lines` lineas distintas"""
+    items = [
+        {"barcode": f"78{index:011d}", "sku": f"SKU{index:08d}", "quantity": 1 + index % 3,
+         "unit_price": 990 + index % 50 * 10, "discount": 0, "total": (1 + index % 3) * (990 + index % 50 * 10)}
+        for index in range(lines)
+    ]
+    total = sum(item["total"] for item in items)
+    return {
+        "id": 1, "user_id": 1, "store_id": "331", "pos_id": "01", "transaction_type": "PVT", "document_type": "BLT",
+        "transaction_number": transaction_number or uuid.uuid4().hex[:20],
+        "transaction_date": "2025-07-08T10:00:00", "total_amount": total,
+        "items": items,
+        "payments": [{"id": 1, "transaction_id": 1, "payment_method": "CASH", "amount": total,
+                      "created_at": "2025-07-08T10:00:00"}],
+    }
+
+
+def measure(run: Callable[[], object], repeat: int) -> Dict[str, int]:
+    """
+    Memoria de `run` con tracemalloc: pico por encima de la linea base (peak) y lo que queda
+    asignado despues de un gc por ejecucion (retained), mas el crecimiento del RSS.
+    """
+    run()  # Calentamiento: planes TSL, caches e imports no cuentan como costo del ticket
+    gc.collect()
+    rss_before = rss_bytes()
+    # Si el worker ya tiene tracemalloc activo (DEBUG_ALLOCATIONS) no se detiene al terminar
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        peak = 0
+        for _ in range(repeat):
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            run()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - start)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    rss_after = rss_bytes()
+    return {
+        "peak": peak,
+        "retained": max(retained, 0) // repeat,
+        "rss_growth": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+    }
+
+
+def peak_budget(stage: str, lines: int) -> int:
+    per_line = (
+        settings.memory_budget_endpoint_per_line if stage == STAGE_ENDPOINT
+        else settings.memory_budget_converter_per_line
+    )
+    return settings.memory_budget_peak_base + per_line * lines
+
+
+def _converter_runner(lines: int) -> Callable[[], object]:
+    from .. import schemas
+    from .tsl_conversion import convert_ticket, prepare_ticket
+
+    transaction = schemas.TransactionTSLRequest.model_validate(ticket_body(lines))
+    return lambda: convert_ticket(prepare_ticket(transaction, 1))
+
+
+def _isolate_endpoint_stage(workdir: str) -> None:
+    """
+    Apuntar la etapa endpoint a una base SQLite, una cache y un directorio TSL temporales: el
+    usuario y las transacciones del benchmark no deben llegar a la base de DATABASE_URL ni a los
+    archivos de tsl_files/ que descargan otros sistemas. El engine se crea al importar
+    app.database, por eso se configura antes de cualquier import de la aplicacion.
+    """
+    if f"{__package__.rpartition('.')[0]}.database" in sys.modules:
+        raise RuntimeError("The endpoint stage must be configured before the application is imported")
+    settings.database_url = f"sqlite:///{os.path.join(workdir, 'memory-bench.db')}"
+    settings.database_replica_urls = []
+    settings.db_partitioning = False
+    settings.cache_backend = "memory"
+    # Los archivos TSL se escriben en <cwd>/tsl_files
+    os.chdir(workdir)
+
+
+def _endpoint_runner(lines: int) -> Callable[[], object]:
+    """POST /convert-transaction en el proceso (TestClient), contra la base temporal del benchmark"""
+    from fastapi.testclient import TestClient
+    from .. import auth, models
+    from ..database import SessionLocal
+    from ..main import app
+    from .conversion_pool import conversion_pool
+
+    # Todo se convierte en este proceso: lo enviado al pool no lo veria tracemalloc
+    conversion_pool.workers = 0
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    db = SessionLocal()
+    try:
+        if auth.get_user(db, _BENCH_USERNAME) is None:
+            db.add(models.User(
+                username=_BENCH_USERNAME, email=f"{_BENCH_USERNAME}@example.com", first_name="Memory",
+                last_name="Bench", hashed_password=auth.get_password_hash(uuid.uuid4().hex),
+            ))
+            db.commit()
+    finally:
+        db.close()
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': _BENCH_USERNAME})}"}
+    client = TestClient(app)
+    # El cuerpo se serializa una vez; cada solicitud solo cambia el numero de transaccion (unico)
+    template = json.dumps(ticket_body(lines, transaction_number="{number}"))
+
+    def run():
+        content = template.replace("{number}", uuid.uuid4().hex[:20])
+        response = client.post("/api/v1/convert-transaction", content=content,
+                               headers={**headers, "Content-Type": "application/json"})
+        if response.status_code != 200:
+            raise RuntimeError(f"Conversion failed ({response.status_code}): {response.text[:200]}")
+        return response
+
+    return run
+
+
+def run_benchmark(stages: Sequence[str], sizes: Sequence[int], repeat: int) -> List[dict]:
+    """Medir cada etapa para tickets de tamano creciente y marcar los que exceden el presupuesto"""
+    if STAGE_ENDPOINT in stages:
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory(prefix="memory-bench-") as workdir:
+            _isolate_endpoint_stage(workdir)
+            try:
+                return _run_stages(stages, sizes, repeat)
+            finally:
+                os.chdir(cwd)
+    return _run_stages(stages, sizes, repeat)
+
+
+def _run_stages(stages: Sequence[str], sizes: Sequence[int], repeat: int) -> List[dict]:
+    runners = {STAGE_CONVERTER: _converter_runner, STAGE_ENDPOINT: _endpoint_runner}
+    results = []
+    for stage in stages:
+        for lines in sizes:
+            result = measure(runners[stage](lines), repeat)
+            budget = peak_budget(stage, lines)
+            failures = []
+            if result["peak"] > budget:
+                failures.append(f"peak {result['peak']} > {budget}")
+            if result["retained"] > settings.memory_budget_retained:
+                failures.append(f"retained {result['retained']} > {settings.memory_budget_retained}")
+            results.append({
+                "stage": stage,
+                "lines": lines,
+                **result,
+                "peak_per_line": result["peak"] // lines,
+                "peak_budget": budget,
+                "ok": not failures,
+                "failures": failures,
+            })
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Memoria por conversion (tracemalloc y RSS) contra presupuestos")
+    parser.add_argument("--stage", action="append", choices=[STAGE_CONVERTER, STAGE_ENDPOINT],
+                        help="Etapas a medir (por defecto converter); endpoint usa una base SQLite temporal")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Lineas por ticket, separadas por coma")
+    parser.add_argument("--repeat", type=int, default=5, help="Conversiones medidas por tamano")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    results = run_benchmark(args.stage or [STAGE_CONVERTER], sizes, args.repeat)
+    for result in results:
+        print(json.dumps(result))
+    return 0 if all(result["ok"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
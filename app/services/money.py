@@ -0,0 +1,64 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Union
+
+# Los montos se manejan como enteros escalados en milesimas, la misma escala de las columnas
+# Numeric(10, 3) de los modelos. Se parsean una sola vez al ingresar y toda la aritmetica es entera.
+SCALE_DIGITS = 3
+SCALE = 10 ** SCALE_DIGITS
+
+_QUANTUM = Decimal(1).scaleb(-SCALE_DIGITS)
+
+
+def parse_amount(value: Union[int, float, str, Decimal]) -> int:
+    """Convertir un monto (float, str, Decimal o int) a entero escalado en milesimas"""
+    if isinstance(value, bool):
+        raise ValueError("Amount must be a number")
+    if isinstance(value, int):
+        return value * SCALE
+    if isinstance(value, float):
+        # repr(float) entrega el decimal mas corto que representa el valor (12.1 -> "12.1")
+        value = repr(value)
+    try:
+        amount = Decimal(value)
+    except ArithmeticError:
+        raise ValueError(f"Invalid amount: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+    return int(amount.quantize(_QUANTUM, rounding=ROUND_HALF_UP).scaleb(SCALE_DIGITS))
+
+
+def to_decimal(units: int) -> Decimal:
+    """Convertir un monto en milesimas a Decimal, para las columnas Numeric(10, 3)"""
+    return Decimal(units).scaleb(-SCALE_DIGITS)
+
+
+def rescale(units: int, decimals: int) -> int:
+    """Reescalar un monto en milesimas a `decimals` decimales, redondeando mitad hacia arriba"""
+    if decimals >= SCALE_DIGITS:
+        return units * 10 ** (decimals - SCALE_DIGITS)
+    divisor = 10 ** (SCALE_DIGITS - decimals)
+    quotient, remainder = divmod(abs(units), divisor)
+    if remainder * 2 >= divisor:
+        quotient += 1
+    return -quotient if units < 0 else quotient
+
+
+def format_amount(units: int, decimals: int = SCALE_DIGITS) -> str:
+    """Formatear un monto en milesimas con punto decimal (2550000 -> "2550.000")"""
+    value = rescale(units, decimals)
+    if decimals == 0:
+        return str(value)
+    sign = "-" if value < 0 else ""
+    integer, fraction = divmod(abs(value), 10 ** decimals)
+    return f"{sign}{integer}.{fraction:0{decimals}d}"
+
+
+def format_implied(units: int, decimals: int = 2, width: int = 0) -> str:
+    """
+    Formatear un monto en milesimas con decimales implicitos y relleno de ceros,
+    como el formato XXXXXXXXYY del TSL (100000.00 -> "0010000000" con width=10)
+    """
+    value = rescale(units, decimals)
+    if value < 0:
+        return f"-{-value:0{max(width - 1, 0)}d}"
+    return f"{value:0{width}d}"
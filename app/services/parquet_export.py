@@ -0,0 +1,293 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+import argparse
+import json
+import logging
+import os
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import settings
+from . import money
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional; solo lo necesita el job de exportacion
+    pa = pq = None
+
+STATE_FILE = "_export_state.json"
+ROW_GROUP_SIZE = 50000
+
+_TRANSACTION_COLUMNS = (
+    "id", "user_id", "store_id", "pos_id", "transaction_type", "document_type", "transaction_number",
+    "transaction_date", "total_amount", "customer_external_id", "status", "created_at",
+)
+_ITEM_COLUMNS = ("id", "transaction_id", "product_id", "sku", "quantity", "unit_price", "discount", "total_price", "created_at")
+_PAYMENT_COLUMNS = ("id", "transaction_id", "payment_method", "amount", "provider", "created_at")
+
+# Columnas de montos: Numeric(10, 3) en la base, decimal128(10, 3) en Parquet
+_AMOUNT_COLUMNS = {"total_amount", "unit_price", "discount", "total_price", "amount"}
+
+
+def _schemas() -> Dict[str, "pa.Schema"]:
+    amount = pa.decimal128(10, 3)
+    # transaction_date es la hora local del POS (sin zona); created_at es UTC del servidor
+    created_at = pa.timestamp("us", tz="UTC")
+    return {
+        "transactions": pa.schema([
+            ("id", pa.int64()), ("user_id", pa.int64()), ("store_id", pa.string()), ("pos_id", pa.string()),
+            ("transaction_type", pa.string()), ("document_type", pa.string()), ("transaction_number", pa.string()),
+            ("transaction_date", pa.timestamp("us")), ("total_amount", amount),
+            ("customer_external_id", pa.string()), ("status", pa.string()), ("created_at", created_at),
+        ]),
+        "transaction_items": pa.schema([
+            ("id", pa.int64()), ("transaction_id", pa.int64()), ("product_id", pa.int64()), ("sku", pa.string()),
+            ("quantity", pa.int32()), ("unit_price", amount), ("discount", amount), ("total_price", amount),
+            ("created_at", created_at),
+        ]),
+        "transaction_payments": pa.schema([
+            ("id", pa.int64()), ("transaction_id", pa.int64()), ("payment_method", pa.string()),
+            ("amount", amount), ("provider", pa.string()), ("created_at", created_at),
+        ]),
+    }
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps del servidor como UTC (SQLite los retorna sin zona)"""
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _wall_clock(value: Optional[datetime]) -> Optional[datetime]:
+    return value.replace(tzinfo=None) if value is not None and value.tzinfo is not None else value
+
+
+def _normalize(columns: Sequence[str], row) -> tuple:
+    values = []
+    for column, value in zip(columns, row):
+        if column in _AMOUNT_COLUMNS and value is not None:
+            value = money.to_decimal(money.parse_amount(value))
+        elif column == "created_at":
+            value = _utc(value)
+        elif column == "transaction_date":
+            value = _wall_clock(value)
+        values.append(value)
+    return tuple(values)
+
+
+class _PartitionedWriter:
+    """
+    Escritor Parquet particionado por dia (<tabla>/date=YYYY-MM-DD/<archivo>). Las filas se
+    acumulan por dia y se escriben en row groups de ROW_GROUP_SIZE, asi la memoria queda acotada
+    aunque el lote tenga millones de lineas. Cada archivo se escribe como .tmp y se renombra al
+    cerrar, de modo que una corrida interrumpida no deja archivos a medias.
+    """
+
+    def __init__(self, root: str, table_name: str, schema: "pa.Schema", file_name: str):
+        self.root = root
+        self.table_name = table_name
+        self.schema = schema
+        self.file_name = file_name
+        self.rows = 0
+        self._buffers: Dict[date, List[tuple]] = {}
+        self._writers: Dict[date, Tuple[str, "pq.ParquetWriter"]] = {}
+
+    def add(self, day: date, row: tuple) -> None:
+        buffer = self._buffers.setdefault(day, [])
+        buffer.append(row)
+        self.rows += 1
+        if len(buffer) >= ROW_GROUP_SIZE:
+            self._flush(day)
+
+    def close(self) -> List[str]:
+        for day in list(self._buffers):
+            self._flush(day)
+        paths = []
+        for tmp_path, writer in self._writers.values():
+            writer.close()
+            path = tmp_path[:-len(".tmp")]
+            os.replace(tmp_path, path)
+            paths.append(path)
+        self._writers.clear()
+        return paths
+
+    def abort(self) -> None:
+        for tmp_path, writer in self._writers.values():
+            writer.close()
+            os.remove(tmp_path)
+        self._writers.clear()
+
+    def _flush(self, day: date) -> None:
+        rows = self._buffers.pop(day, None)
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+            schema=self.schema,
+        )
+        entry = self._writers.get(day)
+        if entry is None:
+            directory = os.path.join(self.root, self.table_name, f"date={day.isoformat()}")
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = os.path.join(directory, self.file_name + ".tmp")
+            entry = self._writers[day] = (tmp_path, pq.ParquetWriter(tmp_path, self.schema, compression="zstd"))
+        entry[1].write_batch(batch)
+
+
+def load_state(export_dir: str) -> dict:
+    try:
+        with open(os.path.join(export_dir, STATE_FILE), encoding="utf-8") as state_file:
+            return json.load(state_file)
+    except FileNotFoundError:
+        return {"last_transaction_id": 0}
+
+
+def save_state(export_dir: str, state: dict) -> None:
+    path = os.path.join(export_dir, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as state_file:
+        json.dump(state, state_file)
+    os.replace(path + ".tmp", path)
+
+
+def _table_columns(model, names: Sequence[str]):
+    return [getattr(model, name) for name in names]
+
+
+def export_batch(db: Session, export_dir: str, after_id: int, batch_size: int, cutoff: datetime) -> Optional[dict]:
+    """
+    Exportar el siguiente lote de transacciones (id > after_id) con sus lineas y pagos.
+    Solo se exportan transacciones creadas antes de `cutoff`: el lote se corta en la primera mas
+    reciente, para no saltar ids de transacciones que aun podrian estar por confirmarse.
+    Retorna None si no hay nada nuevo.
+    """
+    rows = db.execute(
+        select(*_table_columns(models.Transaction, _TRANSACTION_COLUMNS))
+        .where(models.Transaction.id > after_id)
+        .order_by(models.Transaction.id)
+        .limit(batch_size)
+    ).all()
+    created_at_index = _TRANSACTION_COLUMNS.index("created_at")
+    date_index = _TRANSACTION_COLUMNS.index("transaction_date")
+    for position, row in enumerate(rows):
+        if _utc(row[created_at_index]) is None or _utc(row[created_at_index]) > cutoff:
+            rows = rows[:position]
+            break
+    if not rows:
+        return None
+
+    first_id, last_id = rows[0][0], rows[-1][0]
+    # Nombre determinista por lote: reexportar tras una falla reemplaza los mismos archivos
+    file_name = f"part-{first_id:012d}.parquet"
+    schemas = _schemas()
+    writers = {
+        name: _PartitionedWriter(export_dir, name, schema, file_name) for name, schema in schemas.items()
+    }
+    try:
+        days: Dict[int, date] = {}
+        for row in rows:
+            row = _normalize(_TRANSACTION_COLUMNS, row)
+            # Particion por dia de negocio (fecha del POS); sin fecha, el dia de creacion
+            day = (row[date_index] or row[created_at_index]).date()
+            days[row[0]] = day
+            writers["transactions"].add(day, row)
+        del rows
+
+        for name, model, columns in (
+            ("transaction_items", models.TransactionItem, _ITEM_COLUMNS),
+            ("transaction_payments", models.TransactionPayment, _PAYMENT_COLUMNS),
+        ):
+            query = (
+                select(*_table_columns(model, columns))
+                .where(model.transaction_id.between(first_id, last_id))
+                .order_by(model.transaction_id, model.id)
+                .execution_options(yield_per=ROW_GROUP_SIZE)
+            )
+            for row in db.execute(query):
+                day = days.get(row[1])
+                if day is not None:
+                    writers[name].add(day, _normalize(columns, row))
+
+        files = []
+        for writer in writers.values():
+            files.extend(writer.close())
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+
+    return {
+        "first_id": first_id,
+        "last_id": last_id,
+        "transactions": writers["transactions"].rows,
+        "items": writers["transaction_items"].rows,
+        "payments": writers["transaction_payments"].rows,
+        "files": files,
+    }
+
+
+def export_new(
+    db: Session,
+    export_dir: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    settle_seconds: Optional[float] = None,
+) -> dict:
+    """
+    Exportar a Parquet las transacciones nuevas desde la ultima corrida (marca de agua por id en
+    <export_dir>/_export_state.json), por lotes de `batch_size` transacciones. La marca avanza
+    despues de escribir cada lote, asi una corrida interrumpida continua donde quedo.
+    """
+    if pa is None:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package")
+    export_dir = export_dir or settings.export_dir
+    batch_size = batch_size or settings.export_batch_size
+    settle_seconds = settings.export_settle_seconds if settle_seconds is None else settle_seconds
+    os.makedirs(export_dir, exist_ok=True)
+
+    state = load_state(export_dir)
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settle_seconds)
+    summary = {"batches": 0, "transactions": 0, "items": 0, "payments": 0, "files": 0}
+    while True:
+        result = export_batch(db, export_dir, state["last_transaction_id"], batch_size, cutoff)
+        if result is None:
+            break
+        state["last_transaction_id"] = result["last_id"]
+        state["exported_at"] = datetime.now(timezone.utc).isoformat()
+        save_state(export_dir, state)
+        summary["batches"] += 1
+        summary["files"] += len(result["files"])
+        for key in ("transactions", "items", "payments"):
+            summary[key] += result[key]
+        logger.info("Exported transactions %d-%d (%d files)", result["first_id"], result["last_id"], len(result["files"]))
+        # Las filas ya escritas no se necesitan en la sesion
+        db.expunge_all()
+    summary["last_transaction_id"] = state["last_transaction_id"]
+    return summary
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Exportar transacciones, lineas y pagos nuevos a Parquet por dia")
+    parser.add_argument("--dir", default=None, help="Directorio de exportacion (por defecto EXPORT_DIR)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Transacciones por lote")
+    parser.add_argument("--settle-seconds", type=float, default=None,
+                        help="No exportar transacciones creadas hace menos de N segundos")
+    args = parser.parse_args(argv)
+
+    from ..database import ReadSessionLocal
+    logging.basicConfig(level=logging.INFO)
+    db = ReadSessionLocal()
+    try:
+        summary = export_new(db, export_dir=args.dir, batch_size=args.batch_size, settle_seconds=args.settle_seconds)
+    finally:
+        db.close()
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
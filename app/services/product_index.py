@@ -0,0 +1,136 @@
+from array import array
+from typing import Dict, List, NamedTuple, Optional
+import threading
+import time
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import settings
+from . import money
+
+
+class ProductEntry(NamedTuple):
+    id: int
+    category_id: Optional[int]
+    price: int  # Precio en milesimas (ver services.money)
+    is_active: bool
+
+
+class ProductIndex:
+    """
+    Indice en memoria de productos por barcode/sku para enriquecer las lineas del TSL.
+
+    Cada producto ocupa un "slot" en arreglos paralelos (`array` de enteros y un `bytearray`)
+    en lugar de un objeto ORM por producto, de modo que un catalogo de ~200k SKUs cabe en unos
+    pocos MB. Los diccionarios `barcode -> slot` y `sku -> slot` permiten lookups O(1).
+
+    El indice se carga desde la tabla `products` y se refresca incrementalmente usando
+    `updated_at` (o `created_at` para filas nunca actualizadas) como marca de agua.
+    """
+
+    _NO_CATEGORY = -1
+    _BATCH_SIZE = 5000
+
+    def __init__(self, refresh_interval: float = 60):
+        self._refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._last_refresh = None
+        self._watermark = None
+
+        self._slot_by_key: Dict[str, int] = {}
+        self._slot_by_id: Dict[int, int] = {}
+        self._ids = array("q")
+        self._category_ids = array("q")
+        self._prices = array("q")
+        self._active = bytearray()
+        # Claves de cada slot, para poder retirarlas si el producto cambia de barcode/sku
+        self._barcodes: List[Optional[str]] = []
+        self._skus: List[Optional[str]] = []
+
+    def __len__(self):
+        return len(self._ids)
+
+    def lookup(self, key: Optional[str]) -> Optional[ProductEntry]:
+        """Obtener producto por barcode o sku"""
+        if not key:
+            return None
+        slot = self._slot_by_key.get(key)
+        if slot is None:
+            return None
+        category_id = self._category_ids[slot]
+        return ProductEntry(
+            id=self._ids[slot],
+            category_id=None if category_id == self._NO_CATEGORY else category_id,
+            price=self._prices[slot],
+            is_active=bool(self._active[slot]),
+        )
+
+    def refresh_if_stale(self, db: Session) -> None:
+        """Refrescar el indice si paso el intervalo configurado desde el ultimo refresco"""
+        last_refresh = self._last_refresh
+        if last_refresh is not None and time.monotonic() - last_refresh < self._refresh_interval:
+            return
+        self.refresh(db)
+
+    def refresh(self, db: Session) -> int:
+        """Cargar productos nuevos o modificados desde la marca de agua. Retorna filas leidas."""
+        with self._lock:
+            stamp = func.coalesce(models.Product.updated_at, models.Product.created_at)
+            query = db.query(
+                models.Product.id,
+                models.Product.barcode,
+                models.Product.sku,
+                models.Product.category_id,
+                models.Product.price,
+                models.Product.is_active,
+                stamp,
+            )
+            # Se usa >= para no perder filas con la misma marca de tiempo; reaplicar una fila es idempotente
+            if self._watermark is not None:
+                query = query.filter(stamp >= self._watermark)
+
+            rows = 0
+            for product_id, barcode, sku, category_id, price, is_active, updated in (
+                query.order_by(stamp).yield_per(self._BATCH_SIZE)
+            ):
+                self._upsert(product_id, barcode, sku, category_id, price, is_active)
+                if updated is not None:
+                    self._watermark = updated
+                rows += 1
+
+            self._last_refresh = time.monotonic()
+            return rows
+
+    def _upsert(self, product_id, barcode, sku, category_id, price, is_active) -> None:
+        price = money.parse_amount(price or 0)
+        category_id = self._NO_CATEGORY if category_id is None else category_id
+        slot = self._slot_by_id.get(product_id)
+
+        if slot is None:
+            slot = len(self._ids)
+            self._ids.append(product_id)
+            self._category_ids.append(category_id)
+            self._prices.append(price)
+            self._active.append(1 if is_active else 0)
+            self._barcodes.append(barcode)
+            self._skus.append(sku)
+            self._slot_by_id[product_id] = slot
+        else:
+            for old_key in (self._barcodes[slot], self._skus[slot]):
+                if old_key and self._slot_by_key.get(old_key) == slot:
+                    del self._slot_by_key[old_key]
+            self._category_ids[slot] = category_id
+            self._prices[slot] = price
+            self._active[slot] = 1 if is_active else 0
+            self._barcodes[slot] = barcode
+            self._skus[slot] = sku
+
+        if barcode:
+            self._slot_by_key[barcode] = slot
+        if sku:
+            self._slot_by_key[sku] = slot
+
+
+product_index = ProductIndex(refresh_interval=settings.product_index_refresh_seconds)
@@ -0,0 +1,295 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import zlib
+
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import money
+from .tsl_converter import TSLConverter, TSLConverterSubstringType
+
+logger = logging.getLogger(__name__)
+
+# Posicion de los campos en el registro CABECERA, segun el orden de su plantilla
+_CABECERA_FIELDS = list(TSLConverter.data_transaction[TSLConverterSubstringType.CABECERA])
+_LOCAL = _CABECERA_FIELDS.index("Local")
+_NUM_TRX = _CABECERA_FIELDS.index("NumTrx")
+_FECHA = _CABECERA_FIELDS.index("Fecha")
+_TOTAL = _CABECERA_FIELDS.index("Total")
+
+_FS = TSLConverter.FS.encode(TSLConverter.ENCODING)
+_RECORD_SEPARATOR = b'","'
+
+MISSING_IN_FILES = "missing_in_files"
+MISSING_IN_DB = "missing_in_db"
+DUPLICATE = "duplicate"
+MISMATCHED = "mismatched"
+
+
+def shard_for(store_id: str, shards: int) -> int:
+    """Shard estable entre procesos para una tienda"""
+    return zlib.crc32(store_id.encode()) % shards
+
+
+def _parse_total(value: str) -> Optional[int]:
+    try:
+        return money.parse_amount(value)
+    except ValueError:
+        return None
+
+
+def _format_total(units: Optional[int]) -> str:
+    return "" if units is None else str(units)
+
+
+def tsl_files_between(tsl_dir: str, first: date, last: date) -> List[str]:
+    """Archivos TSL escritos entre dos dias, inclusive (el nombre lleva la fecha de escritura)"""
+    prefix = TSLConverter.OUTPUT_PREFIX
+    first_key, last_key = first.strftime("%Y%m%d"), last.strftime("%Y%m%d")
+    paths = []
+    for entry in os.scandir(tsl_dir):
+        name = entry.name
+        if entry.is_file() and name.startswith(prefix) and first_key <= name[len(prefix):len(prefix) + 8] <= last_key:
+            paths.append(entry.path)
+    return sorted(paths)
+
+
+def _day_bounds(day: date):
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def conversion_window(db: Session, day: date):
+    """
+    Dias en que se pudieron escribir los archivos con tickets del dia: desde el dia anterior
+    hasta el dia siguiente a la ultima conversion registrada (los POS sin conexion envian tarde).
+    """
+    start, end = _day_bounds(day)
+    first, last = db.execute(
+        select(func.min(models.TransactionTSLData.created_at), func.max(models.TransactionTSLData.created_at))
+        .join(models.Transaction, models.Transaction.id == models.TransactionTSLData.transaction_id)
+        .where(models.Transaction.transaction_date >= start)
+        .where(models.Transaction.transaction_date < end)
+    ).one()
+    days = [day] + [_as_date(value) for value in (first, last) if value is not None]
+    return min(days) - timedelta(days=1), max(days) + timedelta(days=1)
+
+
+def _as_date(value) -> date:
+    # SQLite retorna el timestamp de func.min/max como texto
+    return datetime.fromisoformat(value).date() if isinstance(value, str) else value.date()
+
+
+def _split_tsl_files(paths: Sequence[str], day: str, shard_dir: str, task: int, shards: int) -> int:
+    """
+    Leer archivos TSL linea a linea y repartir los tickets del dia (Fecha = `day`) en archivos
+    por shard: tienda, NumTrx, total en milesimas y archivo de origen. Se ejecuta en el pool.
+    """
+    outputs = {}
+    count = 0
+    encoded_day = day.encode()
+    try:
+        for path in paths:
+            source = os.path.basename(path)
+            with open(path, "rb") as tsl_file:
+                for line in tsl_file:
+                    line = line.rstrip(b"\r\n")
+                    if not line:
+                        continue
+                    # Cada linea es una transaccion: "00FS...","01FS...",...; el primer registro es la cabecera
+                    header = line.split(_RECORD_SEPARATOR, 1)[0].lstrip(b'"').rstrip(b'"').split(_FS)
+                    if len(header) <= _TOTAL or header[_FECHA] != encoded_day:
+                        continue
+                    store_id = header[_LOCAL].decode(TSLConverter.ENCODING)
+                    shard = shard_for(store_id, shards)
+                    output = outputs.get(shard)
+                    if output is None:
+                        output = outputs[shard] = open(
+                            os.path.join(shard_dir, f"files_{task}_{shard}.tsv"), "w", encoding="utf-8"
+                        )
+                    total = _parse_total(header[_TOTAL].decode(TSLConverter.ENCODING))
+                    number = header[_NUM_TRX].decode(TSLConverter.ENCODING)
+                    output.write(f"{store_id}\t{number}\t{_format_total(total)}\t{source}\n")
+                    count += 1
+    finally:
+        for output in outputs.values():
+            output.close()
+    return count
+
+
+def _reconcile_shard(shard_dir: str, shard: int) -> Dict[str, int]:
+    """
+    Comparar los tickets de un shard: los de la base de datos se cargan en memoria (solo las
+    tiendas del shard) y los de los archivos se recorren en streaming. Las diferencias se
+    escriben como NDJSON en details_<shard>.ndjson.
+    """
+    expected: Dict[tuple, str] = {}
+    db_path = os.path.join(shard_dir, f"db_{shard}.tsv")
+    if os.path.exists(db_path):
+        with open(db_path, encoding="utf-8") as db_file:
+            for line in db_file:
+                store_id, number, total = line.rstrip("\n").split("\t")
+                expected[(store_id, number)] = total
+
+    suffix = f"_{shard}.tsv"
+    file_paths = sorted(
+        os.path.join(shard_dir, name) for name in os.listdir(shard_dir)
+        if name.startswith("files_") and name.endswith(suffix)
+    )
+
+    counts = Counter()
+    seen = {}
+    with open(os.path.join(shard_dir, f"details_{shard}.ndjson"), "w", encoding="utf-8") as details:
+        def report(kind: str, store_id: str, number: str, **extra) -> None:
+            counts[kind] += 1
+            details.write(json.dumps({"type": kind, "store_id": store_id, "transaction_number": number, **extra}) + "\n")
+
+        for path in file_paths:
+            with open(path, encoding="utf-8") as shard_file:
+                for line in shard_file:
+                    store_id, number, total, source = line.rstrip("\n").split("\t")
+                    key = (store_id, number)
+                    counts["file_tickets"] += 1
+                    if key in seen:
+                        report(DUPLICATE, store_id, number, files=[seen[key], source])
+                        continue
+                    seen[key] = source
+                    expected_total = expected.pop(key, None)
+                    if expected_total is None:
+                        report(MISSING_IN_DB, store_id, number, file=source,
+                               file_total=money.format_amount(int(total)) if total else None)
+                    elif total != expected_total:
+                        report(MISMATCHED, store_id, number, file=source,
+                               db_total=money.format_amount(int(expected_total)),
+                               file_total=money.format_amount(int(total)) if total else None)
+                    else:
+                        counts["matched"] += 1
+
+        for (store_id, number), total in expected.items():
+            report(MISSING_IN_FILES, store_id, number, db_total=money.format_amount(int(total)))
+    return dict(counts)
+
+
+def _write_db_shards(db: Session, day: date, shard_dir: str, shards: int) -> int:
+    """Repartir por shard las transacciones del dia que tienen TSL, leyendolas en streaming"""
+    start, end = _day_bounds(day)
+    query = (
+        select(models.Transaction.store_id, models.Transaction.transaction_number, models.Transaction.total_amount)
+        .where(models.Transaction.transaction_date >= start)
+        .where(models.Transaction.transaction_date < end)
+        .where(exists().where(models.TransactionTSLData.transaction_id == models.Transaction.id))
+        .execution_options(yield_per=5000)
+    )
+    outputs = {}
+    count = 0
+    try:
+        for store_id, number, total_amount in db.execute(query):
+            store_id = store_id or ""
+            shard = shard_for(store_id, shards)
+            output = outputs.get(shard)
+            if output is None:
+                output = outputs[shard] = open(os.path.join(shard_dir, f"db_{shard}.tsv"), "w", encoding="utf-8")
+            output.write(f"{store_id}\t{number}\t{money.parse_amount(total_amount)}\n")
+            count += 1
+    finally:
+        for output in outputs.values():
+            output.close()
+    return count
+
+
+def _chunks(items: Sequence[str], count: int) -> Iterable[Sequence[str]]:
+    size = max(-(-len(items) // count), 1)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def reconcile_day(
+    db: Session,
+    day: date,
+    tsl_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    details_path: Optional[str] = None,
+) -> dict:
+    """
+    Conciliar los tickets del dia entre transaction_tsl_data y los archivos TSL.
+
+    Los archivos se leen en paralelo en un pool de procesos mientras el proceso principal
+    recorre la base de datos; ambos lados se reparten por tienda en archivos temporales y cada
+    shard se compara en el pool. Nada se carga completo en memoria. Si se indica `details_path`
+    se escriben ahi las diferencias (NDJSON).
+    """
+    tsl_dir = tsl_dir or TSLConverter.output_dir()
+    workers = workers or os.cpu_count() or 1
+    shards = workers * 4
+    shard_dir = tempfile.mkdtemp(prefix="tsl-reconcile-")
+    try:
+        paths = tsl_files_between(tsl_dir, *conversion_window(db, day)) if os.path.isdir(tsl_dir) else []
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            split_tasks = [
+                executor.submit(_split_tsl_files, chunk, day.strftime("%Y%m%d"), shard_dir, task, shards)
+                for task, chunk in enumerate(_chunks(paths, shards))
+            ]
+            db_tickets = _write_db_shards(db, day, shard_dir, shards)
+            for task in split_tasks:
+                task.result()
+
+            counts = Counter()
+            for shard_counts in executor.map(_reconcile_shard, [shard_dir] * shards, range(shards)):
+                counts.update(shard_counts)
+
+        if details_path:
+            with open(details_path, "wb") as details:
+                for shard in range(shards):
+                    with open(os.path.join(shard_dir, f"details_{shard}.ndjson"), "rb") as shard_details:
+                        shutil.copyfileobj(shard_details, details)
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+    return {
+        "date": day.isoformat(),
+        "files": len(paths),
+        "db_tickets": db_tickets,
+        "file_tickets": counts["file_tickets"],
+        "matched": counts["matched"],
+        MISSING_IN_FILES: counts[MISSING_IN_FILES],
+        MISSING_IN_DB: counts[MISSING_IN_DB],
+        DUPLICATE: counts[DUPLICATE],
+        MISMATCHED: counts[MISMATCHED],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Conciliar tickets de transaction_tsl_data contra los archivos TSL")
+    parser.add_argument("--date", type=date.fromisoformat, default=None,
+                        help="Dia a conciliar (YYYY-MM-DD, fecha de la transaccion); por defecto ayer")
+    parser.add_argument("--tsl-dir", default=None, help="Directorio de archivos TSL (por defecto ./tsl_files)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos del pool (por defecto, CPUs)")
+    parser.add_argument("--details", default=None, help="Archivo NDJSON donde escribir cada diferencia")
+    args = parser.parse_args(argv)
+
+    from ..database import ReadSessionLocal
+    logging.basicConfig(level=logging.INFO)
+    day = args.date or date.today() - timedelta(days=1)
+    db = ReadSessionLocal()
+    try:
+        summary = reconcile_day(db, day, tsl_dir=args.tsl_dir, workers=args.workers, details_path=args.details)
+    finally:
+        db.close()
+    print(json.dumps(summary))
+    discrepancies = summary[MISSING_IN_FILES] + summary[MISSING_IN_DB] + summary[DUPLICATE] + summary[MISMATCHED]
+    return 1 if discrepancies else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
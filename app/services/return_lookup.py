@@ -0,0 +1,173 @@
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import threading
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import settings
+from .tsl_conversion import InvalidTicket
+
+
+class OriginalTransactionNotFound(InvalidTicket):
+    """La venta original referenciada por una devolucion no existe"""
+
+
+class OriginalSale(NamedTuple):
+    """Venta original de una devolucion: identidad y sus lineas en el orden del ticket"""
+    transaction_id: int
+    store_id: Optional[str]
+    pos_id: Optional[str]
+    transaction_number: str
+    transaction_date: datetime
+    # (codigo, product_id) por linea; el codigo es el sku guardado (sku o barcode del POS)
+    lines: Tuple[Tuple[Optional[str], Optional[int]], ...]
+
+    def header_fields(self) -> Dict[str, object]:
+        """Campos de origen para la cabecera y el registro 99/07"""
+        return {
+            "origin_store_id": self.store_id,
+            "origin_pos_id": self.pos_id,
+            "origin_transaction_number": self.transaction_number,
+            "origin_date": self.transaction_date.strftime("%Y%m%d"),
+        }
+
+    def line_positions(self, lines: Sequence) -> List[int]:
+        """
+        Posicion (desde 1) en la venta original de cada linea devuelta, por product_id o por
+        codigo. Si un producto aparece varias veces se usa la primera posicion no asignada.
+        """
+        by_key: Dict[tuple, List[int]] = {}
+        for position, (code, product_id) in enumerate(self.lines, 1):
+            if product_id is not None:
+                by_key.setdefault(("product", product_id), []).append(position)
+            if code:
+                by_key.setdefault(("code", code), []).append(position)
+
+        used = set()
+        positions = []
+        for line in lines:
+            keys = [("code", code) for code in (line.sku or line.barcode, line.barcode, line.sku) if code]
+            if line.product_id is not None:
+                keys.insert(0, ("product", line.product_id))
+            position = next(
+                (position for key in keys for position in by_key.get(key, ()) if position not in used), None
+            )
+            if position is None:
+                raise OriginalTransactionNotFound(
+                    f"Item {line.barcode or line.sku} is not in original transaction {self.transaction_number}"
+                )
+            used.add(position)
+            positions.append(position)
+        return positions
+
+
+def sale_from_ticket(transaction_id: int, transaction, ticket) -> OriginalSale:
+    """OriginalSale de un ticket recien convertido (mismos codigos que guarda transaction_store)"""
+    return OriginalSale(
+        transaction_id,
+        transaction.store_id,
+        transaction.pos_id,
+        transaction.transaction_number,
+        transaction.transaction_date,
+        tuple((line.sku or line.barcode, line.product_id) for line in ticket.lines),
+    )
+
+
+class RecentSales:
+    """
+    LRU acotado de ventas recientes para resolver devoluciones sin ir a la base: las
+    conversiones de este worker se registran al guardarse y las consultas a la base tambien
+    quedan en cache. Un miss consulta el indice (store_id, pos_id, transaction_number,
+    transaction_date) de transactions, nunca un scan. Los no encontrados no se cachean: la
+    venta puede llegar despues.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, OriginalSale]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(store_id, pos_id, transaction_number, day: date) -> tuple:
+        return store_id, pos_id, transaction_number, day
+
+    def remember(self, sale: OriginalSale) -> None:
+        if self.max_entries <= 0 or sale.transaction_date is None:
+            return
+        key = self._key(sale.store_id, sale.pos_id, sale.transaction_number, sale.transaction_date.date())
+        with self._lock:
+            self._entries[key] = sale
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def find(self, db: Session, store_id: Optional[str], pos_id: str, transaction_number: str, day: date) -> OriginalSale:
+        key = self._key(store_id, pos_id, transaction_number, day)
+        with self._lock:
+            sale = self._entries.get(key)
+            if sale is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return sale
+            self.misses += 1
+
+        sale = _load_sale(db, store_id, pos_id, transaction_number, day)
+        if sale is None:
+            raise OriginalTransactionNotFound(
+                f"Original transaction {transaction_number} not found for store {store_id}, POS {pos_id} on {day.isoformat()}"
+            )
+        self.remember(sale)
+        return sale
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def _load_sale(db: Session, store_id, pos_id, transaction_number, day: date) -> Optional[OriginalSale]:
+    # Igualdad en las tres primeras columnas del indice y rango de un dia en transaction_date
+    start = datetime.combine(day, time.min)
+    row = db.execute(
+        select(models.Transaction.id, models.Transaction.transaction_date)
+        .where(models.Transaction.store_id == store_id)
+        .where(models.Transaction.pos_id == pos_id)
+        .where(models.Transaction.transaction_number == transaction_number)
+        .where(models.Transaction.transaction_date >= start)
+        .where(models.Transaction.transaction_date < start + timedelta(days=1))
+    ).first()
+    if row is None:
+        return None
+    lines = db.execute(
+        select(models.TransactionItem.sku, models.TransactionItem.product_id)
+        .where(models.TransactionItem.transaction_id == row.id)
+        .order_by(models.TransactionItem.id)
+    ).all()
+    return OriginalSale(
+        row.id, store_id, pos_id, transaction_number, row.transaction_date,
+        tuple((sku, product_id) for sku, product_id in lines),
+    )
+
+
+def resolve(db: Session, transaction) -> Optional[OriginalSale]:
+    """Venta original de la devolucion (None si el ticket no referencia una)"""
+    reference = transaction.original_transaction
+    if reference is None:
+        return None
+    return recent_sales.find(
+        db,
+        reference.store_id or transaction.store_id,
+        reference.pos_id,
+        reference.transaction_number,
+        reference.transaction_date,
+    )
+
+
+recent_sales = RecentSales(max_entries=settings.return_lookup_cache_size)
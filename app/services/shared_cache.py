@@ -0,0 +1,306 @@
+from collections import OrderedDict
+from typing import Any, Optional
+import json
+import logging
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheBackend:
+    """Backend en memoria del proceso (LRU con TTL). Solo para un worker o para pruebas."""
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max(max_entries, 1)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.time()):
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def _store(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        self._entries[key] = (value, time.time() + ttl if ttl else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._entries.get(key, (b"0", None))[0]) + 1
+            self._entries[key] = (str(value).encode(), None)
+            return value
+
+
+class SQLiteCacheBackend:
+    """
+    Backend compartido por todos los workers del host en un archivo SQLite local (modo WAL).
+
+    Cada hilo usa su propia conexion. El tamano se acota a `max_entries`: cada cierto numero de
+    escrituras se eliminan las entradas expiradas y, si aun sobran, las mas antiguas.
+    """
+
+    _PRUNE_EVERY = 256
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max(max_entries, 1)
+        self._local = threading.local()
+        self._writes = 0
+        # Solo el usuario del proceso puede leer o escribir el archivo (reservas y respuestas de idempotencia)
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        os.chmod(path, 0o600)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._connection().execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl if ttl else None),
+        )
+        self._after_write()
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM cache_entries WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl if ttl else None),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._after_write()
+        return cursor.rowcount == 1
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def incr(self, key: str) -> int:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM cache_entries WHERE key = ?", (key,)).fetchone()
+            value = int(row[0]) + 1 if row else 1
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, NULL)",
+                (key, str(value).encode()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def _after_write(self) -> None:
+        self._writes += 1
+        if self._writes % self._PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self) -> None:
+        """Eliminar entradas expiradas y, si se supera max_entries, las que vencen primero"""
+        conn = self._connection()
+        conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+        excess = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self.max_entries
+        if excess > 0:
+            # Los contadores de generacion (sin expiracion) nunca se desalojan
+            conn.execute(
+                "DELETE FROM cache_entries WHERE key IN ("
+                "SELECT key FROM cache_entries WHERE expires_at IS NOT NULL ORDER BY expires_at LIMIT ?)",
+                (excess,),
+            )
+
+
+class RedisCacheBackend:
+    """Backend Redis (o cualquier servidor compatible). El tamano lo acota `maxmemory` del servidor."""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(self._client.set(key, value, px=int(ttl * 1000) if ttl else None, nx=True))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+
+class SharedCache:
+    """
+    Cache compartida entre los workers, con espacios de nombres y valores JSON.
+
+    Las claves incluyen la generacion de su espacio de nombres; `invalidate_namespace` incrementa
+    la generacion en el backend compartido, de modo que todos los workers dejan de ver las entradas
+    anteriores (las huerfanas expiran por TTL o se desalojan). Cada worker guarda la generacion en
+    memoria durante `generation_ttl` segundos para no leerla del backend en cada operacion: el
+    worker que invalida la ve de inmediato y los demas a lo sumo `generation_ttl` despues.
+
+    Un error del backend nunca hace fallar la solicitud: se registra y se trata como un miss
+    (o, en `add`, como una reserva no obtenida).
+    """
+
+    def __init__(self, backend, prefix: str = "pos", generation_ttl: float = 0):
+        self.backend = backend
+        self.prefix = prefix
+        self.generation_ttl = generation_ttl
+        # namespace -> (generacion, instante monotonic en que se vuelve a leer del backend)
+        self._generations: dict = {}
+
+    def _generation(self, namespace: str) -> int:
+        cached = self._generations.get(namespace)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        value = self.backend.get(f"{self.prefix}:{namespace}:__gen__")
+        generation = int(value) if value else 0
+        if self.generation_ttl > 0:
+            self._generations[namespace] = (generation, time.monotonic() + self.generation_ttl)
+        return generation
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{self._generation(namespace)}:{key}"
+
+    def get(self, namespace: str, key: str) -> Any:
+        """Obtener un valor; None si no existe, expiro o el backend no responde"""
+        try:
+            value = self.backend.get(self._key(namespace, key))
+        except Exception as e:
+            logger.warning("Shared cache get failed: %s", e)
+            return None
+        return json.loads(value) if value is not None else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Guardar un valor serializable a JSON con TTL en segundos"""
+        try:
+            self.backend.set(self._key(namespace, key), json.dumps(value).encode(), ttl)
+        except Exception as e:
+            logger.warning("Shared cache set failed: %s", e)
+
+    def add(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Guardar solo si la clave no existe (reservas, p.ej. de Idempotency-Key). Si el backend no
+        responde retorna False: sin la cache no se puede garantizar que la reserva sea unica.
+        """
+        try:
+            return self.backend.add(self._key(namespace, key), json.dumps(value).encode(), ttl)
+        except Exception as e:
+            logger.warning("Shared cache add failed: %s", e)
+            return False
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Invalidar una clave en todos los workers"""
+        try:
+            self.backend.delete(self._key(namespace, key))
+        except Exception as e:
+            logger.warning("Shared cache delete failed: %s", e)
+
+    def invalidate_namespace(self, namespace: str) -> None:
+        """Invalidar todas las claves de un espacio de nombres en todos los workers"""
+        try:
+            generation = self.backend.incr(f"{self.prefix}:{namespace}:__gen__")
+        except Exception as e:
+            logger.warning("Shared cache invalidation failed: %s", e)
+            self._generations.pop(namespace, None)
+            return
+        if self.generation_ttl > 0:
+            self._generations[namespace] = (generation, time.monotonic() + self.generation_ttl)
+
+
+def default_sqlite_path() -> str:
+    """
+    Archivo de la cache SQLite por defecto: <tmp>/api-pos-tsl-<uid>/cache.db. El directorio se
+    crea con permisos 0700 y se rechaza si es de otro usuario o accesible por otros (p.ej. creado
+    de antemano en /tmp por otro proceso).
+    """
+    uid = os.getuid() if hasattr(os, "getuid") else None
+    directory = os.path.join(tempfile.gettempdir(), f"api-pos-tsl-{uid if uid is not None else 'cache'}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or (uid is not None and info.st_uid != uid) or info.st_mode & 0o077:
+        raise RuntimeError(f"Cache directory {directory} must be a private directory (0700) owned by this user")
+    return os.path.join(directory, "cache.db")
+
+
+def create_backend():
+    """Crear el backend configurado en CACHE_BACKEND (memory, sqlite o redis)"""
+    if settings.cache_backend == "memory":
+        return MemoryCacheBackend(settings.cache_max_entries)
+    if settings.cache_backend == "redis":
+        if not settings.cache_redis_url:
+            raise RuntimeError("CACHE_BACKEND=redis requires CACHE_REDIS_URL")
+        return RedisCacheBackend(settings.cache_redis_url)
+    if settings.cache_backend == "sqlite":
+        path = settings.cache_sqlite_path or default_sqlite_path()
+        return SQLiteCacheBackend(path, settings.cache_max_entries)
+    raise RuntimeError(f"Unknown CACHE_BACKEND: {settings.cache_backend}")
+
+
+shared_cache = SharedCache(create_backend(), generation_ttl=settings.cache_generation_ttl)
@@ -0,0 +1,206 @@
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+request_logger = logging.getLogger("app.requests")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Contexto de la solicitud en curso; los hilos del threadpool lo heredan (anyio copia el contexto)
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+store_id_var: ContextVar[Optional[str]] = ContextVar("store_id", default=None)
+pos_id_var: ContextVar[Optional[str]] = ContextVar("pos_id", default=None)
+
+_CONTEXT_VARS = (("request_id", request_id_var), ("store_id", store_id_var), ("pos_id", pos_id_var))
+
+# Atributos propios de LogRecord; el resto viene de extra={...} y se agrega al JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+def bind(store_id: Optional[str] = None, pos_id: Optional[str] = None) -> None:
+    """Asociar la tienda y el POS del ticket a los logs del resto de la solicitud"""
+    store_id_var.set(store_id)
+    pos_id_var.set(pos_id)
+
+
+class ContextFilter(logging.Filter):
+    """Copiar el contexto al registro en el hilo que loguea (el listener corre en otro hilo)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for name, var in _CONTEXT_VARS:
+            if not hasattr(record, name):
+                setattr(record, name, var.get())
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Muestreo de eventos de alto volumen: de los registros DEBUG/INFO de un logger se escribe la
+    fraccion configurada en LOG_SAMPLE_RATES (o la de extra={"sample_rate": x}). WARNING y
+    superiores nunca se descartan. El registro lleva su sample_rate para reponderar al agregar.
+    """
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            rate = self.rates.get(record.name)
+            if rate is None:
+                return True
+            record.sample_rate = rate
+        return random.random() < rate
+
+
+class JSONFormatter(logging.Formatter):
+    """Un objeto JSON por linea con el contexto de la solicitud y los campos de extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            record.exc_text = record.exc_text or self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler que nunca bloquea: si la cola esta llena el registro se descarta y se cuenta.
+    El mensaje y la traza se resuelven aqui (los args pueden cambiar despues), pero los campos
+    del registro se conservan para el formateo JSON en el hilo del listener.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure() -> None:
+    """
+    Enviar todos los logs (app, uvicorn y SQL) a una cola; un hilo listener los formatea y los
+    escribe en stdout. Los hilos de las solicitudes solo encolan.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if settings.log_format == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+
+    _handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+    _handler.addFilter(SamplingFilter(settings.log_sample_rates))
+    _handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(settings.log_level.upper())
+    for name in ("uvicorn", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = [_handler]
+        uvicorn_logger.propagate = False
+    # SQL de SQLAlchemy solo con LOG_SQL (reemplaza echo, que escribe directo a stdout): incluye
+    # los parametros, p.ej. hashes de contraseñas, y con carga llena la cola
+    if settings.log_sql:
+        logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown() -> None:
+    """Escribir los registros pendientes y detener el listener"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        if _handler.dropped:
+            sys.stderr.write(f"{_handler.dropped} log records dropped (queue full)\n")
+
+
+class RequestContextMiddleware:
+    """
+    Asigna un request id (el header X-Request-ID del cliente o uno nuevo) a los logs de la
+    solicitud, lo devuelve en la respuesta y registra metodo, ruta, estado y duracion.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = MutableHeaders(scope=scope)
+        request_id = (headers.get(REQUEST_ID_HEADER) or "")[:64] or uuid.uuid4().hex
+        tokens = [request_id_var.set(request_id), store_id_var.set(None), pos_id_var.set(None)]
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append(REQUEST_ID_HEADER, request_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_logger.info(
+                "%s %s %d", scope["method"], scope["path"], status_code,
+                extra={"status_code": status_code, "duration_ms": round((time.perf_counter() - started) * 1000, 2)},
+            )
+            for (_, var), token in zip(_CONTEXT_VARS, tokens):
+                var.reset(token)
@@ -0,0 +1,348 @@
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+from typing import Iterator, List, Optional
+import argparse
+import json
+import logging
+import random
+import sys
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+
+from .. import models
+from .bulk_load import bulk_insert, reset_sequence
+
+logger = logging.getLogger(__name__)
+
+_BRANDS = ["Colun", "Soprole", "Carozzi", "Lucchetti", "CCU", "Coca-Cola", "Nestle", "Evercrisp", "Watts", "Lider",
+           "Costa", "Ideal", "Tucapel", "Chef", "Cachantun", "Andina", "Bresler", "San Jorge", "PF", "Sahne-Nuss"]
+_NOUNS = ["Leche", "Yogurt", "Fideos", "Arroz", "Bebida", "Jugo", "Galletas", "Pan", "Queso", "Jamon", "Cafe",
+          "Te", "Aceite", "Azucar", "Harina", "Detergente", "Shampoo", "Papel Higienico", "Chocolate", "Cerveza"]
+_SIZES = ["200 ml", "500 ml", "1 L", "1.5 L", "3 L", "250 g", "400 g", "1 kg", "5 kg", "pack x6", "pack x12"]
+_CATEGORY_NAMES = ["Lacteos", "Bebidas", "Abarrotes", "Panaderia", "Fiambreria", "Limpieza", "Cuidado Personal",
+                   "Congelados", "Snacks", "Botilleria", "Mascotas", "Bebes", "Frutas y Verduras", "Carnes"]
+_OPERATORS = ["Entel", "Movistar", "Claro", "WOM"]
+
+# Forma de pago de cada pago: (metodo, proveedor, peso)
+_PAYMENT_MIX = [("CASH", None, 45), ("DEBIT_CARD", "Getnet", 30), ("CREDIT_CARD", "Getnet", 20), ("GIFT_CARD", None, 5)]
+# Tipos de transaccion: la gran mayoria son ventas
+_TRANSACTION_TYPES = [("PVT", 97), ("REC", 1), ("DOT", 1), ("RET", 1)]
+# Peso relativo de cada hora del dia (curva de un supermercado)
+_HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 0, 1, 3, 5, 7, 9, 12, 13, 10, 8, 8, 10, 14, 15, 12, 7, 3, 1]
+
+
+def ean13(number: int) -> str:
+    """Codigo de barras EAN-13 (prefijo 780 de Chile) con digito verificador"""
+    digits = f"780{number:09d}"
+    checksum = sum(int(digit) * (3 if index % 2 else 1) for index, digit in enumerate(digits))
+    return digits + str((10 - checksum % 10) % 10)
+
+
+class SyntheticDataset:
+    """
+    Generador reproducible (misma semilla, mismos datos) de catalogo y transacciones realistas.
+
+    - Popularidad de productos tipo Zipf: pocos SKUs concentran la mayoria de las lineas.
+    - Lineas por ticket con distribucion log-normal (mayoria de 1 a 10) y una cola de tickets
+      muy grandes (compras mayoristas) que ejercitan el pool de procesos de conversion.
+    - Mezcla de formas de pago con pagos divididos, horas con curva diaria y tiendas de distinto tamano.
+    """
+
+    def __init__(self, seed: int = 42, stores: int = 50, products: int = 200000, categories: int = 200,
+                 users: int = 100, product_id_offset: int = 0, category_id_offset: int = 0):
+        self.seed = seed
+        self.stores = stores
+        self.product_count = products
+        self.category_count = categories
+        self.user_count = users
+        self.product_id_offset = product_id_offset
+        self.category_id_offset = category_id_offset
+        self._prices: Optional[List[int]] = None
+        self._popularity: Optional[List[float]] = None
+
+    def users(self, password_hash: str) -> Iterator[tuple]:
+        """(username, email, first_name, last_name, role, hashed_password, is_active, is_admin)"""
+        for index in range(1, self.user_count + 1):
+            yield (f"cajero{index:05d}", f"cajero{index:05d}@example.com", "Cajero", f"{index:05d}",
+                   "user", password_hash, True, False)
+
+    def categories(self) -> Iterator[tuple]:
+        """(id, name, description, is_active)"""
+        for index in range(self.category_count):
+            name = f"{_CATEGORY_NAMES[index % len(_CATEGORY_NAMES)]} {index // len(_CATEGORY_NAMES) + 1}"
+            yield (self.category_id_offset + index + 1, name, None, True)
+
+    def products(self) -> Iterator[tuple]:
+        """(id, title, category_id, price, stock, brand, sku, barcode, is_active)"""
+        rng = random.Random(self.seed)
+        for index, price in enumerate(self.prices()):
+            number = self.product_id_offset + index + 1
+            brand = rng.choice(_BRANDS)
+            title = f"{rng.choice(_NOUNS)} {brand} {rng.choice(_SIZES)}"
+            category_id = self.category_id_offset + rng.randrange(self.category_count) + 1
+            yield (number, title, category_id, price, rng.randrange(0, 500), brand,
+                   f"SKU{number:08d}", ean13(number), True)
+
+    def prices(self) -> List[int]:
+        """Precio de cada producto (CLP, redondeado a 10), log-normal alrededor de $2.000"""
+        if self._prices is None:
+            rng = random.Random(self.seed + 1)
+            self._prices = [max(int(rng.lognormvariate(7.6, 0.9)) // 10 * 10, 10) for _ in range(self.product_count)]
+        return self._prices
+
+    def _cumulative_popularity(self) -> List[float]:
+        if self._popularity is None:
+            self._popularity = list(accumulate(1 / (rank ** 1.1) for rank in range(1, self.product_count + 1)))
+        return self._popularity
+
+    def transactions(self, count: int, start: datetime, days: int = 30, user_ids: Optional[List[int]] = None) -> Iterator[dict]:
+        """Cuerpos de solicitud para POST /convert-transaction (TransactionTSLRequest)"""
+        rng = random.Random(self.seed + 2)
+        prices = self.prices()
+        popularity = self._cumulative_popularity()
+        products = range(self.product_count)
+        user_ids = user_ids or list(range(1, self.user_count + 1))
+        hours = list(range(24))
+        # Tiendas de distinto tamano: el peso de cada tienda sigue una ley de potencia
+        store_weights = list(accumulate(1 / (rank ** 0.8) for rank in range(1, self.stores + 1)))
+        store_ids = [str(100 + index) for index in range(self.stores)]
+        type_names = [name for name, _ in _TRANSACTION_TYPES]
+        type_weights = [weight for _, weight in _TRANSACTION_TYPES]
+        payment_weights = [weight for _, _, weight in _PAYMENT_MIX]
+
+        for sequence in range(1, count + 1):
+            store_id = rng.choices(store_ids, cum_weights=store_weights)[0]
+            pos_id = f"{rng.randrange(1, 13):02d}"
+            transaction_type = rng.choices(type_names, weights=type_weights)[0]
+            moment = start + timedelta(
+                days=rng.randrange(days),
+                hours=rng.choices(hours, weights=_HOUR_WEIGHTS)[0],
+                seconds=rng.randrange(3600),
+            )
+
+            items = []
+            metadata = None
+            if transaction_type in ("PVT", "REC"):
+                if transaction_type == "REC":
+                    line_count = 1
+                    metadata = {
+                        "operator": rng.choice(_OPERATORS),
+                        "phone": f"9{rng.randrange(10 ** 8):08d}",
+                        "authorization_code": f"{rng.randrange(10 ** 6):06d}",
+                        "mc_code": f"{rng.randrange(10 ** 4):04d}",
+                    }
+                elif rng.random() < 0.001:
+                    line_count = rng.randrange(500, 1500)
+                else:
+                    line_count = min(max(int(rng.lognormvariate(1.3, 0.8)), 1), 120)
+                for index in rng.choices(products, cum_weights=popularity, k=line_count):
+                    quantity = 1 if rng.random() < 0.8 else rng.randrange(2, 7)
+                    unit_price = prices[index]
+                    gross = quantity * unit_price
+                    discount = gross * rng.choice((5, 10, 15, 20, 30)) // 100 if rng.random() < 0.1 else 0
+                    items.append({
+                        "barcode": ean13(self.product_id_offset + index + 1),
+                        "sku": f"SKU{self.product_id_offset + index + 1:08d}",
+                        "quantity": quantity,
+                        "unit_price": unit_price,
+                        "discount": discount,
+                        "total": gross - discount,
+                    })
+                total = sum(item["total"] for item in items)
+            else:
+                # Dotacion / retiro de efectivo: solo cabecera y forma de pago
+                total = rng.randrange(10, 500) * 1000
+
+            payments = []
+            if total and rng.random() < 0.05:
+                first = total * rng.randrange(20, 80) // 100
+                amounts = [first, total - first]
+            else:
+                amounts = [total]
+            for amount in amounts:
+                method, provider, _ = rng.choices(_PAYMENT_MIX, weights=payment_weights)[0]
+                if transaction_type in ("DOT", "RET"):
+                    method, provider = "CASH", None
+                payments.append({
+                    "id": sequence,
+                    "transaction_id": sequence,
+                    "payment_method": method,
+                    "amount": amount,
+                    "provider": provider,
+                    "created_at": moment.isoformat(),
+                })
+
+            body = {
+                "id": sequence,
+                "user_id": rng.choice(user_ids),
+                "store_id": store_id,
+                "pos_id": pos_id,
+                "transaction_type": transaction_type,
+                "document_type": "BLT",
+                "transaction_number": f"{store_id}{pos_id}{self.seed % 1000:03d}{sequence:09d}",
+                "transaction_date": moment.isoformat(),
+                "total_amount": total,
+                "items": items,
+                "payments": payments,
+            }
+            if metadata is not None:
+                body["metadata"] = metadata
+            yield body
+
+
+def write_ndjson(bodies: Iterator[dict], output) -> int:
+    """Escribir cuerpos de solicitud como NDJSON (uno por linea)"""
+    count = 0
+    for body in bodies:
+        output.write(json.dumps(body, separators=(",", ":")) + "\n")
+        count += 1
+    return count
+
+
+def _next_id(connection, model) -> int:
+    return (connection.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def load_catalog(engine: Engine, dataset: SyntheticDataset, password_hash: str) -> dict:
+    """Cargar usuarios, categorias y productos del dataset en bloque (pensado para una BD de benchmark vacia)"""
+    with engine.begin() as connection:
+        dataset.category_id_offset = _next_id(connection, models.Category) - 1
+        dataset.product_id_offset = _next_id(connection, models.Product) - 1
+        counts = {
+            "users": bulk_insert(
+                connection, models.User.__tablename__,
+                ("username", "email", "first_name", "last_name", "role", "hashed_password", "is_active", "is_admin"),
+                dataset.users(password_hash),
+            ),
+            "categories": bulk_insert(
+                connection, models.Category.__tablename__, ("id", "name", "description", "is_active"),
+                dataset.categories(),
+            ),
+            "products": bulk_insert(
+                connection, models.Product.__tablename__,
+                ("id", "title", "category_id", "price", "stock", "brand", "sku", "barcode", "is_active"),
+                dataset.products(),
+            ),
+        }
+        reset_sequence(connection, models.Category.__tablename__)
+        reset_sequence(connection, models.Product.__tablename__)
+    return counts
+
+
+def load_transactions(engine: Engine, bodies: Iterator[dict], chunk_size: int = 5000) -> dict:
+    """
+    Cargar transacciones con sus items y pagos en bloque (sin pasar por la conversion TSL).
+    created_at toma la fecha de la transaccion, para repartir el historico entre particiones.
+    """
+    from ..partitioning import partitioning_enabled
+
+    guard_numbers = partitioning_enabled(engine)
+    counts = {"transactions": 0, "transaction_items": 0, "transaction_payments": 0}
+    with engine.connect() as connection:
+        transaction_id = _next_id(connection, models.Transaction)
+        item_id = _next_id(connection, models.TransactionItem)
+        payment_id = _next_id(connection, models.TransactionPayment)
+
+    while True:
+        chunk = list(islice(bodies, chunk_size))
+        if not chunk:
+            break
+        transactions, items, payments, numbers = [], [], [], []
+        for body in chunk:
+            created_at = body["transaction_date"]
+            transactions.append((
+                transaction_id, body["user_id"], body["store_id"], body["pos_id"], body["transaction_type"],
+                body["transaction_number"], created_at, body["total_amount"], "completed",
+                body["document_type"], created_at,
+            ))
+            numbers.append((body["transaction_number"], transaction_id))
+            for item in body["items"]:
+                items.append((
+                    item_id, transaction_id, item["sku"], item["quantity"], item["unit_price"],
+                    item["discount"], item["total"], created_at,
+                ))
+                item_id += 1
+            for payment in body["payments"]:
+                payments.append((
+                    payment_id, transaction_id, payment["payment_method"], payment["amount"],
+                    payment["provider"], created_at,
+                ))
+                payment_id += 1
+            transaction_id += 1
+
+        with engine.begin() as connection:
+            counts["transactions"] += bulk_insert(
+                connection, models.Transaction.__tablename__,
+                ("id", "user_id", "store_id", "pos_id", "transaction_type", "transaction_number",
+                 "transaction_date", "total_amount", "status", "document_type", "created_at"),
+                transactions,
+            )
+            counts["transaction_items"] += bulk_insert(
+                connection, models.TransactionItem.__tablename__,
+                ("id", "transaction_id", "sku", "quantity", "unit_price", "discount", "total_price", "created_at"),
+                items,
+            )
+            counts["transaction_payments"] += bulk_insert(
+                connection, models.TransactionPayment.__tablename__,
+                ("id", "transaction_id", "payment_method", "amount", "provider", "created_at"),
+                payments,
+            )
+            if guard_numbers:
+                bulk_insert(connection, models.TransactionNumber.__tablename__,
+                            ("transaction_number", "transaction_id"), numbers)
+        logger.info("Loaded %d transactions", counts["transactions"])
+
+    with engine.begin() as connection:
+        for model in (models.Transaction, models.TransactionItem, models.TransactionPayment):
+            reset_sequence(connection, model.__tablename__)
+    return counts
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Generar datos sinteticos para benchmarks")
+    parser.add_argument("command", choices=["ndjson", "load"],
+                        help="ndjson: escribir cuerpos de solicitud; load: cargar catalogo y transacciones en la BD")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--products", type=int, default=200000)
+    parser.add_argument("--categories", type=int, default=200)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None,
+                        help="Fecha inicial de las transacciones (por defecto, hace --days dias)")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--output", default="-", help="Archivo NDJSON de salida (- = stdout)")
+    parser.add_argument("--skip-catalog", action="store_true", help="load: no cargar usuarios, categorias ni productos")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    start = args.start or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=args.days)
+    dataset = SyntheticDataset(seed=args.seed, stores=args.stores, products=args.products,
+                               categories=args.categories, users=args.users)
+
+    if args.command == "ndjson":
+        bodies = dataset.transactions(args.transactions, start, args.days)
+        if args.output == "-":
+            write_ndjson(bodies, sys.stdout)
+        else:
+            with open(args.output, "w", encoding="utf-8") as output:
+                write_ndjson(bodies, output)
+        return
+
+    from ..auth import get_password_hash
+    from ..database import engine
+    from ..partitioning import create_schema
+
+    create_schema(engine)
+    if not args.skip_catalog:
+        # Un solo hash para todos los usuarios: bcrypt es deliberadamente lento
+        logger.info("Loaded catalog: %s", load_catalog(engine, dataset, get_password_hash("password")))
+    with engine.connect() as connection:
+        user_ids = list(connection.execute(select(models.User.id)).scalars())
+    bodies = dataset.transactions(args.transactions, start, args.days, user_ids=user_ids)
+    logger.info("Loaded transactions: %s", load_transactions(engine, bodies))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import os
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import settings
+from . import money
+
+APLICA_PRODUCTO = "1"
+APLICA_TOTAL = "2"
+
+APLICADO_PRODUCTO = "0"
+
+# Regla por defecto cuando la tabla tax_rules esta vacia: IVA 19% a nivel de ticket
+DEFAULT_RULES = (("00", 190, APLICA_TOTAL),)
+
+
+class TaxLine(NamedTuple):
+    category_id: Optional[int]
+    gross: int  # cantidad * precio unitario, en milesimas
+    total: int  # total de la linea (con impuestos incluidos), en milesimas
+    discount: int  # descuento de la linea, en milesimas
+
+
+class TicketTaxes(NamedTuple):
+    # Registros 03 a nivel de ticket (Aplica = 2), en el orden de las reglas
+    ticket_taxes: List[dict]
+    # Por cada linea: registros 03 del producto (Aplica = 1) y registros 02 de descuento
+    line_taxes: List[List[dict]]
+    line_discounts: List[List[dict]]
+
+
+class TaxEngine:
+    """
+    Motor de impuestos y descuentos para los registros IMPUESTOS (03) y DESCUENTOS (02) del TSL.
+
+    Las reglas se leen de la tabla `tax_rules` y se cachean por categoria como tuplas
+    `(codigo, tasa XXXY, aplica)`. Los precios de las lineas incluyen impuestos, por lo que
+    el neto de cada linea es `total * 1000 / (1000 + suma de tasas)` y cada impuesto es
+    `neto * tasa / 1000`. Los impuestos a nivel de ticket se acumulan y se emiten una vez.
+
+    `compute_batch` recorre todas las lineas de todos los tickets en una sola pasada, de modo
+    que agregar estos registros no multiplica el costo por linea del conversor.
+    """
+
+    def __init__(self, refresh_interval: float = 300):
+        self._refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._last_refresh = None
+        self._global_rules: Tuple[Tuple[str, int, str], ...] = DEFAULT_RULES
+        self._category_rules: Dict[int, Tuple[Tuple[str, int, str], ...]] = {}
+        self._resolved: Dict[Optional[int], Tuple[Tuple[str, int, str], ...]] = {}
+        # Filas cargadas y su version, para enviar una instantanea a los procesos del pool
+        self._rows: Tuple[Tuple[Optional[int], str, int, str], ...] = ()
+        self._version = None
+
+    def refresh_if_stale(self, db: Session) -> None:
+        """Recargar las reglas si paso el intervalo configurado desde la ultima carga"""
+        last_refresh = self._last_refresh
+        if last_refresh is not None and time.monotonic() - last_refresh < self._refresh_interval:
+            return
+        self.refresh(db)
+
+    def refresh(self, db: Session) -> None:
+        """Cargar las reglas activas desde la base de datos"""
+        rows = (
+            db.query(models.TaxRule.category_id, models.TaxRule.tax_code, models.TaxRule.rate, models.TaxRule.applies_to)
+            .filter(models.TaxRule.is_active.is_(True))
+            .order_by(models.TaxRule.id)
+            .all()
+        )
+        self.load_rules(rows)
+
+    def snapshot(self) -> tuple:
+        """Instantanea compacta de las reglas cargadas: (version, filas)"""
+        return self._version, self._rows
+
+    def load_snapshot(self, snapshot: tuple) -> None:
+        """Cargar una instantanea de otro proceso, solo si cambio su version"""
+        version, rows = snapshot
+        if version != self._version:
+            self.load_rules(rows, version=version)
+
+    def load_rules(self, rows: Iterable[Tuple[Optional[int], str, int, str]], version=None) -> None:
+        """Reemplazar la tabla de reglas; sin reglas se usa DEFAULT_RULES"""
+        rows = tuple(tuple(row) for row in rows)
+        global_rules = []
+        category_rules: Dict[int, list] = {}
+        for category_id, tax_code, rate, applies_to in rows:
+            rule = (tax_code, int(rate), APLICA_PRODUCTO if applies_to == "item" else APLICA_TOTAL)
+            if category_id is None:
+                global_rules.append(rule)
+            else:
+                category_rules.setdefault(category_id, []).append(rule)
+
+        with self._lock:
+            if not global_rules and not category_rules:
+                self._global_rules = DEFAULT_RULES
+            else:
+                self._global_rules = tuple(global_rules)
+            self._category_rules = {key: tuple(value) for key, value in category_rules.items()}
+            # Se reemplaza el dict completo para que los lectores nunca vean una cache a medio limpiar
+            self._resolved = {}
+            self._rows = rows
+            self._version = version if version is not None else (os.getpid(), time.monotonic_ns())
+            self._last_refresh = time.monotonic()
+
+    def rules_for(self, category_id: Optional[int]) -> Tuple[Tuple[str, int, str], ...]:
+        """Reglas que aplican a una categoria (globales + propias de la categoria)"""
+        resolved = self._resolved
+        rules = resolved.get(category_id)
+        if rules is None:
+            rules = self._global_rules + self._category_rules.get(category_id, ())
+            resolved[category_id] = rules
+        return rules
+
+    def compute(self, lines: Sequence[TaxLine]) -> TicketTaxes:
+        """Calcular los registros 03/02 de un ticket"""
+        return self.compute_batch([lines])[0]
+
+    def compute_batch(self, tickets: Sequence[Sequence[TaxLine]]) -> List[TicketTaxes]:
+        """Calcular los registros 03/02 de varios tickets en una sola pasada sobre sus lineas"""
+        rules_for = self.rules_for
+        results = []
+
+        for lines in tickets:
+            ticket_totals: Dict[Tuple[str, int], int] = {}
+            line_taxes = []
+            line_discounts = []
+
+            for category_id, gross, total, discount in lines:
+                rules = rules_for(category_id)
+                total_rate = 1000
+                for rule in rules:
+                    total_rate += rule[1]
+
+                item_records = []
+                for tax_code, rate, aplica in rules:
+                    amount = _divide_round(total * rate, total_rate)
+                    if aplica == APLICA_TOTAL:
+                        key = (tax_code, rate)
+                        ticket_totals[key] = ticket_totals.get(key, 0) + amount
+                    else:
+                        item_records.append(_tax_record(APLICA_PRODUCTO, tax_code, rate, amount))
+                line_taxes.append(item_records)
+
+                if discount:
+                    percentage = _divide_round(discount * 1000, gross) if gross else 0
+                    line_discounts.append([{
+                        "applied": APLICADO_PRODUCTO,
+                        "promo_code": "",
+                        "discount_code": "",
+                        "percentage": percentage,
+                        "amount": money.format_implied(discount, 2),
+                        "type": "N",
+                    }])
+                else:
+                    line_discounts.append([])
+
+            ticket_taxes = [
+                _tax_record(APLICA_TOTAL, tax_code, rate, amount)
+                for (tax_code, rate), amount in ticket_totals.items()
+            ]
+            results.append(TicketTaxes(ticket_taxes, line_taxes, line_discounts))
+
+        return results
+
+
+def _divide_round(numerator: int, denominator: int) -> int:
+    """Division entera redondeando mitad hacia arriba (alejandose de cero)"""
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if remainder * 2 >= denominator:
+        quotient += 1
+    return -quotient if numerator < 0 else quotient
+
+
+def _tax_record(aplica: str, tax_code: str, rate: int, amount: int) -> dict:
+    return {
+        "aplica": aplica,
+        "impuesto": tax_code,
+        "porcentaje": rate,
+        "monto": money.format_implied(amount, 2),
+    }
+
+
+tax_engine = TaxEngine(refresh_interval=settings.tax_rules_refresh_seconds)
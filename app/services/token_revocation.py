@@ -0,0 +1,138 @@
+from datetime import timedelta
+from typing import Dict, Optional
+import logging
+import threading
+import time
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import settings
+from .write_batcher import write_batcher
+
+logger = logging.getLogger(__name__)
+
+# Margen al releer desde la marca de agua: cubre filas confirmadas tarde y timestamps con
+# distinta precision (SQLite guarda segundos)
+_WATERMARK_OVERLAP = timedelta(seconds=2)
+
+
+class RevocationList:
+    """
+    Conjunto en memoria de tokens revocados para verificar cada solicitud sin consultar la base.
+
+    Guarda los jti revocados (logout, refresh token ya usado) y, por usuario, el iat hasta el que
+    se revocaron todos sus tokens (usuario desactivado). Ambas verificaciones son lookups O(1) en
+    diccionarios. La tabla `revoked_tokens` es la fuente compartida entre workers: cada worker
+    lee las filas nuevas (por `created_at`, como el indice de productos) a lo sumo cada
+    TOKEN_REVOCATION_REFRESH_SECONDS, y las revocaciones hechas en el propio worker se aplican
+    en memoria de inmediato. Las entradas se descartan cuando el token ya habria expirado.
+    Las filas se escriben desde el hilo escritor (WriteBatcher), como las conversiones.
+    """
+
+    def __init__(self, refresh_interval: float = 5):
+        self._refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._last_refresh = None
+        self._watermark = None
+
+        self._jtis: Dict[str, int] = {}  # jti -> expiracion (epoch)
+        self._users: Dict[str, tuple] = {}  # username -> (revoked_before, expiracion)
+
+    def __len__(self):
+        return len(self._jtis) + len(self._users)
+
+    def is_revoked(self, jti: Optional[str], username: str, issued_at: Optional[int]) -> bool:
+        """Verificar si un token fue revocado (sin acceso a la base de datos)"""
+        if jti is not None and jti in self._jtis:
+            return True
+        revoked = self._users.get(username)
+        # Tokens emitidos antes de agregar jti/iat quedan revocados con su usuario
+        return revoked is not None and (issued_at or 0) <= revoked[0]
+
+    def refresh_if_stale(self, db: Session) -> None:
+        """Refrescar el conjunto si paso el intervalo configurado desde el ultimo refresco"""
+        last_refresh = self._last_refresh
+        if last_refresh is not None and time.monotonic() - last_refresh < self._refresh_interval:
+            return
+        self.refresh(db)
+
+    def refresh(self, db: Session) -> int:
+        """Cargar revocaciones nuevas desde la marca de agua. Retorna filas leidas."""
+        with self._lock:
+            now = int(time.time())
+            query = db.query(
+                models.RevokedToken.jti,
+                models.RevokedToken.username,
+                models.RevokedToken.revoked_before,
+                models.RevokedToken.expires_at,
+                models.RevokedToken.created_at,
+            ).filter(models.RevokedToken.expires_at > now)
+            # Reaplicar una fila ya cargada es idempotente
+            if self._watermark is not None:
+                query = query.filter(models.RevokedToken.created_at >= self._watermark - _WATERMARK_OVERLAP)
+
+            rows = 0
+            for jti, username, revoked_before, expires_at, created_at in query.order_by(models.RevokedToken.created_at):
+                self._apply(jti, username, revoked_before, expires_at)
+                if created_at is not None:
+                    self._watermark = created_at
+                rows += 1
+
+            self._prune(now)
+            self._last_refresh = time.monotonic()
+            return rows
+
+    def revoke_token(self, jti: str, username: str, expires_at: int, reason: str) -> bool:
+        """
+        Revocar un token por su jti hasta su expiracion. Retorna False si el jti ya estaba
+        revocado (fila existente, de este u otro worker): en la rotacion de refresh tokens
+        indica que el token ya se uso.
+        """
+        inserted = self._persist(models.RevokedToken(jti=jti, username=username, expires_at=expires_at, reason=reason))
+        with self._lock:
+            self._apply(jti, username, None, expires_at)
+        return inserted
+
+    def revoke_user(self, username: str, reason: str) -> None:
+        """Revocar todos los tokens emitidos hasta ahora para el usuario"""
+        now = int(time.time())
+        # Pasado el plazo del refresh token ya no queda ningun token emitido antes de la revocacion
+        expires_at = now + settings.refresh_token_expire_days * 86400
+        self._persist(models.RevokedToken(username=username, revoked_before=now, expires_at=expires_at, reason=reason))
+        with self._lock:
+            self._apply(None, username, now, expires_at)
+        logger.info("Revoked all tokens for user %s (%s)", username, reason)
+
+    def _persist(self, row: models.RevokedToken) -> bool:
+        def write(session: Session) -> None:
+            session.query(models.RevokedToken).filter(
+                models.RevokedToken.expires_at <= int(time.time())
+            ).delete(synchronize_session=False)
+            session.add(row)
+            session.flush()
+
+        try:
+            write_batcher.run(write, timeout=settings.write_batch_timeout)
+        except IntegrityError:
+            # El jti ya estaba revocado (p.ej. logout repetido o refresh token reutilizado)
+            return False
+        return True
+
+    def _apply(self, jti, username, revoked_before, expires_at) -> None:
+        if jti is not None:
+            self._jtis[jti] = expires_at
+        elif revoked_before is not None:
+            current = self._users.get(username)
+            if current is None or current[0] < revoked_before:
+                self._users[username] = (revoked_before, expires_at)
+
+    def _prune(self, now: int) -> None:
+        for jti in [jti for jti, expires_at in self._jtis.items() if expires_at <= now]:
+            del self._jtis[jti]
+        for username in [username for username, (_, expires_at) in self._users.items() if expires_at <= now]:
+            del self._users[username]
+
+
+revocation_list = RevocationList(refresh_interval=settings.token_revocation_refresh_seconds)
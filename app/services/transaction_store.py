@@ -0,0 +1,68 @@
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import money
+from .tsl_conversion import TicketInput
+from .write_batcher import WriteUnit
+
+
+def conversion_write_unit(transaction, user_id: int, ticket: TicketInput, tsl_data: str) -> WriteUnit:
+    """
+    Unidad de escritura (ver WriteBatcher) que guarda el ticket convertido: la transaccion,
+    sus items y pagos, y el TSL generado. Retorna el id de la transaccion.
+    """
+    def write(session: Session) -> int:
+        row = models.Transaction(
+            user_id=user_id,
+            store_id=transaction.store_id,
+            pos_id=transaction.pos_id,
+            transaction_type=transaction.transaction_type,
+            transaction_number=transaction.transaction_number,
+            transaction_date=transaction.transaction_date,
+            total_amount=money.to_decimal(transaction.total_amount),
+            customer_external_id=transaction.customer_external_id,
+            status=transaction.status,
+            notes=transaction.notes,
+            document_type=transaction.document_type,
+        )
+        row.items = [
+            models.TransactionItem(
+                product_id=line.product_id,
+                sku=line.sku or line.barcode,
+                quantity=line.quantity,
+                unit_price=money.to_decimal(line.unit_price),
+                discount=money.to_decimal(line.discount),
+                total_price=money.to_decimal(line.total),
+            )
+            for line in ticket.lines
+        ]
+        row.payments = [
+            models.TransactionPayment(
+                payment_method=payment.payment_method,
+                amount=money.to_decimal(payment.amount),
+                provider=payment.provider,
+            )
+            for payment in ticket.payments
+        ]
+        row.tsl_data = [models.TransactionTSLData(tsl_data=tsl_data)]
+        session.add(row)
+        session.flush()
+        return row.id
+
+    return write
+
+
+def is_duplicate_transaction_number(error: IntegrityError) -> bool:
+    """
+    Si el IntegrityError es la unicidad de transaction_number (indice unico de transactions o,
+    con particionado, la tabla transaction_numbers). Otras violaciones, como una FK a un
+    product_id inexistente, son errores del ticket y no duplicados.
+    """
+    orig = error.orig
+    pgcode = getattr(orig, "pgcode", None)
+    if pgcode is not None:
+        constraint = getattr(getattr(orig, "diag", None), "constraint_name", None) or ""
+        return pgcode == "23505" and "transaction_number" in constraint
+    message = str(orig)
+    return "UNIQUE" in message.upper() and "transaction_number" in message
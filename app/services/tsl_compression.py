@@ -0,0 +1,254 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import argparse
+import logging
+import re
+import struct
+import threading
+import time
+import zlib
+
+from sqlalchemy import select, update
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:  # zstd es opcional; sin el paquete se usa zlib
+    zstandard = None
+
+# Formato del payload comprimido: 1 byte de codec + 4 bytes con el id del diccionario (0 = sin diccionario)
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+_HEADER = struct.Struct(">BI")
+
+CODECS = {"none": CODEC_RAW, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+# zlib solo usa los ultimos 32 KB del diccionario
+ZLIB_MAX_DICTIONARY_SIZE = 32 * 1024
+
+# Separadores del TSL (campo, registro, transaccion) y limites entre etiquetas del XML TED
+_SEGMENT_SPLIT = re.compile(rb'\x1c|","|\r\n|(?<=>)(?=<)')
+
+
+def configured_codec() -> int:
+    """Codec de TSL_COMPRESSION_CODEC; zstd sin el paquete `zstandard` cae a zlib"""
+    codec = CODECS.get(settings.tsl_compression_codec)
+    if codec is None:
+        raise RuntimeError(f"Unknown TSL_COMPRESSION_CODEC: {settings.tsl_compression_codec}")
+    if codec == CODEC_ZSTD and zstandard is None:
+        return CODEC_ZLIB
+    return codec
+
+
+class DictionaryRegistry:
+    """
+    Diccionarios de compresion por tienda (tabla tsl_compression_dictionaries).
+
+    Los diccionarios son inmutables: se cachean por id sin expiracion, para descomprimir filas
+    antiguas. El diccionario activo de cada tienda se relee cada `refresh_interval` segundos.
+    """
+
+    def __init__(self, refresh_interval: float = 300):
+        self._refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._by_id: Dict[int, Tuple[int, bytes]] = {}
+        self._active: Dict[Tuple[str, int], int] = {}
+        self._last_refresh = None
+
+    def active_for(self, store_id: Optional[str], codec: int, connection) -> Optional[Tuple[int, bytes]]:
+        """(id, datos) del diccionario activo de la tienda para el codec, o None"""
+        if store_id is None:
+            return None
+        last_refresh = self._last_refresh
+        if last_refresh is None or time.monotonic() - last_refresh >= self._refresh_interval:
+            self.refresh(connection)
+        dictionary_id = self._active.get((store_id, codec))
+        if dictionary_id is None:
+            return None
+        return dictionary_id, self._by_id[dictionary_id][1]
+
+    def get(self, dictionary_id: int, connection=None) -> bytes:
+        """Datos de un diccionario por id (cargandolo si no esta en cache)"""
+        entry = self._by_id.get(dictionary_id)
+        if entry is None:
+            from ..models import TSLCompressionDictionary
+            query = (
+                select(TSLCompressionDictionary.codec, TSLCompressionDictionary.data)
+                .where(TSLCompressionDictionary.id == dictionary_id)
+            )
+            if connection is None:
+                # Objeto sin sesion: se usa una conexion propia
+                from ..database import engine
+                with engine.connect() as own_connection:
+                    row = own_connection.execute(query).first()
+            else:
+                row = connection.execute(query).first()
+            if row is None:
+                raise ValueError(f"Compression dictionary {dictionary_id} not found")
+            entry = self._by_id[dictionary_id] = (CODECS[row.codec], row.data)
+        return entry[1]
+
+    def refresh(self, connection) -> None:
+        """Recargar los diccionarios activos de todas las tiendas"""
+        from ..models import TSLCompressionDictionary
+        rows = connection.execute(
+            select(
+                TSLCompressionDictionary.id,
+                TSLCompressionDictionary.store_id,
+                TSLCompressionDictionary.codec,
+                TSLCompressionDictionary.data,
+            ).where(TSLCompressionDictionary.is_active.is_(True))
+        ).all()
+        active = {}
+        with self._lock:
+            for row in rows:
+                codec = CODECS[row.codec]
+                self._by_id[row.id] = (codec, row.data)
+                active[(row.store_id, codec)] = row.id
+            self._active = active
+            self._last_refresh = time.monotonic()
+
+
+def compress(text: str, store_id: Optional[str] = None, connection=None) -> bytes:
+    """Comprimir un payload TSL con el codec configurado y el diccionario activo de la tienda"""
+    raw = text.encode("utf-8")
+    codec = configured_codec()
+    if codec == CODEC_RAW or len(raw) < settings.tsl_compression_min_size:
+        return _HEADER.pack(CODEC_RAW, 0) + raw
+
+    dictionary = dictionaries.active_for(store_id, codec, connection) if connection is not None else None
+    dictionary_id, data = dictionary if dictionary is not None else (0, None)
+    level = settings.tsl_compression_level
+
+    if codec == CODEC_ZSTD:
+        dict_data = zstandard.ZstdCompressionDict(data) if data else None
+        payload = zstandard.ZstdCompressor(level=level, dict_data=dict_data).compress(raw)
+    else:
+        # Deflate sin cabecera zlib: el header propio ya identifica el formato
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=data) if data else zlib.compressobj(level, zlib.DEFLATED, -15)
+        payload = compressor.compress(raw) + compressor.flush()
+    return _HEADER.pack(codec, dictionary_id) + payload
+
+
+def decompress(blob: bytes, connection=None) -> str:
+    """Descomprimir un payload generado por compress"""
+    codec, dictionary_id = _HEADER.unpack_from(blob)
+    payload = memoryview(blob)[_HEADER.size:]
+    data = dictionaries.get(dictionary_id, connection) if dictionary_id else None
+
+    if codec == CODEC_RAW:
+        raw = bytes(payload)
+    elif codec == CODEC_ZLIB:
+        decompressor = zlib.decompressobj(-15, zdict=data) if data else zlib.decompressobj(-15)
+        raw = decompressor.decompress(payload) + decompressor.flush()
+    elif codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Decompressing zstd TSL payloads requires the 'zstandard' package")
+        dict_data = zstandard.ZstdCompressionDict(data) if data else None
+        raw = zstandard.ZstdDecompressor(dict_data=dict_data).decompress(payload)
+    else:
+        raise ValueError(f"Unknown TSL compression codec: {codec}")
+    return raw.decode("utf-8")
+
+
+def build_zlib_dictionary(samples: Iterable[bytes], size: int = ZLIB_MAX_DICTIONARY_SIZE) -> bytes:
+    """
+    Construir un diccionario zlib con los segmentos (campos, registros, etiquetas del XML) que
+    mas se repiten entre las muestras. Los mas valiosos quedan al final, donde deflate los
+    alcanza con distancias mas cortas.
+    """
+    size = min(size, ZLIB_MAX_DICTIONARY_SIZE)
+    counts = Counter()
+    for sample in samples:
+        # Se cuenta en cuantas muestras aparece cada segmento, no cuantas veces
+        counts.update(set(segment for segment in _SEGMENT_SPLIT.split(sample) if len(segment) >= 4))
+
+    ranked = sorted(
+        (segment for segment, count in counts.items() if count > 1),
+        key=lambda segment: counts[segment] * len(segment),
+        reverse=True,
+    )
+    chosen: List[bytes] = []
+    total = 0
+    for segment in ranked:
+        if total + len(segment) > size:
+            continue
+        chosen.append(segment)
+        total += len(segment)
+    return b"".join(reversed(chosen))
+
+
+def train_store_dictionary(db, store_id: str, sample_count: int = 1000, size: Optional[int] = None):
+    """
+    Entrenar un diccionario para una tienda con sus payloads TSL mas recientes y activarlo.
+    Las filas existentes conservan el diccionario con el que se comprimieron.
+    """
+    from .. import models
+
+    codec = configured_codec()
+    if codec == CODEC_RAW:
+        raise ValueError("TSL compression is disabled (TSL_COMPRESSION_CODEC=none)")
+    size = size or settings.tsl_compression_dictionary_size
+
+    rows = (
+        db.query(models.TransactionTSLData)
+        .join(models.Transaction)
+        .filter(models.Transaction.store_id == store_id)
+        .order_by(models.TransactionTSLData.id.desc())
+        .limit(sample_count)
+        .all()
+    )
+    samples = [row.tsl_data.encode("utf-8") for row in rows if row.tsl_data]
+    if len(samples) < 2:
+        raise ValueError(f"Not enough TSL samples to train a dictionary for store {store_id}")
+
+    if codec == CODEC_ZSTD:
+        data = zstandard.train_dictionary(size, samples).as_bytes()
+    else:
+        data = build_zlib_dictionary(samples, size)
+
+    codec_name = next(name for name, value in CODECS.items() if value == codec)
+    db.execute(
+        update(models.TSLCompressionDictionary)
+        .where(models.TSLCompressionDictionary.store_id == store_id)
+        .where(models.TSLCompressionDictionary.codec == codec_name)
+        .values(is_active=False)
+    )
+    dictionary = models.TSLCompressionDictionary(
+        store_id=store_id, codec=codec_name, data=data, sample_count=len(samples), is_active=True
+    )
+    db.add(dictionary)
+    db.commit()
+    # Forzar la recarga del diccionario activo en este proceso
+    dictionaries.refresh(db.connection())
+    logger.info("Trained %s dictionary %d for store %s (%d bytes, %d samples)",
+                codec_name, dictionary.id, store_id, len(data), len(samples))
+    return dictionary
+
+
+dictionaries = DictionaryRegistry(refresh_interval=settings.tsl_compression_dictionary_refresh_seconds)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Entrenar diccionarios de compresion TSL por tienda")
+    parser.add_argument("store_ids", nargs="+", help="Tiendas para las que se entrena un diccionario")
+    parser.add_argument("--samples", type=int, default=1000, help="Payloads recientes usados como muestra")
+    parser.add_argument("--size", type=int, default=None, help="Tamano del diccionario en bytes")
+    args = parser.parse_args(argv)
+
+    from ..database import SessionLocal
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        for store_id in args.store_ids:
+            train_store_dictionary(db, store_id, sample_count=args.samples, size=args.size)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+from typing import NamedTuple, Optional, Tuple
+
+from . import money
+from .product_index import product_index
+from .tax_engine import tax_engine, TaxLine
+from .tsl_converter import TSLConverter, TSLConverterSubstringType
+from .tsl_mappings import tsl_mappings
+
+
+class InvalidTicket(ValueError):
+    """Ticket que no cumple lo que exige su mapeo TSL (p.ej. sin items o sin pagos)"""
+
+
+class TicketLine(NamedTuple):
+    barcode: Optional[str]
+    sku: Optional[str]
+    product_id: Optional[int]
+    category_id: Optional[int]
+    quantity: int
+    unit_price: int  # montos en milesimas (ver services.money)
+    discount: int
+    total: int
+    origin_position: Optional[int] = None  # devoluciones: posicion de la linea en la venta original
+
+
+class TicketPayment(NamedTuple):
+    payment_method: str
+    amount: int
+    provider: Optional[str]
+
+
+class TicketInput(NamedTuple):
+    """
+    Entrada compacta de una conversion: solo tipos primitivos, para que sea barata de
+    serializar con pickle cuando la conversion se envia al pool de procesos.
+    """
+    transaction_type: str
+    header: dict  # campos de la transaccion (sin items ni pagos) ya listos para la cabecera
+    lines: Tuple[TicketLine, ...]
+    payments: Tuple[TicketPayment, ...]
+
+
+def prepare_ticket(transaction, seller_id: int, original=None) -> TicketInput:
+    """
+    Validar el ticket contra su mapeo y enriquecer las lineas con el indice de productos.
+    Se ejecuta en el proceso de la API; el trabajo por linea pesado queda para convert_ticket.
+    En una devolucion, `original` es la venta original (ver services.return_lookup).
+    """
+    plan = tsl_mappings.for_transaction_type(transaction.transaction_type)
+    if plan.record(TSLConverterSubstringType.PRODUCTOS) is not None and not transaction.items:
+        raise InvalidTicket("Transaction must have at least one item")
+    if plan.record(TSLConverterSubstringType.FORMA_PAGO) is not None and not transaction.payments:
+        raise InvalidTicket("Transaction must have at least one payment")
+    if plan.record(TSLConverterSubstringType.DATOS_COMPLEMENTARIOS_DEVOLUCIONES) is not None and original is None:
+        raise InvalidTicket("Return transaction must reference its original transaction")
+
+    # transaction ya es un objeto Pydantic TransactionTSLRequest, usar directamente
+    header = transaction.model_dump(mode='json', exclude={"items", "payments", "original_transaction"})
+    header["contable_date"] = transaction.transaction_date.strftime("%Y%m%d")
+    header["transaction_date"] = transaction.transaction_date.strftime("%Y%m%d")
+    header["transaction_hour"] = transaction.transaction_date.now().strftime("%H%M%S")
+    header["seller_id"] = seller_id
+    header["total_amount"] = money.format_amount(transaction.total_amount)
+
+    lines = []
+    for item in transaction.items:
+        # Si el item tiene 'sku' pero el mapeo busca 'barcode', usar 'sku' como 'barcode'
+        barcode = item.barcode or item.sku
+        # La categoria se obtiene del indice de productos; el producto anidado del cliente es un respaldo
+        product_entry = product_index.lookup(barcode) or product_index.lookup(item.sku)
+        if product_entry is not None:
+            product_id, category_id = product_entry.id, product_entry.category_id
+        elif item.product is not None:
+            product_id, category_id = item.product.id, item.product.category_id
+        else:
+            product_id, category_id = item.product_id, None
+        lines.append(TicketLine(
+            barcode, item.sku, item.product_id or product_id, category_id,
+            item.quantity, item.unit_price, item.discount, item.total,
+        ))
+
+    if original is not None:
+        header.update(original.header_fields())
+        lines = [
+            line._replace(origin_position=position)
+            for line, position in zip(lines, original.line_positions(lines))
+        ]
+
+    payments = tuple(
+        TicketPayment(payment.payment_method, payment.amount, payment.provider)
+        for payment in transaction.payments
+    )
+    return TicketInput(transaction.transaction_type, header, tuple(lines), payments)
+
+
+def convert_ticket(ticket: TicketInput, tax_rules: Optional[tuple] = None) -> bytes:
+    """
+    Convertir un ticket preparado a su transaccion TSL serializada.
+
+    No usa la base de datos: las reglas de impuestos vienen del motor del proceso o, en los
+    procesos del pool, de la instantanea `tax_rules` (ver TaxEngine.snapshot).
+    """
+    if tax_rules is not None:
+        tax_engine.load_snapshot(tax_rules)
+
+    # Plan de mapeo compilado desde tsl_specs/*.yaml segun el tipo de transaccion
+    plan = tsl_mappings.for_transaction_type(ticket.transaction_type)
+    cabecera = plan.record(TSLConverterSubstringType.CABECERA)
+    productos = plan.record(TSLConverterSubstringType.PRODUCTOS)
+    impuestos = plan.record(TSLConverterSubstringType.IMPUESTOS)
+    descuentos = plan.record(TSLConverterSubstringType.DESCUENTOS)
+    forma_pago = plan.record(TSLConverterSubstringType.FORMA_PAGO)
+    devoluciones = plan.record(TSLConverterSubstringType.DATOS_COMPLEMENTARIOS_DEVOLUCIONES)
+
+    converter = TSLConverter()
+
+    # Se preparan las lineas antes de asignar registros: los impuestos del ticket van despues de la cabecera
+    items_data = []
+    tax_lines = []
+    for line in (ticket.lines if productos is not None else ()):
+        # Los montos llegan como enteros en milesimas: la aritmetica es entera y se formatean una sola vez
+        gross = line.quantity * line.unit_price
+        items_data.append({
+            "barcode": line.barcode,
+            "sku": line.sku,
+            "product_id": line.product_id,
+            "category_id": line.category_id,
+            "quantity": line.quantity,
+            "unit_price": money.format_amount(line.unit_price),
+            "discount": money.format_amount(line.discount),
+            "total": money.format_amount(line.total),
+            "total_price": money.format_amount(gross),
+            "origin_position": line.origin_position,
+        })
+        tax_lines.append(TaxLine(line.category_id, gross, line.total, line.discount))
+
+    taxes = tax_engine.compute(tax_lines)
+
+    # Se asignan los valores de la cabecera
+    converter.assign_record(ticket.header, cabecera)
+
+    # Impuestos a la transaccion completa (IVA)
+    if impuestos is not None:
+        for tax_data in taxes.ticket_taxes:
+            converter.assign_record(tax_data, impuestos)
+
+    # Registros complementarios (99/xx) definidos en el spec, p.ej. la recarga en la Recaudación;
+    # el de devoluciones (99/07) va por linea, despues de cada producto
+    for record_type, record_plan in plan.records.items():
+        if record_type.name.startswith("DATOS_COMPLEMENTARIOS") and record_plan is not devoluciones:
+            converter.assign_record(ticket.header, record_plan)
+    origin = {key: value for key, value in ticket.header.items() if key.startswith("origin_")}
+
+    # Se asignan los valores de los productos, con sus impuestos y descuentos
+    for item_data, item_taxes, item_discounts in zip(items_data, taxes.line_taxes, taxes.line_discounts):
+        converter.assign_record(item_data, productos)
+        if devoluciones is not None:
+            converter.assign_record({**origin, **item_data}, devoluciones)
+        if impuestos is not None:
+            for tax_data in item_taxes:
+                converter.assign_record(tax_data, impuestos)
+        if descuentos is not None:
+            for discount_data in item_discounts:
+                converter.assign_record(discount_data, descuentos)
+
+    # Se asignan los valores de los pagos
+    if forma_pago is not None:
+        for payment in ticket.payments:
+            payment_data = {
+                "payment_method": '01',
+                "amount": money.format_amount(payment.amount),
+                "provider": payment.provider,
+            }
+            converter.assign_record(payment_data, forma_pago)
+
+    # TODO: Definir el substring de descuento si aplica a la forma de pago
+
+    converter.serialize_transaction()
+    return bytes(converter.value_converter_bytes)
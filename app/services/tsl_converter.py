@@ -1,7 +1,11 @@
 from datetime import datetime
 from enum import Enum
+from typing import Iterable
 import os
 
+from ..config import settings
+from .tsl_writer import TSLFileWriter
+
 
 class TSLConverterSubstringType(Enum):
     CABECERA = "cabecera"
@@ -57,19 +61,31 @@ class TSLConverter:
     # 1. Definición de Separadores
     FS = '\x1c'  # Separador de Campo (0x1Ch)
     CRLF = '\r\n'  # Fin de Transacción (0x0D0Ah)
-
     
-    _value_converter = None
+    # Codificacion del archivo TSL y separadores ya codificados
+    ENCODING = settings.tsl_encoding
+    _FS_BYTES = FS.encode(ENCODING)
+    _CRLF_BYTES = CRLF.encode(ENCODING)
+    _QUOTE_BYTES = '"'.encode(ENCODING)
+    _RECORD_SEPARATOR_BYTES = '","'.encode(ENCODING)
+
     
     _data_transaction_info = None
     
     def __init__(self):
         self._data_transaction_info = []
-        self._value_converter = ""
+        # Buffer reutilizable: se sobrescribe en cada serializacion y solo crece
+        self._buffer = bytearray()
+        self._length = 0
+    
+    @property
+    def value_converter(self) -> str:
+        return self._buffer[:self._length].decode(self.ENCODING)
     
     @property
-    def value_converter(self):
-        return self._value_converter
+    def value_converter_bytes(self) -> memoryview:
+        """Vista sin copia de la transaccion serializada; liberarla antes de volver a serializar"""
+        return memoryview(self._buffer)[:self._length]
     
     # 2. Datos de la Transacción de Venta (VNT) en Python
     # Solo contiene los atributos de la transaccion que se van a asignar a los substrings correspondientes.
@@ -251,11 +267,33 @@ class TSLConverter:
     
 
     def serialize_transaction(self):
-        values = [
-            f'"{self.FS.join(f"{val}" for val in value.values())}"'
-            for value in self._data_transaction_info
-        ]
-        self._value_converter = f"{",".join(values)}{self.CRLF}"
+        """Serializar los registros asignados directamente como bytes en el buffer de la instancia"""
+        buffer = self._buffer
+        encoding = self.ENCODING
+        fs = self._FS_BYTES
+        position = 0
+        
+        for index, record in enumerate(self._data_transaction_info):
+            separator = self._RECORD_SEPARATOR_BYTES if index else self._QUOTE_BYTES
+            buffer[position:position + len(separator)] = separator
+            position += len(separator)
+            
+            for field_index, value in enumerate(record.values()):
+                if field_index:
+                    buffer[position:position + len(fs)] = fs
+                    position += len(fs)
+                if isinstance(value, str):
+                    data = value.encode(encoding)
+                elif isinstance(value, int):
+                    data = b"%d" % value
+                else:
+                    data = f"{value}".encode(encoding)
+                buffer[position:position + len(data)] = data
+                position += len(data)
+        
+        closing = (self._QUOTE_BYTES if self._data_transaction_info else b"") + self._CRLF_BYTES
+        buffer[position:position + len(closing)] = closing
+        self._length = position + len(closing)
     
 
     def assign_value_from_transaction(self, transaction: dict, assign_keys: dict, type_substring: TSLConverterSubstringType) -> dict:
@@ -273,12 +311,47 @@ class TSLConverter:
         self._data_transaction_info.append(_data_transaction_temporal)
         
     
-    def save(self):
-        path = os.path.join(os.getcwd(), "tsl_files", f"tsl_output_{datetime.now().strftime('%Y%m%d%H%M%S')}.txt")
+    def assign_record(self, transaction: dict, record_plan) -> None:
+        """Asignar un registro usando un RecordPlan compilado (ver services.tsl_mappings)"""
+        _data_transaction_temporal = dict(record_plan.template)
         
-        if not os.path.exists(os.path.dirname(path)):
-            os.makedirs(os.path.dirname(path))
+        for to_key, path in record_plan.assignments:
+            value = transaction
+            for key in path:
+                if not isinstance(value, dict) or key not in value:
+                    raise ValueError(f"Key {'.'.join(path)} not found in transaction")
+                value = value[key]
+            _data_transaction_temporal[to_key] = value
         
-        with open(path, "w") as file:
-            file.write(self._value_converter)
+        self._data_transaction_info.append(_data_transaction_temporal)
+        
+    
+    def save(self):
+        self.save_batch([self])
+    
+    # Nombre de los archivos TSL: tsl_output_YYYYmmddHHMMSS.txt
+    OUTPUT_PREFIX = "tsl_output_"
+    OUTPUT_TIMESTAMP_FORMAT = "%Y%m%d%H%M%S"
+    
+    @staticmethod
+    def output_dir() -> str:
+        """Directorio de los archivos TSL de salida"""
+        return os.path.join(os.getcwd(), "tsl_files")
+    
+    @classmethod
+    def output_path(cls) -> str:
+        """Ruta del archivo TSL de salida para el momento actual"""
+        return os.path.join(cls.output_dir(), f"{cls.OUTPUT_PREFIX}{datetime.now().strftime(cls.OUTPUT_TIMESTAMP_FORMAT)}.txt")
+    
+    @classmethod
+    def save_batch(cls, converters: Iterable["TSLConverter"]) -> str:
+        """Escribir varias transacciones serializadas al archivo TSL con una sola escritura vectorizada"""
+        path = cls.output_path()
         
+        views = [converter.value_converter_bytes for converter in converters]
+        try:
+            TSLFileWriter(path).write(views)
+        finally:
+            for view in views:
+                view.release()
+        return path
@@ -0,0 +1,154 @@
+from typing import Dict, NamedTuple, Optional, Tuple
+import logging
+import os
+import threading
+import time
+
+import yaml
+
+from ..config import settings
+from .tsl_converter import TSLConverter, TSLConverterSubstringType
+
+logger = logging.getLogger(__name__)
+
+SPECS_DIR = os.path.join(os.path.dirname(__file__), "tsl_specs")
+
+
+class RecordPlan(NamedTuple):
+    record_type: TSLConverterSubstringType
+    # Valores por defecto del registro en el orden del TSL (class-level + overrides del YAML)
+    template: Dict[str, object]
+    # (campo TSL, ruta en los datos de la transaccion); las rutas con punto se separan al compilar
+    assignments: Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+
+class MappingPlan(NamedTuple):
+    kind: str
+    transaction_types: Tuple[str, ...]
+    records: Dict[TSLConverterSubstringType, RecordPlan]
+
+    def record(self, record_type: TSLConverterSubstringType) -> Optional[RecordPlan]:
+        return self.records.get(record_type)
+
+
+def compile_spec(spec: dict, source: str = "<spec>") -> MappingPlan:
+    """Compilar un spec YAML ya parseado a un MappingPlan, validando los campos una sola vez"""
+    kind = spec.get("kind")
+    if not kind:
+        raise ValueError(f"{source}: missing 'kind'")
+
+    records = {}
+    for record_name, record_spec in (spec.get("records") or {}).items():
+        try:
+            record_type = TSLConverterSubstringType(record_name)
+        except ValueError:
+            raise ValueError(f"{source}: unknown record type {record_name}")
+
+        record_spec = record_spec or {}
+        base = TSLConverter.data_transaction[record_type]
+        template = dict(base)
+        for to_key, value in (record_spec.get("defaults") or {}).items():
+            if to_key not in base:
+                raise ValueError(f"{source}: key {to_key} not found in {record_type}")
+            template[to_key] = value
+
+        assignments = []
+        for to_key, from_key in (record_spec.get("fields") or {}).items():
+            if to_key not in base:
+                raise ValueError(f"{source}: key {to_key} not found in {record_type}")
+            assignments.append((to_key, tuple(str(from_key).split("."))))
+
+        records[record_type] = RecordPlan(record_type, template, tuple(assignments))
+
+    transaction_types = tuple(str(value) for value in spec.get("transaction_types") or ())
+    return MappingPlan(kind, transaction_types, records)
+
+
+class TSLMappingRegistry:
+    """
+    Registro de mapeos TSL por tipo de transaccion (Venta, Dotación, Retiro, Recaudación).
+
+    Los mapeos se definen en archivos YAML (`tsl_specs/*.yaml`), se compilan una vez a
+    `MappingPlan` y se cachean. Cada `check_interval` segundos se comparan las fechas de
+    modificacion de los archivos; si cambiaron, se recompila todo y se reemplaza el diccionario
+    de planes de una sola vez, sin reiniciar. Si la recarga falla se mantienen los planes anteriores.
+    """
+
+    def __init__(self, specs_dir: str = SPECS_DIR, check_interval: float = 5, default_kind: str = "venta"):
+        self.specs_dir = specs_dir
+        self.check_interval = check_interval
+        self.default_kind = default_kind
+        self._lock = threading.Lock()
+        self._signature = None
+        self._last_check = None
+        # (planes por kind, planes por transaction_type): se reemplaza como una sola referencia
+        self._state: Tuple[Dict[str, MappingPlan], Dict[str, MappingPlan]] = ({}, {})
+
+    def get(self, kind: str) -> MappingPlan:
+        """Obtener el plan compilado de un tipo de transaccion (venta, dotacion, ...)"""
+        self._reload_if_changed()
+        try:
+            return self._state[0][kind]
+        except KeyError:
+            raise ValueError(f"No TSL mapping defined for {kind}")
+
+    def for_transaction_type(self, transaction_type: str) -> MappingPlan:
+        """Obtener el plan segun el transaction_type del POS; si no hay uno, se usa el de por defecto"""
+        self._reload_if_changed()
+        plan = self._state[1].get(transaction_type)
+        if plan is None:
+            return self.get(self.default_kind)
+        return plan
+
+    def _reload_if_changed(self) -> None:
+        last_check = self._last_check
+        if last_check is not None and time.monotonic() - last_check < self.check_interval:
+            return
+
+        with self._lock:
+            signature = self._read_signature()
+            if signature == self._signature:
+                self._last_check = time.monotonic()
+                return
+            try:
+                plans = self._load()
+            except (OSError, ValueError, yaml.YAMLError) as e:
+                if not self._state[0]:
+                    raise
+                logger.error("Error reloading TSL mapping specs, keeping previous ones: %s", e)
+                self._last_check = time.monotonic()
+                return
+
+            by_transaction_type = {}
+            for plan in plans.values():
+                for transaction_type in plan.transaction_types:
+                    by_transaction_type[transaction_type] = plan
+
+            self._state = (plans, by_transaction_type)
+            self._signature = signature
+            self._last_check = time.monotonic()
+
+    def _read_signature(self) -> Tuple[Tuple[str, int], ...]:
+        return tuple(
+            (entry.name, entry.stat().st_mtime_ns)
+            for entry in sorted(os.scandir(self.specs_dir), key=lambda entry: entry.name)
+            if entry.name.endswith((".yaml", ".yml"))
+        )
+
+    def _load(self) -> Dict[str, MappingPlan]:
+        plans = {}
+        for name in sorted(os.listdir(self.specs_dir)):
+            if not name.endswith((".yaml", ".yml")):
+                continue
+            path = os.path.join(self.specs_dir, name)
+            with open(path, encoding="utf-8") as file:
+                spec = yaml.safe_load(file) or {}
+            plan = compile_spec(spec, source=name)
+            plans[plan.kind] = plan
+        return plans
+
+
+tsl_mappings = TSLMappingRegistry(
+    specs_dir=settings.tsl_specs_dir or SPECS_DIR,
+    check_interval=settings.tsl_specs_check_seconds,
+)
@@ -0,0 +1,64 @@
+from typing import List, Sequence, Union
+import os
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+# Limite de buffers por llamada a writev (IOV_MAX es 1024 en Linux)
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+if _IOV_MAX <= 0:
+    _IOV_MAX = 1024
+
+
+class TSLFileWriter:
+    """
+    Escritor de archivos TSL a nivel de bytes.
+
+    Recibe los buffers ya serializados (ver `TSLConverter.value_converter_bytes`) y los
+    agrega al archivo con `os.writev`, de modo que un lote de transacciones llega al disco
+    en una sola llamada al sistema y sin copias intermedias. El archivo se abre en modo
+    binario con O_APPEND, por lo que los bytes CRLF/FS se escriben exactamente como se generan.
+    """
+
+    _FLAGS = os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0)
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, buffers: Sequence[Buffer]) -> int:
+        """Agregar los buffers al archivo. Retorna la cantidad de bytes escritos."""
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        fd = os.open(self.path, self._FLAGS, 0o644)
+        try:
+            return _write_all(fd, [memoryview(buffer).cast("B") for buffer in buffers if len(buffer)])
+        finally:
+            os.close(fd)
+
+
+def _write_all(fd: int, views: List[memoryview]) -> int:
+    """Escribir todos los buffers manejando escrituras parciales"""
+    total = 0
+    writev = getattr(os, "writev", None)
+
+    while views:
+        if writev is None:
+            written = os.write(fd, views[0])
+        else:
+            written = writev(fd, views[:_IOV_MAX])
+        total += written
+
+        # Avanzar sobre los buffers ya escritos; el ultimo puede haber quedado a medias
+        index = 0
+        while index < len(views) and written >= len(views[index]):
+            written -= len(views[index])
+            index += 1
+        views = views[index:]
+        if views and written:
+            views[0] = views[0][written:]
+
+    return total
@@ -0,0 +1,86 @@
+from typing import Optional, Type, TypeVar
+import logging
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:  # MessagePack es opcional; sin el paquete solo se acepta JSON
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Nombres en uso para MessagePack antes del registro de application/msgpack
+_MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"}
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+class UnsupportedMediaType(ValueError):
+    """Content-Type del cuerpo que el servidor no puede decodificar"""
+
+
+class MalformedBody(ValueError):
+    """Cuerpo MessagePack que no se puede decodificar"""
+
+
+def media_type(header: Optional[str]) -> str:
+    """Tipo de un header Content-Type/Accept, sin parametros"""
+    return (header or "").split(";", 1)[0].strip().lower()
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def is_msgpack(content_type: Optional[str]) -> bool:
+    return media_type(content_type) in _MSGPACK_MEDIA_TYPES
+
+
+def decode(body: bytes, content_type: Optional[str], model: Type[ModelT]) -> ModelT:
+    """
+    Decodificar el cuerpo directamente al modelo: JSON con model_validate_json (sin pasar por
+    dicts de json.loads) y MessagePack con unpackb + model_validate. Los errores de validacion
+    se propagan como pydantic.ValidationError.
+    """
+    kind = media_type(content_type)
+    if kind in _MSGPACK_MEDIA_TYPES:
+        if msgpack is None:
+            raise UnsupportedMediaType("MessagePack bodies require the 'msgpack' package on the server")
+        try:
+            # timestamp=3: las fechas con extension timestamp llegan como datetime con zona horaria
+            data = msgpack.unpackb(body, raw=False, timestamp=3, strict_map_key=True)
+        except (ValueError, msgpack.UnpackException) as e:
+            raise MalformedBody(f"Invalid MessagePack body: {str(e) or type(e).__name__}")
+        return model.model_validate(data)
+    if kind and kind != JSON_MEDIA_TYPE and not kind.endswith("+json"):
+        raise UnsupportedMediaType(f"Unsupported Content-Type: {kind}")
+    return model.model_validate_json(body)
+
+
+def accepts_msgpack(accept: Optional[str], content_type: Optional[str] = None) -> bool:
+    """
+    Responder en MessagePack si el cliente lo pide en Accept, o si envio MessagePack y no
+    pidio un tipo concreto (Accept ausente o */*)
+    """
+    if msgpack is None:
+        return False
+    accepted = [media_type(part) for part in (accept or "").split(",") if part.strip()]
+    if any(kind in _MSGPACK_MEDIA_TYPES for kind in accepted):
+        return True
+    return is_msgpack(content_type) and all(kind in ("*/*", "application/*") for kind in accepted)
+
+
+def encode(content, compact: bool, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """Respuesta en MessagePack (compact) o JSON"""
+    if compact:
+        return Response(
+            content=msgpack.packb(content, use_bin_type=True),
+            status_code=status_code,
+            headers=headers,
+            media_type=MSGPACK_MEDIA_TYPE,
+        )
+    return JSONResponse(content=content, status_code=status_code, headers=headers)
@@ -0,0 +1,142 @@
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+WriteUnit = Callable[[Session], Any]
+
+
+class WriteBatcher:
+    """
+    Group commit de escrituras de solicitudes concurrentes.
+
+    Cada solicitud entrega una "unidad de escritura" (una funcion que agrega filas a la sesion)
+    y espera su Future. Un hilo escritor junta las unidades que llegan durante `max_delay_ms`
+    (o hasta `max_batch` unidades), las ejecuta en una sola sesion y hace un unico commit, de modo
+    que N tickets cuestan un fsync en lugar de N. Cada Future se resuelve solo despues del commit.
+
+    Si una unidad falla, el lote completo se deshace y sus unidades se reintentan una por una,
+    para que el error le llegue solo a la solicitud que lo causo.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], max_batch: int = 100, max_delay_ms: float = 5):
+        self._session_factory = session_factory
+        self.max_batch = max(max_batch, 1)
+        self.max_delay = max_delay_ms / 1000
+        self._queue: "queue.Queue[Optional[Tuple[WriteUnit, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.units = 0
+
+    def submit(self, unit: WriteUnit) -> Future:
+        """Encolar una unidad de escritura; el Future entrega su resultado una vez confirmado el commit"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((unit, future))
+        return future
+
+    def run(self, unit: WriteUnit, timeout: Optional[float] = None) -> Any:
+        """Encolar una unidad y esperar a que su lote sea durable"""
+        return self.submit(unit).result(timeout=timeout)
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """Procesar lo pendiente y detener el hilo escritor"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="write-batcher", daemon=True)
+                self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._commit_batch(batch)
+            # Soltar el lote antes de bloquear en la cola: si no, el hilo retiene el ultimo ticket
+            # (request, lineas y TSL) mientras esta ocioso
+            first = item = batch = None
+            if stop:
+                return
+
+    def _commit_batch(self, batch: List[Tuple[WriteUnit, Future]]) -> None:
+        batch = [(unit, future) for unit, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        session = self._session_factory()
+        try:
+            results = [unit(session) for unit, _ in batch]
+            session.commit()
+        except Exception as e:
+            # close() deshace la transaccion si sigue abierta (rollback() falla si el error fue post-commit)
+            session.close()
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # Aislar la unidad que fallo: reintentar cada una en su propia transaccion
+            logger.warning("Group commit of %d units failed, retrying them one by one: %s", len(batch), e)
+            for unit, future in batch:
+                self._commit_single(unit, future)
+            return
+        session.close()
+
+        self.batches += 1
+        self.units += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _commit_single(self, unit: WriteUnit, future: Future) -> None:
+        session = self._session_factory()
+        try:
+            result = unit(session)
+            session.commit()
+        except Exception as e:
+            session.close()
+            future.set_exception(e)
+        else:
+            self.batches += 1
+            self.units += 1
+            future.set_result(result)
+        finally:
+            session.close()
+
+
+write_batcher = WriteBatcher(
+    SessionLocal,
+    max_batch=settings.write_batch_max_size,
+    max_delay_ms=settings.write_batch_max_delay_ms,
+)
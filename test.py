@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
 import uuid
 from app.services import tsl_converter
+from app.services.tsl_mappings import tsl_mappings
 
 if __name__ == "__main__":
     
@@ -58,44 +59,8 @@ if __name__ == "__main__":
     transaction_dummy["seller_id"] = user_id
     transaction_dummy["document_type"] = "BLT"
     
-    data_keys_parse_cabecera = {
-        "Local": "store_id",
-        "POS": "pos_id",
-        "NumTrx": "transaction_number",
-        "Fecha": "transaction_date",
-        "FechaCont": "contable_date",
-        "Hora": "transaction_hour",
-        "Vendedor": "seller_id",
-        "TipoTrx": "transaction_type",
-        "TipoDoc": "document_type",
-        "Total": "total_amount",
-    }
-    
-    data_keys_parse_productos = {
-        "CodProd": "barcode",
-        "Cantidad": "quantity",
-        "Precio": "unit_price",
-        "Total": "total",
-    }
-    
-    data_keys_parse_payment_methods = {
-        "CodFP": "payment_method",
-        "Monto": "amount",
-    }
-    
-    data_keys_parse_impuestos = {
-        "Codimp": "impuesto",
-        "Porc": "porcentaje",
-        "Monto": "monto",
-    }
-    
-    data_keys_parse_descuentos = {
-        "CodPromo": "promo_code",
-        "CodDcto": "discount_code",
-        "Porc": "percentage",
-        "Monto": "amount",
-        "Tipo": "type",
-    }
+    # Mapeos compilados desde app/services/tsl_specs/*.yaml (los mismos que usa la API)
+    plan = tsl_mappings.for_transaction_type(transaction_dummy["transaction_type"])
     
     converter = tsl_converter.TSLConverter()
     
@@ -106,33 +71,17 @@ if __name__ == "__main__":
         # Pedido de venta
         ##
         # Se asignan los valores de la cabecera
-        converter.assign_value_from_transaction(transaction_dummy, data_keys_parse_cabecera, tsl_converter.TSLConverterSubstringType.CABECERA)
-        
-        # TODO: Definir descuento si aplica a la transaccion completa (monto total de la transaccion)
-        if False:
-            converter.assign_value_from_transaction(transaction_dummy, data_keys_parse_impuestos, tsl_converter.TSLConverterSubstringType.IMPUESTOS)
+        converter.assign_record(transaction_dummy, plan.record(tsl_converter.TSLConverterSubstringType.CABECERA))
         
         # Se asignan los valores de los productos
         for item in transaction_dummy["items"]:
-            converter.assign_value_from_transaction(item, data_keys_parse_productos, tsl_converter.TSLConverterSubstringType.PRODUCTOS)
-            #TODO: DEFINIR IMPUESTOS    
-            if False:
-                converter.assign_value_from_transaction(item, data_keys_parse_impuestos, tsl_converter.TSLConverterSubstringType.IMPUESTOS)
-            #TODO: DEFINIR DESCUENTOS
-            if False:
-                converter.assign_value_from_transaction(item, data_keys_parse_descuentos, tsl_converter.TSLConverterSubstringType.DESCUENTOS)
+            item["category_id"] = None
+            item["total_price"] = item["quantity"] * item["unit_price"]
+            converter.assign_record(item, plan.record(tsl_converter.TSLConverterSubstringType.PRODUCTOS))
 
         # Se asignan los valores de los pagos
         for payment in transaction_dummy["payments"]:
-            converter.assign_value_from_transaction(payment, data_keys_parse_payment_methods, tsl_converter.TSLConverterSubstringType.FORMA_PAGO)
-        
-        # TODO: Definir el substring de pago
-        if False:
-            converter.assign_value_from_transaction(payment, data_keys_parse_payment_methods, tsl_converter.TSLConverterSubstringType.FORMA_PAGO)
-        
-        # TODO: Definir el substring de descuento si aplica a la forma de pago
-        if False:
-            converter.assign_value_from_transaction(payment, data_keys_parse_descuentos, tsl_converter.TSLConverterSubstringType.DESCUENTOS)
+            converter.assign_record(payment, plan.record(tsl_converter.TSLConverterSubstringType.FORMA_PAGO))
         
         converter.serialize_transaction()
         
@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# La configuracion se lee al importar app: base SQLite y directorio de trabajo temporales
+# (los archivos TSL se escriben en <cwd>/tsl_files), cache en memoria
+_WORK_DIR = tempfile.mkdtemp(prefix="api-pos-tsl-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_WORK_DIR, 'pos.db')}"
+os.environ["DATABASE_REPLICA_URLS"] = "[]"
+os.environ["DEBUG"] = "false"
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["TSL_PROCESS_POOL_WORKERS"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(_WORK_DIR)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import auth, models  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+
+BARCODE = "7802613000148"
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture(scope="session")
+def seller():
+    """Usuario vendedor y un producto del catalogo, creados una vez por sesion"""
+    session = SessionLocal()
+    try:
+        user = models.User(
+            username="seller", email="seller@example.com", first_name="Test", last_name="Seller",
+            hashed_password=auth.get_password_hash("password123"),
+        )
+        category = models.Category(name="Bebidas")
+        session.add_all([user, category])
+        session.commit()
+        session.add(models.Product(title="Bebida", price=850, sku="SKU1", barcode=BARCODE, category_id=category.id))
+        session.commit()
+        return user.id
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def auth_headers(seller):
+    return {"Authorization": f"Bearer {auth.create_access_token({'sub': 'seller'})}"}
+
+
+@pytest.fixture
+def ticket(seller):
+    """Cuerpo de una venta de una linea; los argumentos reemplazan campos de la cabecera"""
+    def build(transaction_number: str, amount=990, **fields):
+        body = {
+            "id": 1, "user_id": seller, "store_id": "331", "pos_id": "9742",
+            "transaction_type": "PVT", "document_type": "BLT",
+            "transaction_number": transaction_number, "transaction_date": "2025-07-08T01:09:11",
+            "total_amount": amount,
+            "items": [{"barcode": BARCODE, "quantity": 1, "unit_price": amount, "discount": 0, "total": amount}],
+            "payments": [{
+                "id": 1, "transaction_id": 1, "payment_method": "CASH", "amount": amount,
+                "created_at": "2025-07-08T01:09:11",
+            }],
+        }
+        body.update(fields)
+        return body
+    return build
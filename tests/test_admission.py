@@ -0,0 +1,77 @@
+import pytest
+
+from app.routers import transactions
+from app.services import admission
+from app.services.admission import AdmissionController, AdmissionRejected, RateLimiter
+
+CONVERT_URL = "/api/v1/convert-transaction"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _controller(monkeypatch, **limits) -> AdmissionController:
+    controller = AdmissionController(**{
+        "max_in_flight": 0, "store_rate": 0, "store_burst": 1, "user_rate": 0, "user_burst": 1, **limits,
+    })
+    monkeypatch.setattr(transactions, "admission_controller", controller)
+    return controller
+
+
+def test_store_burst_exhaustion_returns_429(client, auth_headers, ticket, clock, monkeypatch):
+    _controller(monkeypatch, store_rate=0.5, store_burst=2)
+
+    for number in ("ADM-BURST-1", "ADM-BURST-2"):
+        assert client.post(f"{CONVERT_URL}/jobs", json=ticket(number), headers=auth_headers).status_code == 202
+    response = client.post(f"{CONVERT_URL}/jobs", json=ticket("ADM-BURST-3"), headers=auth_headers)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "2"
+    assert response.json()["detail"] == "Rate limit exceeded for store"
+
+    # Otra tienda tiene su propio bucket
+    response = client.post(f"{CONVERT_URL}/jobs", json=ticket("ADM-BURST-4", store_id="332"), headers=auth_headers)
+    assert response.status_code == 202
+
+
+def test_bucket_refills_over_time(clock):
+    limiter = RateLimiter(rate=2, burst=2)
+    assert limiter.try_acquire("331") == 0
+    assert limiter.try_acquire("331") == 0
+    assert limiter.try_acquire("331") == pytest.approx(0.5)
+
+    clock[0] += 0.25
+    assert limiter.try_acquire("331") == pytest.approx(0.25)
+    clock[0] += 0.25
+    assert limiter.try_acquire("331") == 0
+
+    # Tras una pausa larga el bucket se llena solo hasta burst
+    clock[0] += 60
+    assert [limiter.try_acquire("331") for _ in range(3)] == [0, 0, pytest.approx(0.5)]
+
+
+def test_user_limit_is_checked_with_retry_after_rounded_up(clock):
+    controller = AdmissionController(max_in_flight=0, store_rate=0, store_burst=1, user_rate=0.4, user_burst=1)
+    controller.check_rate_limits("331", 1)
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.check_rate_limits("331", 1)
+    assert (rejected.value.status_code, rejected.value.retry_after) == (429, 3)
+    controller.check_rate_limits("331", 2)
+
+
+def test_in_flight_limit_returns_503(client, auth_headers, ticket, monkeypatch):
+    controller = _controller(monkeypatch, max_in_flight=1)
+    # Una solicitud ocupa el unico cupo
+    controller.acquire_slot()
+
+    response = client.post(CONVERT_URL, json=ticket("ADM-SLOT-1"), headers=auth_headers)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert controller.in_flight == 1
+
+    controller.release_slot()
+    assert client.post(CONVERT_URL, json=ticket("ADM-SLOT-1"), headers=auth_headers).status_code == 200
+    assert controller.in_flight == 0
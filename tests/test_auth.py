@@ -0,0 +1,72 @@
+import hashlib
+
+from app import auth, models
+from app.services.shared_cache import MemoryCacheBackend, SharedCache, shared_cache
+
+
+def test_forged_token_cache_entry_is_not_trusted(client, seller):
+    forged = "not-a-jwt"
+    shared_cache.set("tokens", hashlib.sha256(forged.encode()).hexdigest(), {"sub": "seller", "jti": None, "iat": None})
+    response = client.get("/api/v1/convert-transaction/jobs/unknown", headers={"Authorization": f"Bearer {forged}"})
+    assert response.status_code == 401
+
+
+def test_deactivated_user_is_rejected_on_next_request(client, db):
+    db.add(models.User(
+        username="cashier", email="cashier@example.com", first_name="Test", last_name="Cashier",
+        hashed_password=auth.get_password_hash("password123"),
+    ))
+    db.commit()
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': 'cashier'})}"}
+    assert client.get("/api/v1/convert-transaction/jobs/unknown", headers=headers).status_code == 404
+
+    db.query(models.User).filter(models.User.username == "cashier").update({models.User.is_active: False})
+    db.commit()
+    assert client.get("/api/v1/convert-transaction/jobs/unknown", headers=headers).status_code == 400
+
+
+class CountingBackend(MemoryCacheBackend):
+    def __init__(self):
+        super().__init__()
+        self.gets = []
+
+    def get(self, key):
+        self.gets.append(key)
+        return super().get(key)
+
+
+def test_namespace_generation_is_cached_in_process(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.services.shared_cache.time.monotonic", lambda: now[0])
+    backend = CountingBackend()
+    cache = SharedCache(backend, generation_ttl=5)
+
+    cache.set("idempotency", "a", 1)
+    backend.gets.clear()
+    assert cache.get("idempotency", "a") == 1
+    assert backend.gets == ["pos:idempotency:0:a"]
+
+    # Otro worker invalida: este lo ve cuando vence generation_ttl
+    SharedCache(backend).invalidate_namespace("idempotency")
+    assert cache.get("idempotency", "a") == 1
+    now[0] += 5
+    assert cache.get("idempotency", "a") is None
+
+
+def test_invalidate_namespace_is_immediate_in_the_same_worker():
+    cache = SharedCache(MemoryCacheBackend(), generation_ttl=60)
+    cache.set("idempotency", "a", 1)
+    assert cache.get("idempotency", "a") == 1
+    cache.invalidate_namespace("idempotency")
+    assert cache.get("idempotency", "a") is None
+
+
+def test_add_fails_closed_when_backend_errors():
+    class BrokenBackend:
+        def get(self, key):
+            return None
+
+        def add(self, key, value, ttl=None):
+            raise ConnectionError("backend down")
+
+    assert SharedCache(BrokenBackend()).add("idempotency", "key", {"pending": True}) is False
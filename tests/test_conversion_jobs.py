@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+from sqlalchemy.exc import OperationalError
+
+from app import models
+from app.services import conversion_jobs
+
+CONVERT_URL = "/api/v1/convert-transaction"
+
+
+def _run_jobs():
+    return conversion_jobs.run_worker("tests", batch_size=10, poll_seconds=0, once=True)
+
+
+def test_job_amounts_match_synchronous_conversion(client, db, auth_headers, ticket):
+    sync = client.post(CONVERT_URL, json=ticket("JOB-SYNC-1"), headers=auth_headers)
+    assert sync.status_code == 200, sync.text
+
+    queued = client.post(f"{CONVERT_URL}/jobs", json=ticket("JOB-ASYNC-1"), headers=auth_headers)
+    assert queued.status_code == 202, queued.text
+    assert _run_jobs() >= 1
+
+    job = client.get(queued.headers["Location"], headers=auth_headers).json()
+    assert job["status"] == conversion_jobs.JOB_SUCCEEDED, job
+
+    stored = {
+        transaction.transaction_number: transaction
+        for transaction in db.query(models.Transaction).filter(
+            models.Transaction.transaction_number.in_(["JOB-SYNC-1", "JOB-ASYNC-1"])
+        )
+    }
+    sync_row, async_row = stored["JOB-SYNC-1"], stored["JOB-ASYNC-1"]
+    assert sync_row.total_amount == async_row.total_amount == Decimal("990.000")
+    assert [item.total_price for item in async_row.items] == [item.total_price for item in sync_row.items]
+    assert [payment.amount for payment in async_row.payments] == [payment.amount for payment in sync_row.payments]
+
+    # Mismos registros TSL (lineas, impuestos, pagos); la cabecera lleva el numero y la hora
+    sync_records = sync_row.tsl_data[0].tsl_data.split(",")
+    async_records = async_row.tsl_data[0].tsl_data.split(",")
+    assert async_records[1:] == sync_records[1:]
+    assert "990.000" in async_records[0]
+
+
+def test_worker_retries_when_database_is_unavailable(client, auth_headers, ticket, monkeypatch):
+    queued = client.post(f"{CONVERT_URL}/jobs", json=ticket("JOB-RETRY-1"), headers=auth_headers)
+    assert queued.status_code == 202, queued.text
+
+    claim_jobs = conversion_jobs.claim_jobs
+    calls, delays = [], []
+
+    def flaky_claim(db, worker, limit):
+        calls.append(worker)
+        if len(calls) <= 2:
+            raise OperationalError("SELECT", {}, Exception("database is locked"))
+        return claim_jobs(db, worker, limit)
+
+    monkeypatch.setattr(conversion_jobs, "claim_jobs", flaky_claim)
+    monkeypatch.setattr(conversion_jobs.time, "sleep", delays.append)
+    assert _run_jobs() >= 1
+    assert delays == [0.5, 1.0]
+
+    job = client.get(queued.headers["Location"], headers=auth_headers).json()
+    assert job["status"] == conversion_jobs.JOB_SUCCEEDED, job
@@ -0,0 +1,41 @@
+import base64
+import json
+
+import pytest
+
+from app.routers.listings import encode_cursor
+
+LIST_URL = "/api/v1/transactions"
+
+
+def _cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def test_cursor_pages_through_store_transactions(client, auth_headers, ticket):
+    for number in ("LIST-1", "LIST-2", "LIST-3"):
+        ticket_body = ticket(number, store_id="LIST-STORE")
+        assert client.post("/api/v1/convert-transaction", json=ticket_body, headers=auth_headers).status_code == 200
+
+    numbers, cursor = [], None
+    while True:
+        params = {"store_id": "LIST-STORE", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get(LIST_URL, params=params, headers=auth_headers)
+        assert page.status_code == 200, page.text
+        numbers += [entry["transaction_number"] for entry in page.json()["data"]]
+        cursor = page.json()["next_cursor"]
+        if cursor is None:
+            break
+    assert numbers == ["LIST-1", "LIST-2", "LIST-3"]
+
+
+@pytest.mark.parametrize("values", [[], [1, 2], ["nope", 2], ["2025-01-01T00:00:00"], ["2025-01-01T00:00:00", "1"], {}])
+def test_malformed_transaction_cursor_is_400(client, auth_headers, values):
+    response = client.get(LIST_URL, params={"store_id": "331", "cursor": _cursor(values)}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", [_cursor([]), _cursor(["x"]), _cursor([True]), encode_cursor(1, 2), "%%%"])
+def test_malformed_tsl_data_cursor_is_400(client, auth_headers, cursor):
+    response = client.get(f"{LIST_URL}/tsl-data", params={"cursor": cursor}, headers=auth_headers)
+    assert response.status_code == 400
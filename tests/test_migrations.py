@@ -0,0 +1,84 @@
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app import migrations, models
+
+
+def _legacy_database(tmp_path):
+    """Base creada antes de las migraciones (create_all del esquema base, sin alembic_version)"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    migrations.create_schema(engine, migrations.BASELINE_REVISION)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE alembic_version"))
+        conn.execute(text(
+            "INSERT INTO users (id, username, email, first_name, last_name, hashed_password) "
+            "VALUES (1, 'legacy', 'legacy@example.com', 'Legacy', 'User', 'x')"
+        ))
+        conn.execute(text("INSERT INTO categories (id, name) VALUES (1, 'Bebidas')"))
+        conn.execute(text("INSERT INTO products (id, title, price, sku) VALUES (1, 'Bebida', 850, 'SKU1')"))
+        conn.execute(text(
+            "INSERT INTO transactions (id, user_id, transaction_number, total_amount, created_at) "
+            "VALUES (1, 1, 'LEGACY-1', 990, '2025-06-30 23:00:00')"
+        ))
+        conn.execute(text(
+            "INSERT INTO transaction_items (transaction_id, product_id, sku, quantity, unit_price, total_price) "
+            "VALUES (1, 1, 'SKU1', 1, 990, 990)"
+        ))
+        conn.execute(text("INSERT INTO transaction_tsl_data (transaction_id, tsl_data) VALUES (1, 'legacy payload')"))
+    return engine
+
+
+def test_upgrade_from_baseline_keeps_legacy_tsl_rows(tmp_path):
+    engine = _legacy_database(tmp_path)
+    migrations.create_schema(engine)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("transaction_tsl_data")}
+    assert {"tsl_data", "tsl_data_compressed"} <= columns
+
+    with Session(engine) as session:
+        transaction = session.get(models.Transaction, 1)
+        assert transaction.tsl_data[0].tsl_data == "legacy payload"
+
+        transaction.tsl_data.append(models.TransactionTSLData(tsl_data="new payload"))
+        session.commit()
+        session.expire_all()
+        assert sorted(row.tsl_data for row in session.get(models.Transaction, 1).tsl_data) == [
+            "legacy payload", "new payload",
+        ]
+
+
+def test_upgrade_from_baseline_dates_line_items_with_their_transaction(tmp_path):
+    engine = _legacy_database(tmp_path)
+    migrations.create_schema(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT created_at FROM transaction_items")).scalar() == "2025-06-30 23:00:00"
+
+    with Session(engine) as session:
+        transaction = session.get(models.Transaction, 1)
+        assert [item.sku for item in transaction.items] == ["SKU1"]
+
+        transaction.items.append(models.TransactionItem(product_id=1, sku="SKU1", quantity=1, unit_price=990, total_price=990))
+        session.commit()
+        session.expire_all()
+        assert all(item.created_at is not None for item in session.get(models.Transaction, 1).items)
+
+
+def test_upgrade_from_baseline_accepts_lines_without_catalog_product(tmp_path):
+    engine = _legacy_database(tmp_path)
+    migrations.create_schema(engine)
+
+    with Session(engine) as session:
+        session.add(models.TransactionItem(transaction_id=1, product_id=None, sku="UNKNOWN", quantity=1, unit_price=990, total_price=990))
+        session.commit()
+
+
+def test_migrations_match_models(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    migrations.create_schema(engine)
+
+    with engine.connect() as conn:
+        context = MigrationContext.configure(conn)
+        assert compare_metadata(context, models.Base.metadata) == []
@@ -0,0 +1,65 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import return_lookup
+from app.services.return_lookup import OriginalSale, OriginalTransactionNotFound
+
+CONVERT_URL = "/api/v1/convert-transaction"
+
+
+def _sale(*lines):
+    return OriginalSale(1, "331", "9742", "SALE-1", datetime(2025, 7, 8, 1, 9, 11), lines)
+
+
+def _line(sku=None, barcode=None, product_id=None):
+    return SimpleNamespace(sku=sku, barcode=barcode, product_id=product_id)
+
+
+def test_line_positions_match_by_product_and_code():
+    sale = _sale(("SKU1", 10), ("7802613000148", None), ("SKU3", 30))
+    returned = [_line(product_id=30), _line(barcode="7802613000148"), _line(sku="SKU1")]
+    assert sale.line_positions(returned) == [3, 2, 1]
+
+
+def test_repeated_product_uses_next_unassigned_position():
+    sale = _sale(("SKU1", 10), ("SKU2", 20), ("SKU1", 10))
+    returned = [_line(sku="SKU1", product_id=10), _line(sku="SKU1", product_id=10)]
+    assert sale.line_positions(returned) == [1, 3]
+
+
+def test_line_returned_more_times_than_sold_is_rejected():
+    sale = _sale(("SKU1", 10), ("SKU2", 20))
+    with pytest.raises(OriginalTransactionNotFound):
+        sale.line_positions([_line(sku="SKU1", product_id=10), _line(sku="SKU1", product_id=10)])
+
+
+def test_line_not_in_original_sale_is_rejected():
+    sale = _sale(("SKU1", 10))
+    with pytest.raises(OriginalTransactionNotFound, match="SALE-1"):
+        sale.line_positions([_line(barcode="7800000000000")])
+
+
+def _return_ticket(ticket, number, original_number):
+    return ticket(
+        number, transaction_type="DEV", document_type="NC",
+        originalTransaction={"pos_id": "9742", "transaction_number": original_number, "transaction_date": "2025-07-08"},
+    )
+
+
+def test_return_resolves_original_sale_from_database(client, auth_headers, ticket):
+    sale = client.post(CONVERT_URL, json=ticket("RET-SALE-1"), headers=auth_headers)
+    assert sale.status_code == 200, sale.text
+    # Sin la venta en el LRU la devolucion consulta la base
+    return_lookup.recent_sales.clear()
+
+    response = client.post(CONVERT_URL, json=_return_ticket(ticket, "RET-1", "RET-SALE-1"), headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert "RET-SALE-1" in response.json()["data"]
+
+
+def test_return_without_original_sale_is_rejected(client, auth_headers, ticket):
+    response = client.post(CONVERT_URL, json=_return_ticket(ticket, "RET-2", "MISSING-SALE"), headers=auth_headers)
+    assert response.status_code == 400
+    assert "MISSING-SALE" in response.json()["detail"]
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app import auth
+
+AUTH_URL = "/api/v1/auth"
+
+
+def _refresh_token(client, seller) -> str:
+    response = client.post(f"{AUTH_URL}/login", json={"username": "seller", "password": "password123"})
+    assert response.status_code == 200, response.text
+    return response.json()["refreshToken"]
+
+
+def _refresh(client, token):
+    return client.post(f"{AUTH_URL}/refresh", json={"refreshToken": token})
+
+
+def test_refresh_rotates_token(client, seller):
+    token = _refresh_token(client, seller)
+    first = _refresh(client, token)
+    assert first.status_code == 200, first.text
+    assert _refresh(client, token).status_code == 401
+    assert _refresh(client, first.json()["refreshToken"]).status_code == 200
+
+
+def test_concurrent_refresh_with_same_token_issues_one_pair(client, seller):
+    token = _refresh_token(client, seller)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        statuses = sorted(response.status_code for response in pool.map(lambda _: _refresh(client, token), range(4)))
+    assert statuses == [200, 401, 401, 401]
+
+
+def test_logout_revokes_access_token(client, seller):
+    token = auth.create_access_token({"sub": "seller"})
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.post(f"{AUTH_URL}/logout", headers=headers).status_code == 204
+    assert client.post(f"{AUTH_URL}/logout", headers=headers).status_code == 401
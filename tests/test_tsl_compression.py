@@ -0,0 +1,82 @@
+from sqlalchemy import insert, select
+
+from app import models
+from app.database import SessionLocal
+from app.services import tsl_compression
+
+STORE_ID = "CMP1"
+
+
+def _payload(number: int) -> str:
+    records = [f'"{STORE_ID}","9742","{number:08d}","PVT","BLT","20250708"']
+    records += [f'"7802613000148","SKU1","1","990.000","0.000","990.000","{line}"' for line in range(20)]
+    return "\r\n".join(records)
+
+
+def _save(db, seller, number: str, tsl_data: str) -> int:
+    row = models.TransactionTSLData(tsl_data=tsl_data)
+    db.add(models.Transaction(
+        user_id=seller, store_id=STORE_ID, transaction_number=number, total_amount=990, tsl_data=[row],
+    ))
+    db.commit()
+    return row.id
+
+
+def _stored(db, row_id: int):
+    return db.execute(
+        select(models.TransactionTSLData.tsl_data_text, models.TransactionTSLData.tsl_data_compressed)
+        .where(models.TransactionTSLData.id == row_id)
+    ).one()
+
+
+def test_payload_round_trips_through_store_dictionary(db, seller, monkeypatch):
+    dictionary = models.TSLCompressionDictionary(
+        store_id=STORE_ID, codec="zlib", is_active=True, sample_count=2,
+        data=tsl_compression.build_zlib_dictionary([_payload(1).encode(), _payload(2).encode()]),
+    )
+    db.add(dictionary)
+    db.commit()
+    tsl_compression.dictionaries.refresh(db.connection())
+
+    payload = _payload(3)
+    row_id = _save(db, seller, "CMP-DICT-1", payload)
+
+    text, blob = _stored(db, row_id)
+    assert text is None
+    assert tsl_compression._HEADER.unpack_from(blob) == (tsl_compression.CODEC_ZLIB, dictionary.id)
+    assert len(blob) < len(payload)
+
+    # Otro worker: el diccionario se carga desde la base al descomprimir
+    monkeypatch.setattr(tsl_compression, "dictionaries", tsl_compression.DictionaryRegistry())
+    session = SessionLocal()
+    try:
+        row = session.get(models.TransactionTSLData, row_id)
+        assert "tsl_data_compressed" not in row.__dict__
+        assert row.tsl_data == payload
+    finally:
+        session.close()
+
+
+def test_payload_below_min_size_is_stored_raw(db, seller):
+    row_id = _save(db, seller, "CMP-RAW-1", "short")
+
+    _, blob = _stored(db, row_id)
+    assert tsl_compression._HEADER.unpack_from(blob) == (tsl_compression.CODEC_RAW, 0)
+    db.expire_all()
+    assert db.get(models.TransactionTSLData, row_id).tsl_data == "short"
+
+
+def test_legacy_text_rows_stay_readable(db, seller):
+    transaction = models.Transaction(user_id=seller, store_id=STORE_ID, transaction_number="CMP-LEGACY-1", total_amount=990)
+    db.add(transaction)
+    db.commit()
+    # Fila escrita antes de la compresion: solo la columna de texto tsl_data
+    row_id = db.execute(
+        insert(models.TransactionTSLData.__table__)
+        .values(transaction_id=transaction.id, tsl_data=_payload(4))
+        .returning(models.TransactionTSLData.__table__.c.id)
+    ).scalar_one()
+    db.commit()
+
+    row = db.get(models.TransactionTSLData, row_id)
+    assert row.tsl_data == _payload(4)
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from app.routers.tsl_files import file_etag
+from app.services.tsl_converter import TSLConverter
+
+NAME = "tsl_output_20990101000000.txt"
+URL = f"/api/v1/tsl-files/{NAME}"
+CONTENT = b'"331","9742","00000001","PVT","BLT","20250708"\r\n"7802613000148","SKU1","1"\r\n\x1c\r\n'
+
+
+@pytest.fixture
+def tsl_file():
+    os.makedirs(TSLConverter.output_dir(), exist_ok=True)
+    path = os.path.join(TSLConverter.output_dir(), NAME)
+    with open(path, "wb") as file:
+        file.write(CONTENT)
+    yield path
+    os.remove(path)
+
+
+def test_range_returns_partial_content(client, auth_headers, tsl_file):
+    response = client.get(URL, headers={**auth_headers, "Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+    assert response.content == CONTENT[10:20]
+
+    response = client.get(URL, headers={**auth_headers, "Range": "bytes=-5"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {len(CONTENT) - 5}-{len(CONTENT) - 1}/{len(CONTENT)}"
+    assert response.content == CONTENT[-5:]
+
+
+def test_unsatisfiable_range_returns_416(client, auth_headers, tsl_file):
+    response = client.get(URL, headers={**auth_headers, "Range": f"bytes={len(CONTENT)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+@pytest.mark.parametrize("header", ["bytes=0-4,10-14", "bytes=abc", "items=0-4", "bytes=9-2"])
+def test_unsupported_or_malformed_range_returns_whole_file(client, auth_headers, tsl_file, header):
+    response = client.get(URL, headers={**auth_headers, "Range": header})
+    assert response.status_code == 200
+    assert "content-range" not in response.headers
+    assert response.content == CONTENT
+
+
+def test_if_none_match_returns_304(client, auth_headers, tsl_file):
+    etag = client.get(URL, headers=auth_headers).headers["etag"]
+    assert etag == file_etag(os.stat(tsl_file))
+
+    response = client.get(URL, headers={**auth_headers, "If-None-Match": f'"other", {etag}'})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+
+def test_stale_if_range_returns_whole_file(client, auth_headers, tsl_file):
+    etag = client.get(URL, headers=auth_headers).headers["etag"]
+    response = client.get(URL, headers={**auth_headers, "Range": "bytes=0-4", "If-Range": etag})
+    assert response.status_code == 206
+
+    # El archivo crecio desde la descarga parcial: el ETag anterior ya no vale
+    with open(tsl_file, "ab") as file:
+        file.write(b"\x1c\r\n")
+    response = client.get(URL, headers={**auth_headers, "Range": "bytes=0-4", "If-Range": etag})
+    assert response.status_code == 200
+    assert response.content == CONTENT + b"\x1c\r\n"
+
+
+@pytest.mark.parametrize("filename", ["..%2F..%2Fpos.db", "%2E%2E", "tsl_output_2099.txt", "..%2Ftsl_files%2F" + NAME])
+def test_path_traversal_is_rejected(client, auth_headers, tsl_file, filename):
+    response = client.get(f"/api/v1/tsl-files/{filename}", headers=auth_headers)
+    assert response.status_code in (400, 404)
+    assert CONTENT not in response.content
@@ -0,0 +1,50 @@
+import os
+
+from app.services import tsl_writer
+from app.services.tsl_writer import TSLFileWriter
+
+
+def _short_writev(limits):
+    """os.writev que escribe a lo sumo limits[i] bytes en la llamada i (el ultimo se repite)"""
+    real_writev = os.writev
+    calls = []
+
+    def writev(fd, buffers):
+        buffers = list(buffers)
+        calls.append(len(buffers))
+        data = b"".join(bytes(buffer) for buffer in buffers)
+        limit = limits[min(len(calls), len(limits)) - 1]
+        return real_writev(fd, [data[:limit]])
+
+    return writev, calls
+
+
+def test_short_writes_resume_inside_a_buffer(tmp_path, monkeypatch):
+    buffers = [b'"331","9742"\r\n', bytearray(b'"SKU1","1"\r\n'), b"", memoryview(b"\x1c\r\n")]
+    # 5 bytes corta el primer buffer; 12 cruza el limite entre el primero y el segundo
+    writev, calls = _short_writev([5, 12, 3])
+    monkeypatch.setattr(tsl_writer.os, "writev", writev)
+
+    path = tmp_path / "short.tsl"
+    written = TSLFileWriter(str(path)).write(buffers)
+
+    expected = b"".join(bytes(buffer) for buffer in buffers)
+    assert written == len(expected)
+    assert path.read_bytes() == expected
+    assert len(calls) > 2
+
+
+def test_batches_larger_than_iov_max_are_split(tmp_path, monkeypatch):
+    monkeypatch.setattr(tsl_writer, "_IOV_MAX", 4)
+    buffers = [f"{line:03d}\r\n".encode() for line in range(11)]
+    writev, calls = _short_writev([7, 1000])
+    monkeypatch.setattr(tsl_writer.os, "writev", writev)
+
+    path = tmp_path / "batched.tsl"
+    path.write_bytes(b"previo\r\n")
+    written = TSLFileWriter(str(path)).write(buffers)
+
+    expected = b"".join(buffers)
+    assert written == len(expected)
+    assert path.read_bytes() == b"previo\r\n" + expected
+    assert max(calls) <= 4